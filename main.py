@@ -4,6 +4,7 @@ Main entry point for the Secure Backup System
 """
 import sys
 import os
+import contextlib
 
 # Đảm bảo chúng ta có thể import từ src
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -19,6 +20,12 @@ except ImportError:
 
 def main():
     """Main function"""
+    if sys.argv[1:2] == ["cat"]:
+        # stdout chỉ chứa dữ liệu file: mọi thông báo của CLI đi ra stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            cli = BackupCLI()
+            cli.run()
+        return
     cli = BackupCLI()
     cli.run()
 
@@ -0,0 +1,99 @@
+"""
+Bloom filter over stored chunk hashes
+Answers "definitely not stored" without touching the chunk index
+"""
+import math
+import os
+import struct
+import threading
+from typing import Iterable
+
+BLOOM_MAGIC = b"BKBLOOM1"
+# Header: magic | số bit | số hàm hash | số phần tử | capacity | fp rate
+BLOOM_HEADER = struct.Struct(">8sQIQQd")
+
+DEFAULT_FP_RATE = 0.01
+MIN_CAPACITY = 100_000
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter keyed by hex SHA-256 chunk hashes
+
+    The hashes are already uniformly distributed, so bit positions come from
+    double hashing over two 64-bit slices of the digest instead of extra hashing.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = DEFAULT_FP_RATE):
+        if not 0 < fp_rate < 1:
+            raise ValueError(f"Invalid Bloom filter false-positive rate: {fp_rate}")
+        self.capacity = max(int(capacity), 1)
+        self.fp_rate = fp_rate
+        # m = -n ln p / (ln 2)^2, k = m/n ln 2
+        self.num_bits = max(64, int(math.ceil(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_count(cls, count: int, fp_rate: float = DEFAULT_FP_RATE) -> "BloomFilter":
+        """Filter sized for the current chunk count with room to grow"""
+        return cls(max(count * 2, MIN_CAPACITY), fp_rate)
+
+    def _positions(self, chunk_hash: str):
+        h1 = int(chunk_hash[:16], 16)
+        h2 = int(chunk_hash[16:32], 16) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, chunk_hash: str) -> None:
+        with self._lock:
+            for pos in self._positions(chunk_hash):
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def update(self, chunk_hashes: Iterable[str]) -> None:
+        for chunk_hash in chunk_hashes:
+            self.add(chunk_hash)
+
+    def __contains__(self, chunk_hash: str) -> bool:
+        """False means the chunk is definitely not stored"""
+        bits = self.bits
+        for pos in self._positions(chunk_hash):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def is_full(self) -> bool:
+        """More elements than it was sized for (false-positive rate degrades)"""
+        return self.count > self.capacity
+
+    def save(self, path: str) -> None:
+        """Write atomically (temp file + rename)"""
+        temp_path = path + ".tmp"
+        with self._lock:
+            with open(temp_path, 'wb') as f:
+                f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.num_bits, self.num_hashes,
+                                          self.count, self.capacity, self.fp_rate))
+                f.write(self.bits)
+        os.rename(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        """Load a saved filter; raises ValueError if the file is damaged"""
+        with open(path, 'rb') as f:
+            header = f.read(BLOOM_HEADER.size)
+            if len(header) != BLOOM_HEADER.size:
+                raise ValueError(f"Truncated Bloom filter: {path}")
+            magic, num_bits, num_hashes, count, capacity, fp_rate = BLOOM_HEADER.unpack(header)
+            if magic != BLOOM_MAGIC:
+                raise ValueError(f"Not a Bloom filter file: {path}")
+            bits = f.read()
+
+        bloom = cls(capacity, fp_rate)
+        if bloom.num_bits != num_bits or bloom.num_hashes != num_hashes or len(bits) != len(bloom.bits):
+            raise ValueError(f"Bloom filter size mismatch: {path}")
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        return bloom
@@ -0,0 +1,491 @@
+"""
+Snapshot catalog: snapshot metadata, tombstones and the hash chain
+JsonCatalog keeps everything in metadata.json (default); SqliteCatalog stores one
+row per snapshot with indexes for chain lookups and list filters, so opening the
+store and committing a snapshot no longer cost time proportional to history
+"""
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+CATALOG_BACKENDS = ("json", "sqlite")
+DEFAULT_CATALOG = "json"
+
+# Trường của snapshot cần giữ lại trong tombstone để hash chain vẫn verify được
+CHAIN_FIELDS = ("id", "created_at", "merkle_root", "prev_root", "prev_chain_hash",
+                "chain_hash", "sequence")
+
+
+def make_tombstone(metadata: Dict, forgotten_at: float) -> Dict:
+    tombstone = {key: metadata[key] for key in CHAIN_FIELDS if key in metadata}
+    tombstone["forgotten_at"] = forgotten_at
+    return tombstone
+
+
+def _matches(metadata: Dict, label: Optional[str], since: Optional[float],
+             until: Optional[float]) -> bool:
+    if label is not None and metadata.get("label", "") != label:
+        return False
+    if since is not None and metadata["created_at"] < since:
+        return False
+    if until is not None and metadata["created_at"] >= until:
+        return False
+    return True
+
+
+class JsonCatalog:
+    """
+    metadata.json plus the snapshot_index.json sidecar (chain order, root and
+    sequence lookups); both files are rewritten on every commit
+    """
+
+    backend = "json"
+
+    def __init__(self, metadata_file: str, index_file: str):
+        self.metadata_file = metadata_file
+        self.index_file = index_file
+        self.metadata = self._load()
+        # merkle_root → snapshot ids và sequence → snapshot id (tra predecessor O(1))
+        self._index = self._load_index()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.metadata_file):
+            return {
+                "snapshots": {},
+                "latest_snapshot": None,
+                "prev_root_chain": []
+            }
+        with open(self.metadata_file, 'r') as f:
+            return json.load(f)
+
+    # ---------- snapshot index ----------
+
+    def _build_index(self) -> Dict:
+        """Index every chain link (snapshots and tombstones) in chain order"""
+        entries = dict(self.metadata.get("forgotten", {}))
+        entries.update(self.metadata["snapshots"])
+        index = {"order": [], "by_root": {}, "by_sequence": {}}
+        for snapshot_id in sorted(entries, key=lambda snap_id: (entries[snap_id].get("sequence", 0),
+                                                                entries[snap_id]["created_at"])):
+            self._index_link(index, snapshot_id, entries[snapshot_id])
+        return index
+
+    @staticmethod
+    def _index_link(index: Dict, snapshot_id: str, metadata: Dict) -> None:
+        """Add a link that follows every indexed link in the chain"""
+        index["order"].append(snapshot_id)
+        # Nhiều snapshot có thể trùng Merkle root (dữ liệu không đổi) → giữ danh sách
+        index["by_root"].setdefault(metadata["merkle_root"], []).append(snapshot_id)
+        if "sequence" in metadata:
+            index["by_sequence"].setdefault(metadata["sequence"], snapshot_id)
+
+    def _load_index(self) -> Dict:
+        """Load the persisted snapshot index, rebuilding it if it does not match metadata"""
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+            order = data["order"]
+            # Chỉ dùng index khớp với metadata (metadata có thể bị sửa/khôi phục bằng tay)
+            known = set(self.metadata["snapshots"]) | set(self.metadata.get("forgotten", {}))
+            if len(order) == len(known) and set(order) == known:
+                return {
+                    "order": order,
+                    "by_root": data["by_root"],
+                    "by_sequence": {int(seq): snap_id for seq, snap_id in data["by_sequence"].items()},
+                }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+
+        self._index = self._build_index()
+        if self.metadata["snapshots"] or self.metadata.get("forgotten"):
+            try:
+                self._save_index()
+            except OSError:
+                pass
+        return self._index
+
+    def _save_index(self) -> None:
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self._index, f)
+        os.rename(temp_file, self.index_file)
+
+    # ---------- lookups ----------
+
+    def get(self, snapshot_id: str) -> Optional[Dict]:
+        """Metadata of a live snapshot, or None"""
+        return self.metadata["snapshots"].get(snapshot_id)
+
+    def get_link(self, snapshot_id: str) -> Optional[Dict]:
+        """Metadata of a live snapshot, or the tombstone of a forgotten one"""
+        entry = self.metadata["snapshots"].get(snapshot_id)
+        if entry is None:
+            entry = self.metadata.get("forgotten", {}).get(snapshot_id)
+        return entry
+
+    def __contains__(self, snapshot_id: str) -> bool:
+        return snapshot_id in self.metadata["snapshots"]
+
+    def is_forgotten(self, snapshot_id: str) -> bool:
+        return snapshot_id in self.metadata.get("forgotten", {})
+
+    def live_ids(self) -> List[str]:
+        return list(self.metadata["snapshots"])
+
+    def iter_chain(self) -> Iterator[Tuple[str, Dict]]:
+        """(snapshot_id, metadata or tombstone) for every chain link, in chain order"""
+        for snapshot_id in self._index["order"]:
+            entry = self.get_link(snapshot_id)
+            if entry is not None:
+                yield snapshot_id, entry
+
+    def iter_live(self) -> Iterator[Tuple[str, Dict]]:
+        """(snapshot_id, metadata) of live snapshots, in chain order"""
+        for snapshot_id in self._index["order"]:
+            entry = self.metadata["snapshots"].get(snapshot_id)
+            if entry is not None:
+                yield snapshot_id, entry
+
+    def head(self) -> Optional[str]:
+        """Last link of the hash chain (live or forgotten)"""
+        order = self._index["order"]
+        if order and self.get_link(order[-1]) is not None:
+            return order[-1]
+        return self.metadata.get("latest_snapshot")
+
+    def find_by_root(self, merkle_root: str) -> List[str]:
+        """Chain links with this Merkle root, in chain order"""
+        result = []
+        for snap_id in self._index["by_root"].get(merkle_root, []):
+            entry = self.get_link(snap_id)
+            if entry is not None and entry["merkle_root"] == merkle_root:
+                result.append(snap_id)
+        return result
+
+    def by_sequence(self, sequence: int) -> Optional[str]:
+        snap_id = self._index["by_sequence"].get(sequence)
+        if snap_id is not None and self.get_link(snap_id) is not None:
+            return snap_id
+        return None
+
+    def next_sequence(self) -> int:
+        return len(self.metadata.get("prev_root_chain", []))
+
+    def list_snapshots(self, offset: int = 0, limit: Optional[int] = None,
+                       label: Optional[str] = None, since: Optional[float] = None,
+                       until: Optional[float] = None) -> List[Dict]:
+        """Live snapshots matching the filters, newest first"""
+        matching = [metadata for metadata in self.metadata["snapshots"].values()
+                    if _matches(metadata, label, since, until)]
+        matching.sort(key=lambda metadata: metadata["created_at"], reverse=True)
+        end = None if limit is None else offset + limit
+        return matching[offset:end]
+
+    def count(self, label: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None) -> int:
+        return sum(1 for metadata in self.metadata["snapshots"].values()
+                   if _matches(metadata, label, since, until))
+
+    # ---------- updates (durable after commit()) ----------
+
+    def add(self, metadata: Dict) -> None:
+        """Append a new snapshot at the head of the chain"""
+        snapshot_id = metadata["id"]
+        self.metadata["snapshots"][snapshot_id] = metadata
+        self.metadata["latest_snapshot"] = snapshot_id
+        self.metadata["latest_snapshot_root"] = metadata["merkle_root"]
+        self.metadata.setdefault("prev_root_chain", []).append(metadata["merkle_root"])
+        self._index_link(self._index, snapshot_id, metadata)
+
+    def forget(self, snapshot_ids: Iterable[str], forgotten_at: float) -> None:
+        """Replace live snapshots with their tombstones"""
+        forgotten = self.metadata.setdefault("forgotten", {})
+        for snapshot_id in snapshot_ids:
+            metadata = self.metadata["snapshots"].pop(snapshot_id)
+            forgotten[snapshot_id] = make_tombstone(metadata, forgotten_at)
+
+        live = [snap_id for snap_id, _ in self.iter_live()]
+        self.metadata["latest_snapshot"] = live[-1] if live else None
+        self.metadata["latest_snapshot_root"] = (
+            self.metadata["snapshots"][live[-1]]["merkle_root"] if live else None
+        )
+
+    def discard(self, snapshot_id: str) -> bool:
+        """Drop a snapshot that never completed; returns True if it was recorded"""
+        if snapshot_id not in self.metadata["snapshots"]:
+            return False
+        del self.metadata["snapshots"][snapshot_id]
+
+        # Nếu đây là latest snapshot, tìm lại latest
+        if self.metadata.get("latest_snapshot") == snapshot_id:
+            snapshots = self.metadata["snapshots"]
+            if snapshots:
+                latest = max(snapshots.items(),
+                             key=lambda x: x[1]["created_at"])
+                self.metadata["latest_snapshot"] = latest[0]
+            else:
+                self.metadata["latest_snapshot"] = None
+
+        self._index = self._build_index()
+        return True
+
+    def commit(self) -> None:
+        """Save metadata to file atomically"""
+        temp_file = self.metadata_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+        os.rename(temp_file, self.metadata_file)
+        self._save_index()
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteCatalog:
+    """
+    One row per chain link (live snapshot or tombstone) in store/catalog.db
+    chain_pos gives the chain order; created_at, label, merkle_root and sequence
+    are indexed so lookups and list filters never scan the whole history
+    """
+
+    backend = "sqlite"
+
+    COLUMNS = ("sequence", "created_at", "label", "merkle_root", "prev_root", "prev_chain_hash",
+               "chain_hash", "manifest_hash", "total_files", "total_chunks", "reused_files")
+    _SELECT = "SELECT id, " + ", ".join(COLUMNS) + ", forgotten_at, extra FROM snapshots"
+    _LIVE = "forgotten_at IS NULL"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Catalog là điểm commit của snapshot → fsync mỗi lần commit
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id TEXT PRIMARY KEY,
+                chain_pos INTEGER NOT NULL UNIQUE,
+                sequence INTEGER,
+                created_at REAL NOT NULL,
+                label TEXT,
+                merkle_root TEXT NOT NULL,
+                prev_root TEXT,
+                prev_chain_hash TEXT,
+                chain_hash TEXT,
+                manifest_hash TEXT,
+                total_files INTEGER,
+                total_chunks INTEGER,
+                reused_files INTEGER,
+                forgotten_at REAL,
+                extra TEXT
+            );
+            CREATE INDEX IF NOT EXISTS snapshots_created_at ON snapshots (created_at);
+            CREATE INDEX IF NOT EXISTS snapshots_label ON snapshots (label);
+            CREATE INDEX IF NOT EXISTS snapshots_merkle_root ON snapshots (merkle_root);
+            CREATE INDEX IF NOT EXISTS snapshots_sequence ON snapshots (sequence);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+    def _row_to_dict(self, row: Tuple) -> Dict:
+        entry = {"id": row[0]}
+        for name, value in zip(self.COLUMNS, row[1:]):
+            if value is not None:
+                entry[name] = value
+        forgotten_at, extra = row[-2], row[-1]
+        if forgotten_at is not None:
+            entry["forgotten_at"] = forgotten_at
+        if extra:
+            entry.update(json.loads(extra))
+        return entry
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @staticmethod
+    def _filters(label: Optional[str], since: Optional[float],
+                 until: Optional[float]) -> Tuple[str, Tuple]:
+        clauses = [SqliteCatalog._LIVE]
+        params = []
+        if label is not None:
+            clauses.append("label = ?")
+            params.append(label)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return " AND ".join(clauses), tuple(params)
+
+    # ---------- lookups ----------
+
+    def link_count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM snapshots")[0][0]
+
+    def get(self, snapshot_id: str) -> Optional[Dict]:
+        rows = self._query(f"{self._SELECT} WHERE id = ? AND {self._LIVE}", (snapshot_id,))
+        return self._row_to_dict(rows[0]) if rows else None
+
+    def get_link(self, snapshot_id: str) -> Optional[Dict]:
+        rows = self._query(f"{self._SELECT} WHERE id = ?", (snapshot_id,))
+        return self._row_to_dict(rows[0]) if rows else None
+
+    def __contains__(self, snapshot_id: str) -> bool:
+        return bool(self._query(f"SELECT 1 FROM snapshots WHERE id = ? AND {self._LIVE}",
+                                (snapshot_id,)))
+
+    def is_forgotten(self, snapshot_id: str) -> bool:
+        return bool(self._query("SELECT 1 FROM snapshots WHERE id = ? AND forgotten_at IS NOT NULL",
+                                (snapshot_id,)))
+
+    def live_ids(self) -> List[str]:
+        return [row[0] for row in self._query(f"SELECT id FROM snapshots WHERE {self._LIVE}")]
+
+    def iter_chain(self) -> Iterator[Tuple[str, Dict]]:
+        for row in self._query(f"{self._SELECT} ORDER BY chain_pos"):
+            yield row[0], self._row_to_dict(row)
+
+    def iter_live(self) -> Iterator[Tuple[str, Dict]]:
+        for row in self._query(f"{self._SELECT} WHERE {self._LIVE} ORDER BY chain_pos"):
+            yield row[0], self._row_to_dict(row)
+
+    def head(self) -> Optional[str]:
+        rows = self._query("SELECT id FROM snapshots ORDER BY chain_pos DESC LIMIT 1")
+        return rows[0][0] if rows else None
+
+    def find_by_root(self, merkle_root: str) -> List[str]:
+        return [row[0] for row in self._query(
+            "SELECT id FROM snapshots WHERE merkle_root = ? ORDER BY chain_pos", (merkle_root,)
+        )]
+
+    def by_sequence(self, sequence: int) -> Optional[str]:
+        rows = self._query("SELECT id FROM snapshots WHERE sequence = ? ORDER BY chain_pos LIMIT 1",
+                           (sequence,))
+        return rows[0][0] if rows else None
+
+    def next_sequence(self) -> int:
+        return int(self._get_meta("next_sequence") or 0)
+
+    def list_snapshots(self, offset: int = 0, limit: Optional[int] = None,
+                       label: Optional[str] = None, since: Optional[float] = None,
+                       until: Optional[float] = None) -> List[Dict]:
+        where, params = self._filters(label, since, until)
+        rows = self._query(
+            f"{self._SELECT} WHERE {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            params + (-1 if limit is None else limit, offset)
+        )
+        return [self._row_to_dict(row) for row in rows]
+
+    def count(self, label: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None) -> int:
+        where, params = self._filters(label, since, until)
+        return self._query(f"SELECT COUNT(*) FROM snapshots WHERE {where}", params)[0][0]
+
+    # ---------- updates (durable after commit()) ----------
+
+    def _insert(self, metadata: Dict, forgotten_at: Optional[float] = None) -> None:
+        extra = {key: value for key, value in metadata.items()
+                 if key not in self.COLUMNS and key not in ("id", "forgotten_at")}
+        with self._lock:
+            chain_pos = self._conn.execute(
+                "SELECT COALESCE(MAX(chain_pos), 0) + 1 FROM snapshots"
+            ).fetchone()[0]
+            self._conn.execute(
+                f"INSERT INTO snapshots (id, chain_pos, {', '.join(self.COLUMNS)}, forgotten_at, extra) "
+                f"VALUES (?, ?, {', '.join('?' * len(self.COLUMNS))}, ?, ?)",
+                (metadata["id"], chain_pos, *(metadata.get(name) for name in self.COLUMNS),
+                 forgotten_at, json.dumps(extra) if extra else None)
+            )
+
+    def add(self, metadata: Dict) -> None:
+        """Append a new snapshot at the head of the chain"""
+        self._insert(metadata)
+        self._set_meta("next_sequence", str(self.next_sequence() + 1))
+
+    def add_tombstone(self, tombstone: Dict) -> None:
+        """Append an already forgotten link (migration)"""
+        self._insert(tombstone, tombstone.get("forgotten_at", 0.0))
+
+    def set_next_sequence(self, sequence: int) -> None:
+        self._set_meta("next_sequence", str(sequence))
+
+    def forget(self, snapshot_ids: Iterable[str], forgotten_at: float) -> None:
+        """Replace live snapshots with their tombstones (only chain fields are kept)"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE snapshots SET forgotten_at = ?, label = NULL, manifest_hash = NULL, "
+                "total_files = NULL, total_chunks = NULL, reused_files = NULL, extra = NULL "
+                f"WHERE id = ? AND {self._LIVE}",
+                ((forgotten_at, snapshot_id) for snapshot_id in snapshot_ids)
+            )
+
+    def discard(self, snapshot_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(f"DELETE FROM snapshots WHERE id = ? AND {self._LIVE}",
+                                        (snapshot_id,))
+            return cursor.rowcount > 0
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+def migrate_json_catalog(source: JsonCatalog, target: SqliteCatalog) -> int:
+    """Copy every chain link from metadata.json into the SQLite catalog (one transaction)"""
+    links = 0
+    for snapshot_id, metadata in source.iter_chain():
+        if snapshot_id in source:
+            target.add(metadata)
+        else:
+            target.add_tombstone(metadata)
+        links += 1
+    target.set_next_sequence(source.next_sequence())
+    target.commit()
+    return links
+
+
+def open_catalog(backend: str, metadata_file: str, index_file: str, db_path: str):
+    """
+    Open the snapshot catalog of a store
+    Switching a JSON store to sqlite migrates metadata.json transparently; the
+    old file is kept as metadata.json.migrated
+    """
+    if backend not in CATALOG_BACKENDS:
+        raise ValueError(f"Unknown catalog backend: {backend}. Must be one of {CATALOG_BACKENDS}")
+    if backend == "json":
+        if os.path.exists(db_path) and not os.path.exists(metadata_file):
+            raise ValueError("Store uses the sqlite catalog; it cannot be opened as json")
+        return JsonCatalog(metadata_file, index_file)
+
+    catalog = SqliteCatalog(db_path)
+    if os.path.exists(metadata_file):
+        # Crash giữa lúc migrate → catalog rỗng (chưa commit), làm lại từ đầu
+        if catalog.link_count() == 0:
+            links = migrate_json_catalog(JsonCatalog(metadata_file, index_file), catalog)
+            print(f"Migrated {links} snapshot(s) from metadata.json to the sqlite catalog")
+        os.replace(metadata_file, metadata_file + ".migrated")
+        if os.path.exists(index_file):
+            os.remove(index_file)
+    return catalog
@@ -0,0 +1,254 @@
+"""
+Persistent chunk index (SQLite): hash -> location, size, refcount (+ uncompressed length)
+Lets dedup lookups skip filesystem probes entirely
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+INDEX_VERSION = 1
+
+# ChunkStorage commit index định kỳ (sau khi chunk đã durable) để transaction không phình quá lớn
+COMMIT_EVERY = 10000
+
+LOOSE_LOCATION = "loose"
+
+
+def pack_location(pack_id: int, offset: int, length: int) -> str:
+    """Encode a pack location as stored in the index"""
+    return f"pack:{pack_id}:{offset}:{length}"
+
+
+def parse_pack_location(location: str) -> Optional[Tuple[int, int, int]]:
+    """Decode a pack location; None for loose chunks"""
+    if not location.startswith("pack:"):
+        return None
+    _, pack_id, offset, length = location.split(":")
+    return int(pack_id), int(offset), int(length)
+
+
+class ChunkIndex:
+    """On-disk chunk index opened once per process and shared by all threads"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.created = not os.path.exists(db_path)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                hash TEXT PRIMARY KEY,
+                location TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS snapshot_refs (
+                snapshot_id TEXT PRIMARY KEY
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS verified (
+                hash TEXT PRIMARY KEY,
+                verified_at REAL NOT NULL,
+                signature TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS chunk_lengths (
+                hash TEXT PRIMARY KEY,
+                length INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('version', ?)",
+            (str(INDEX_VERSION),)
+        )
+        self._conn.commit()
+
+    # ---------- lookups ----------
+
+    def get(self, chunk_hash: str) -> Optional[Tuple[str, int, int]]:
+        """(location, size, refcount) of a chunk, or None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT location, size, refcount FROM chunks WHERE hash = ?",
+                (chunk_hash,)
+            ).fetchone()
+
+    def contains(self, chunk_hash: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM chunks WHERE hash = ?", (chunk_hash,)
+            ).fetchone() is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def iter_entries(self) -> Iterator[Tuple[str, str, int, int]]:
+        """All (hash, location, size, refcount) rows (snapshot of the table at call time)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, location, size, refcount FROM chunks ORDER BY hash"
+            ).fetchall()
+        yield from rows
+
+    def unreferenced(self) -> List[Tuple[str, str, int]]:
+        """(hash, location, size) of chunks no counted snapshot references"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT hash, location, size FROM chunks WHERE refcount <= 0 ORDER BY location"
+            ).fetchall()
+
+    def iter_hashes(self) -> Iterator[str]:
+        """All indexed chunk hashes (snapshot of the table at call time)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT hash FROM chunks ORDER BY hash").fetchall()
+        for (chunk_hash,) in rows:
+            yield chunk_hash
+
+    def get_lengths(self, chunk_hashes: Iterable[str]) -> Dict[str, int]:
+        """Uncompressed lengths of the chunks that have one recorded"""
+        chunk_hashes = list(set(chunk_hashes))
+        lengths: Dict[str, int] = {}
+        with self._lock:
+            for i in range(0, len(chunk_hashes), 500):
+                batch = chunk_hashes[i:i + 500]
+                lengths.update(self._conn.execute(
+                    f"SELECT hash, length FROM chunk_lengths WHERE hash IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall())
+        return lengths
+
+    # ---------- updates ----------
+
+    def add(self, chunk_hash: str, location: str, size: int) -> None:
+        """Record a stored chunk (location is replaced if it already exists)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO chunks (hash, location, size) VALUES (?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET location = excluded.location, size = excluded.size",
+                (chunk_hash, location, size)
+            )
+
+    def set_length(self, chunk_hash: str, length: int) -> None:
+        """Record the uncompressed length of a chunk (used to seek inside snapshot files)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunk_lengths (hash, length) VALUES (?, ?)",
+                (chunk_hash, length)
+            )
+
+    def remove(self, chunk_hash: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE hash = ?", (chunk_hash,))
+            self._conn.execute("DELETE FROM verified WHERE hash = ?", (chunk_hash,))
+            self._conn.execute("DELETE FROM chunk_lengths WHERE hash = ?", (chunk_hash,))
+
+    def commit(self) -> None:
+        """Make pending index updates durable"""
+        with self._lock:
+            self._conn.commit()
+
+    def replace_all(self, entries: Iterable[Tuple[str, str, int]]) -> int:
+        """Replace the whole location table (used by rebuild); refcounts are reset"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM snapshot_refs")
+            self._conn.execute("DELETE FROM verified")
+            count = 0
+            for chunk_hash, location, size in entries:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chunks (hash, location, size) VALUES (?, ?, ?)",
+                    (chunk_hash, location, size)
+                )
+                count += 1
+            self._conn.commit()
+            return count
+
+    # ---------- refcounts ----------
+
+    def counted_snapshots(self) -> Set[str]:
+        """Snapshots whose chunk references are included in refcounts"""
+        with self._lock:
+            rows = self._conn.execute("SELECT snapshot_id FROM snapshot_refs").fetchall()
+        return {row[0] for row in rows}
+
+    def add_snapshot_refs(self, snapshot_id: str, chunk_hashes: Iterable[str]) -> None:
+        """
+        Increment refcounts for the distinct chunks of a snapshot
+        Atomic together with marking the snapshot as counted, so it is never counted twice
+        """
+        self._change_snapshot_refs(snapshot_id, chunk_hashes, +1)
+
+    def remove_snapshot_refs(self, snapshot_id: str, chunk_hashes: Iterable[str]) -> None:
+        """Decrement refcounts for the distinct chunks of a removed snapshot"""
+        self._change_snapshot_refs(snapshot_id, chunk_hashes, -1)
+
+    def drop_snapshot_refs(self, snapshot_id: str) -> None:
+        """Forget that a snapshot was counted without touching refcounts (manifest lost)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM snapshot_refs WHERE snapshot_id = ?", (snapshot_id,))
+            self._conn.commit()
+
+    def reset_refcounts(self, refcounts: Dict[str, int], snapshot_ids: Iterable[str]) -> None:
+        """Replace all refcounts with exact counts from a full mark"""
+        with self._lock:
+            self._conn.execute("UPDATE chunks SET refcount = 0")
+            self._conn.executemany("UPDATE chunks SET refcount = ? WHERE hash = ?",
+                                   ((count, h) for h, count in refcounts.items()))
+            self._conn.execute("DELETE FROM snapshot_refs")
+            self._conn.executemany("INSERT INTO snapshot_refs (snapshot_id) VALUES (?)",
+                                   ((snapshot_id,) for snapshot_id in snapshot_ids))
+            self._conn.commit()
+
+    def _change_snapshot_refs(self, snapshot_id: str, chunk_hashes: Iterable[str],
+                              delta: int) -> None:
+        with self._lock:
+            counted = self._conn.execute(
+                "SELECT 1 FROM snapshot_refs WHERE snapshot_id = ?", (snapshot_id,)
+            ).fetchone() is not None
+            if (delta > 0) == counted:
+                return
+
+            self._conn.executemany(
+                "UPDATE chunks SET refcount = MAX(refcount + ?, 0) WHERE hash = ?",
+                ((delta, h) for h in set(chunk_hashes))
+            )
+            if delta > 0:
+                self._conn.execute("INSERT INTO snapshot_refs (snapshot_id) VALUES (?)",
+                                   (snapshot_id,))
+            else:
+                self._conn.execute("DELETE FROM snapshot_refs WHERE snapshot_id = ?",
+                                   (snapshot_id,))
+            self._conn.commit()
+
+    # ---------- verification cache ----------
+
+    def get_verified(self, chunk_hash: str) -> Optional[Tuple[float, str]]:
+        """(verified_at, signature) of the last successful check of a chunk, or None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT verified_at, signature FROM verified WHERE hash = ?", (chunk_hash,)
+            ).fetchone()
+
+    def mark_verified(self, chunk_hash: str, signature: str, verified_at: float) -> None:
+        """Record a successful check (committed with the next commit())"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verified (hash, verified_at, signature) VALUES (?, ?, ?)",
+                (chunk_hash, verified_at, signature)
+            )
+
+    def clear_verified(self, chunk_hash: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM verified WHERE hash = ?", (chunk_hash,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
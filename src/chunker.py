@@ -0,0 +1,263 @@
+"""
+Chunking strategies for splitting files into content-addressable chunks
+"""
+import hashlib
+from typing import BinaryIO, Dict, Iterator, Optional
+from .utils import CHUNK_SIZE, read_file_in_chunks, open_source_file
+
+try:
+    import numpy as np
+except ImportError:  # FastCDC vẫn chạy (chậm hơn) bằng vòng lặp Python thuần
+    np = None
+
+# FastCDC defaults: trung bình 1 MiB để giữ tương đương với fixed chunking
+CDC_MIN_SIZE = 256 * 1024
+CDC_AVG_SIZE = CHUNK_SIZE
+CDC_MAX_SIZE = 4 * CHUNK_SIZE
+
+_MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+# Gear table sinh deterministic từ SHA-256 để chunk boundaries ổn định giữa các phiên bản
+_GEAR = [
+    int.from_bytes(hashlib.sha256(b"gear" + bytes([i])).digest()[:8], "big")
+    for i in range(256)
+]
+_GEAR_ARRAY = np.array(_GEAR, dtype=np.uint64) if np is not None else None
+
+# Hash tại 1 vị trí chỉ phụ thuộc 64 byte cuối (byte cũ hơn bị shift ra khỏi 64 bit)
+_GEAR_WINDOW = 64
+# Số vị trí kiểm tra mask mỗi lần (chunk thường cắt sớm hơn max_size nhiều)
+_SCAN_BLOCK = 256 * 1024
+# Số vị trí hash mỗi block (256 KiB uint64, vừa cache L2)
+_HASH_BLOCK = 32 * 1024
+
+
+def gear_hashes(data) -> "np.ndarray":
+    """
+    Gear hash at every position of data (uint64, wraps like the scalar loop), as if the
+    hash started from 0 before data[0]: out[i] = sum(G[data[i-j]] << j for j <= min(i, 63))
+    Computed with log2(64) = 6 shifted vector adds instead of one Python step per byte,
+    block by block so the working set stays in cache
+    """
+    gear = _GEAR_ARRAY[np.frombuffer(data, dtype=np.uint8)]
+    out = np.empty_like(gear)
+    work = np.empty(_HASH_BLOCK + _GEAR_WINDOW - 1, dtype=np.uint64)
+    shifted = np.empty_like(work)
+    for lo in range(0, len(gear), _HASH_BLOCK):
+        # Mỗi block kèm 63 vị trí trước đó làm cửa sổ
+        first = max(lo - (_GEAR_WINDOW - 1), 0)
+        hi = min(lo + _HASH_BLOCK, len(gear))
+        h = work[:hi - first]
+        t = shifted[:hi - first]
+        h[:] = gear[first:hi]
+        shift = 1
+        while shift < _GEAR_WINDOW:
+            np.left_shift(h[:-shift], np.uint64(shift), out=t[:-shift])
+            np.add(h[shift:], t[:-shift], out=h[shift:])
+            shift *= 2
+        out[lo:hi] = h[lo - first:]
+    return out
+
+
+class Chunker:
+    """Base class for chunkers"""
+
+    name = ""
+
+    def split(self, stream: BinaryIO) -> Iterator[bytes]:
+        """Yield chunks read from a binary stream"""
+        raise NotImplementedError
+
+    def chunk_file(self, file_path: str) -> Iterator[bytes]:
+        """Yield chunks of a file"""
+        with open_source_file(file_path) as f:
+            yield from self.split(f)
+
+    def to_config(self) -> Dict:
+        """Describe chunker parameters (recorded in store config and manifest)"""
+        raise NotImplementedError
+
+
+class FixedChunker(Chunker):
+    """Split files at fixed offsets (legacy behaviour)"""
+
+    name = "fixed"
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        if chunk_size <= 0:
+            raise ValueError(f"Invalid chunk size: {chunk_size}")
+        self.chunk_size = chunk_size
+
+    def split(self, stream: BinaryIO) -> Iterator[bytes]:
+        while True:
+            chunk = stream.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def chunk_file(self, file_path: str) -> Iterator[bytes]:
+        return read_file_in_chunks(file_path, self.chunk_size)
+
+    def to_config(self) -> Dict:
+        return {"type": self.name, "chunk_size": self.chunk_size}
+
+
+class FastCDCChunker(Chunker):
+    """
+    Content-defined chunking with a Gear rolling hash (FastCDC)
+    Boundaries depend on content, so an insertion only changes nearby chunks
+    """
+
+    name = "fastcdc"
+
+    def __init__(self, min_size: int = CDC_MIN_SIZE, avg_size: int = CDC_AVG_SIZE,
+                 max_size: int = CDC_MAX_SIZE):
+        if not 64 <= min_size <= avg_size <= max_size:
+            raise ValueError(
+                f"Invalid FastCDC sizes: require 64 <= min ({min_size}) <= "
+                f"avg ({avg_size}) <= max ({max_size})"
+            )
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+
+        # Normalized chunking: mask khó hơn trước avg, dễ hơn sau avg
+        bits = max(avg_size.bit_length() - 1, 2)
+        self._mask_s = self._make_mask(bits + 2)
+        self._mask_l = self._make_mask(bits - 2)
+
+    @staticmethod
+    def _make_mask(bits: int) -> int:
+        """Mask on the high bits, which depend on the most bytes of history"""
+        bits = max(1, min(bits, 63))
+        return ((1 << bits) - 1) << (64 - bits)
+
+    def _cut_point(self, data, n: int) -> int:
+        """Find the next chunk boundary in data[:n] (scalar reference implementation)"""
+        if n <= self.min_size:
+            return n
+        if n > self.max_size:
+            n = self.max_size
+        normal = min(self.avg_size, n)
+
+        gear = _GEAR
+        mask_s = self._mask_s
+        mask_l = self._mask_l
+        h = 0
+        i = self.min_size
+        # Bỏ qua min_size byte đầu (cut-point skipping)
+        for b in data[self.min_size:normal]:
+            h = ((h << 1) + gear[b]) & _MASK_64
+            i += 1
+            if not h & mask_s:
+                return i
+        for b in data[normal:n]:
+            h = ((h << 1) + gear[b]) & _MASK_64
+            i += 1
+            if not h & mask_l:
+                return i
+        return n
+
+    def _cut_point_vectorized(self, data, hashes: "np.ndarray", n: int) -> int:
+        """
+        Same boundary as _cut_point(data, n); hashes = gear_hashes over data (or a longer
+        buffer ending with data) aligned with data[0]
+        """
+        if n <= self.min_size:
+            return n
+        if n > self.max_size:
+            n = self.max_size
+        normal = min(self.avg_size, n)
+
+        # 63 byte đầu sau min_size: hash mới bắt đầu từ 0, chưa đủ cửa sổ → tính tuần tự
+        head = min(self.min_size + _GEAR_WINDOW - 1, n)
+        gear = _GEAR
+        h = 0
+        i = self.min_size
+        for b in data[self.min_size:head]:
+            h = ((h << 1) + gear[b]) & _MASK_64
+            i += 1
+            if not h & (self._mask_s if i <= normal else self._mask_l):
+                return i
+
+        # Sau đó hash trùng với hash theo cửa sổ 64 byte đã tính sẵn
+        for start, end, mask in ((head, normal, self._mask_s), (max(head, normal), n, self._mask_l)):
+            mask = np.uint64(mask)
+            for block in range(start, end, _SCAN_BLOCK):
+                hits = np.flatnonzero((hashes[block:min(block + _SCAN_BLOCK, end)] & mask) == 0)
+                if hits.size:
+                    return block + int(hits[0]) + 1
+        return n
+
+    def split(self, stream: BinaryIO) -> Iterator[bytes]:
+        buf = bytearray()
+        hashes = None
+        start = 0
+        eof = False
+        while True:
+            # Giữ ít nhất max_size byte sau vị trí hiện tại để tìm boundary
+            if not eof and len(buf) - start < self.max_size:
+                del buf[:start]
+                if hashes is not None:
+                    hashes = hashes[start:]
+                start = 0
+                old_len = len(buf)
+                while not eof and len(buf) < self.max_size:
+                    data = stream.read(self.max_size)
+                    if not data:
+                        eof = True
+                        break
+                    buf += data
+                if np is not None and len(buf) > old_len:
+                    # Chỉ hash phần mới đọc (kèm 63 byte trước đó làm cửa sổ)
+                    overlap = min(old_len, _GEAR_WINDOW - 1)
+                    with memoryview(buf) as view:
+                        fresh = gear_hashes(view[old_len - overlap:])[overlap:]
+                    hashes = fresh if hashes is None else np.concatenate((hashes, fresh))
+            if start == len(buf):
+                break
+
+            # memoryview: không copy buffer để tìm boundary, chỉ copy chunk được trả về
+            with memoryview(buf) as view:
+                remaining = view[start:]
+                if hashes is not None:
+                    cut = self._cut_point_vectorized(remaining, hashes[start:], len(remaining))
+                else:
+                    cut = self._cut_point(remaining, len(remaining))
+                chunk = bytes(remaining[:cut])
+                remaining.release()
+            yield chunk
+            start += cut
+
+    def to_config(self) -> Dict:
+        return {
+            "type": self.name,
+            "min_size": self.min_size,
+            "avg_size": self.avg_size,
+            "max_size": self.max_size,
+        }
+
+
+CHUNKERS = {
+    FixedChunker.name: FixedChunker,
+    FastCDCChunker.name: FastCDCChunker,
+}
+
+
+def get_chunker(config: Optional[Dict] = None) -> Chunker:
+    """
+    Build a chunker from its config dict
+    None or missing config means the legacy fixed 1 MiB chunker
+    """
+    if not config:
+        return FixedChunker()
+
+    params = dict(config)
+    chunker_type = params.pop("type", FixedChunker.name)
+    if chunker_type not in CHUNKERS:
+        raise ValueError(f"Unknown chunker: {chunker_type}. Must be one of {sorted(CHUNKERS)}")
+
+    try:
+        return CHUNKERS[chunker_type](**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for chunker '{chunker_type}': {e}")
@@ -5,14 +5,18 @@ import argparse
 import sys
 import os
 import time
-import hashlib
 import json
-from typing import List
+from typing import BinaryIO, List, Dict, Optional
 from .storage import ChunkStorage, SnapshotManager
-from .journal import Journal
+from .garbage import GarbageCollector
+from .retention import RETENTION_RULES, apply_retention
+from .manifest import MANIFEST_FORMATS
+from .compression import CODECS, DEFAULT_COMPRESSION
+from .catalog import CATALOG_BACKENDS
+from .journal import Journal, DURABILITY_LEVELS
 from .policy import PolicyManager
 from .audit import AuditLogger
-from .utils import get_os_user, ensure_dir, canonical_json, compute_hash
+from .utils import get_os_user, ensure_dir, canonical_json, compute_hash, parse_duration, parse_time
 from .exceptions import PolicyDeniedError, IntegrityError, SnapshotNotFoundError
 
 class BackupCLI:
@@ -75,12 +79,13 @@ class BackupCLI:
         """Setup all components with automatic recovery"""
         self.store_path = store_path
         
-        # Tạo journal TRƯỚC
+        # Storage trước: journal đọc durability level từ store config
+        self.storage = ChunkStorage(self.store_path)
+        
         journal_path = os.path.join(self.store_path, "journal.wal")
-        self.journal = Journal(journal_path)
+        self.journal = Journal(journal_path, self.storage.journal_durability)
         
-        # Tạo storage và snapshot manager (tự động recovery)
-        self.storage = ChunkStorage(self.store_path)
+        # Snapshot manager dùng journal cho mọi transaction
         self.snapshot_manager = SnapshotManager(self.storage, self.journal)
         
         # Policy và audit
@@ -134,8 +139,11 @@ class BackupCLI:
             print(f"Command failed: {e}")
             sys.exit(1)
 
-    def init(self, store_path: str) -> None:
-        """Initialize a new backup store"""
+    def init(self, store_path: str, store_config: Optional[Dict] = None) -> None:
+        """
+        Initialize a new backup store
+        store_config: options chosen at init (chunker, storage backend, ...)
+        """
         # 1. Get user FIRST
         try:
             self.current_user = get_os_user()
@@ -163,17 +171,29 @@ class BackupCLI:
         # 4. Setup store directory
         ensure_dir(store_path)
         
-        # 5. CHỈ tạo Journal và recovery TRƯỚC
-        journal = Journal(os.path.join(store_path, "journal.wal"))
-        incomplete = journal.recover()
-        if incomplete:
-            print(f"Recovered from crash. Cleaned incomplete: {incomplete}")
-        
-        store_path = os.path.abspath(store_path)
-
-        # 6. Bây giờ mới setup components đầy đủ
+        # 5. Setup components đầy đủ (SnapshotManager tự recovery từ journal)
         self._setup_components(store_path)
         
+        # Ghi store config cho store mới hoặc khi được chỉ định
+        store_config = dict(store_config or {})
+        if store_config or not os.path.exists(self.storage.config_file):
+            store_config.setdefault("chunker", self.storage.chunker.to_config())
+            store_config.setdefault("storage", self.storage.config.get("storage", "loose"))
+            try:
+                self.storage.update_config(**store_config)
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            self.journal.durability = self.storage.journal_durability
+            
+            # Đổi catalog → mở lại (metadata.json được migrate sang catalog.db)
+            if self.snapshot_manager.catalog.backend != self.storage.catalog_backend:
+                self.snapshot_manager.catalog.close()
+                self.snapshot_manager = SnapshotManager(self.storage, self.journal)
+        
+        # Bloom filter được build lại theo số chunk hiện có
+        bloom = self.storage.rebuild_bloom()
+        
         # LƯU CONFIG SAU KHI THÀNH CÔNG
         self._save_store_config(store_path)
 
@@ -184,9 +204,17 @@ class BackupCLI:
         
         print(f"Initialized backup store at: {store_path}")
         print(f"Config saved to: backup_config.json")
+        print(f"Chunker: {self.storage.chunker.to_config()}")
+        print(f"Storage: {self.storage.config.get('storage', 'loose')}")
+        print(f"Manifest format: {self.storage.manifest_format}")
+        print(f"Compression: {self.storage.config.get('compression', DEFAULT_COMPRESSION)}")
+        print(f"Catalog: {self.storage.catalog_backend}")
+        print(f"Journal durability: {self.storage.journal_durability}")
+        print(f"Bloom filter: {bloom.count} chunks, fp rate {bloom.fp_rate}")
         print(f"Current user: {self.current_user}")
         
-    def backup(self, source_path: str, label: str = "") -> None:
+    def backup(self, source_path: str, label: str = "", jobs: int = 1,
+               full: bool = False, resume: bool = False) -> None:
         """Create a backup snapshot"""
         # Kiểm tra initialization
         self._ensure_initialized()
@@ -194,12 +222,13 @@ class BackupCLI:
         # Kiểm tra policy TRƯỚC
         try:
             self._audit_and_enforce("backup", [source_path, f"--label {label}" if label else ""],
-                                self._backup_internal, source_path, label)
+                                self._backup_internal, source_path, label, jobs, full, resume)
         except Exception as e:
             print(f"Backup failed: {e}")
             return
 
-    def _backup_internal(self, source_path: str, label: str = "") -> None:
+    def _backup_internal(self, source_path: str, label: str = "", jobs: int = 1,
+                         full: bool = False, resume: bool = False) -> None:
         """Internal backup implementation (after policy check)"""
         source_path = os.path.abspath(source_path)
         
@@ -213,65 +242,45 @@ class BackupCLI:
         print(f"Creating backup of: {source_path}")
         if label:
             print(f"Label: {label}")
-        
-        # Tạo snapshot ID
-        snapshot_id = f"snap_{int(time.time())}_{hashlib.sha256(str(time.time_ns()).encode()).hexdigest()[:8]}"
-        
-        # Bắt đầu WAL transaction
-        self.journal.begin_transaction(snapshot_id)
-        
-        try:
-            # Tạo snapshot (gọi phiên bản có journal)
-            # CHÚ Ý: SnapshotManager cần được khởi tạo với journal
-            metadata = self.snapshot_manager.create_snapshot(source_path, label)
-            
-            # KHÔNG CẦN GỌI journal.add_manifest ở đây nữa
-            # vì SnapshotManager.create_snapshot đã xử lý journaling
-            
-            # In kết quả
-            print(f"✓ Backup created successfully!")
-            print(f"  Snapshot ID: {metadata['id']}")
-            print(f"  Merkle Root: {metadata['merkle_root'][:16]}...")
-            print(f"  Files: {metadata['total_files']}, Chunks: {metadata['total_chunks']}")
-            
-        except Exception as e:
-            # Rollback trong WAL
-            self.journal.abort(snapshot_id)
-            
-            # Clean up any partial files
-            self._cleanup_failed_backup(snapshot_id)
-            
-            # Re-raise với context
-            raise RuntimeError(f"Backup failed for {source_path}: {str(e)}") from e
-
-    def _cleanup_failed_backup(self, snapshot_id: str) -> None:
-        """Clean up files from failed backup"""
-        try:
-            # Xóa manifest file nếu tồn tại
-            manifest_path = os.path.join(self.store_path, "snapshots", f"{snapshot_id}.manifest")
-            if os.path.exists(manifest_path):
-                os.remove(manifest_path)
-            
-            # Note: Không xóa chunks vì chúng có thể được dùng bởi snapshot khác
-            # Chunks được deduplicated nên safe
-            
-        except Exception as e:
-            print(f"Warning: Error during cleanup: {e}")
+        if jobs > 1:
+            print(f"Jobs: {jobs}")
+        if full:
+            print("Full rescan: file cache ignored")
+        if resume:
+            print("Resume: reusing files checkpointed by the last interrupted backup")
+        
+        # SnapshotManager.create_snapshot tự mở/commit/abort transaction journal của snapshot
+        metadata = self.snapshot_manager.create_snapshot(source_path, label, jobs=jobs,
+                                                         use_cache=not full, resume=resume)
+        
+        # In kết quả
+        print(f"✓ Backup created successfully!")
+        print(f"  Snapshot ID: {metadata['id']}")
+        print(f"  Merkle Root: {metadata['merkle_root'][:16]}...")
+        print(f"  Files: {metadata['total_files']}, Chunks: {metadata['total_chunks']}")
+        print(f"  Unchanged files (from cache): {metadata.get('reused_files', 0)}")
+        if resume:
+            print(f"  Resumed files (from journal): {metadata.get('resumed_files', 0)}")
     
-    def list_snapshots(self) -> None:
-        """List all snapshots"""
+    def list_snapshots(self, limit: Optional[int] = None, offset: int = 0,
+                       label: Optional[str] = None, since: Optional[float] = None,
+                       until: Optional[float] = None) -> None:
+        """List snapshots (newest first), optionally filtered and paged"""
         self._ensure_initialized()
         
-        snapshots = self.snapshot_manager.list_snapshots()
+        snapshots = self.snapshot_manager.list_snapshots(offset, limit, label, since, until)
         
         if not snapshots:
             print("No snapshots found.")
             return
         
-        print(f"Found {len(snapshots)} snapshot(s):")
+        total = self.snapshot_manager.count_snapshots(label, since, until)
+        print(f"Found {total} snapshot(s):")
+        if len(snapshots) < total:
+            print(f"Showing {offset + 1}-{offset + len(snapshots)} of {total}")
         print("-" * 80)
         
-        for i, snap in enumerate(snapshots, 1):
+        for i, snap in enumerate(snapshots, offset + 1):
             created_time = time.strftime('%Y-%m-%d %H:%M:%S', 
                                        time.localtime(snap["created_at"]))
             print(f"{i}. ID: {snap['id']}")
@@ -281,32 +290,71 @@ class BackupCLI:
             print(f"   Merkle Root: {snap['merkle_root'][:16]}...")
             print()
     
-    def verify(self, snapshot_id: str) -> None:
+    @staticmethod
+    def _verify_max_age(max_age: Optional[float], deep: bool) -> Optional[float]:
+        """Mặc định (và --deep) hash lại mọi chunk; chỉ --max-age mới dùng lại kết quả verify cũ"""
+        if deep:
+            return None
+        return max_age
+    
+    def _print_verify_result(self, snapshot_id: str, is_valid: bool, message: str) -> None:
+        if is_valid:
+            print(f"✓ Snapshot {snapshot_id} is VALID")
+            print(f"  {message}")
+        else:
+            print(f"✗ Snapshot {snapshot_id} is INVALID")
+            print(f"  Reason: {message}")
+    
+    def verify(self, snapshot_id: str, jobs: int = 1, max_age: Optional[float] = None,
+               deep: bool = False) -> None:
         """Verify snapshot integrity"""
         self._ensure_initialized()
         
         print(f"Verifying snapshot: {snapshot_id}")
         
         try:
-            is_valid, message = self.snapshot_manager.verify_snapshot(snapshot_id)
-            
-            if is_valid:
-                print(f"✓ Snapshot {snapshot_id} is VALID")
-                print(f"  {message}")
-            else:
-                print(f"✗ Snapshot {snapshot_id} is INVALID")
-                print(f"  Reason: {message}")
+            is_valid, message = self.snapshot_manager.verify_snapshot(
+                snapshot_id, jobs=jobs, max_age=self._verify_max_age(max_age, deep)
+            )
+            self._print_verify_result(snapshot_id, is_valid, message)
+            stats = self.snapshot_manager.verify_stats
+            print(f"  Chunks hashed: {stats['hashed']}, from cache: {stats['cached']}")
                 
         except SnapshotNotFoundError:
             print(f"Error: Snapshot not found: {snapshot_id}")
     
-    def restore(self, snapshot_id: str, target_path: str) -> None:
-        """Restore snapshot to target directory"""
+    def verify_all(self, jobs: Optional[int] = None, max_age: Optional[float] = None,
+                   deep: bool = False) -> None:
+        """Verify every snapshot in a single pass over unique chunks"""
+        self._ensure_initialized()
+        
+        jobs = jobs or os.cpu_count() or 1
+        print(f"Verifying all snapshots in {self.store_path} ({jobs} jobs)...")
+        results = self.snapshot_manager.verify_all_snapshots(
+            jobs=jobs, max_age=self._verify_max_age(max_age, deep)
+        )
+        
+        for snapshot_id, is_valid, message in results:
+            self._print_verify_result(snapshot_id, is_valid, message)
+        
+        invalid = sum(1 for _, is_valid, _ in results if not is_valid)
+        stats = self.snapshot_manager.verify_stats
+        print(f"Chunks hashed: {stats['hashed']}, from cache: {stats['cached']}")
+        print(f"Snapshots verified: {len(results)}, invalid: {invalid}")
+    
+    def restore(self, snapshot_id: str, target_path: str, jobs: int = 1,
+                verify_first: bool = False, includes: Optional[List[str]] = None,
+                excludes: Optional[List[str]] = None) -> None:
+        """Restore snapshot (or only the included paths) to target directory"""
         self._ensure_initialized()
         
         target_path = os.path.abspath(target_path)
         
         print(f"Restoring snapshot {snapshot_id} to: {target_path}")
+        if includes:
+            print(f"Include: {', '.join(includes)}")
+        if excludes:
+            print(f"Exclude: {', '.join(excludes)}")
         
         if os.path.exists(target_path) and os.listdir(target_path):
             response = input(f"Target directory '{target_path}' is not empty. Continue? (y/N): ")
@@ -315,14 +363,108 @@ class BackupCLI:
                 return
         
         try:
-            self.snapshot_manager.restore_snapshot(snapshot_id, target_path)
+            self.snapshot_manager.restore_snapshot(snapshot_id, target_path, jobs=jobs,
+                                                   verify_first=verify_first,
+                                                   includes=includes or (), excludes=excludes or ())
             print("✓ Restore completed successfully!")
             
-        except IntegrityError as e:
+        except (IntegrityError, ValueError) as e:
             print(f"✗ Restore failed: {e}")
         except SnapshotNotFoundError:
             print(f"Error: Snapshot not found: {snapshot_id}")
     
+    def cat(self, snapshot_id: str, path: str, offset: int = 0, length: Optional[int] = None,
+            out: Optional[BinaryIO] = None) -> None:
+        """Stream one file (or a byte range of it) out of a snapshot"""
+        self._ensure_initialized()
+        
+        # Dữ liệu đi ra stdout thật; main.py chuyển mọi thông báo khác sang stderr
+        out = out or sys.__stdout__.buffer
+        reader = self.snapshot_manager.open_file(snapshot_id, path)
+        try:
+            for piece in reader.iter_range(offset, length):
+                out.write(piece)
+            out.flush()
+        except BrokenPipeError:
+            # `cat ... | head`: bên đọc đã đóng pipe, không phải lỗi
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, out.fileno())
+    
+    def migrate_storage(self, pack_size: Optional[int] = None) -> None:
+        """Migrate loose chunks into the packed backend"""
+        self._ensure_initialized()
+        
+        print(f"Migrating chunks in {self.store_path} to pack files...")
+        stats = self.storage.migrate_to_packs(pack_size)
+        
+        print(f"✓ Migration completed")
+        print(f"  Chunks packed: {stats['migrated']}")
+        print(f"  Loose files removed: {stats['removed']}")
+        if stats["corrupted"]:
+            print(f"  Corrupted chunks left in loose layout: {stats['corrupted']}")
+    
+    def rebuild_index(self) -> None:
+        """Rebuild the chunk index and refcounts from the store contents"""
+        self._ensure_initialized()
+        
+        print(f"Rebuilding chunk index for {self.store_path}...")
+        chunks = self.storage.rebuild_index()
+        snapshots = self.snapshot_manager.sync_refcounts()
+        
+        print(f"✓ Chunk index rebuilt")
+        print(f"  Chunks indexed: {chunks}")
+        print(f"  Snapshots counted: {snapshots}")
+    
+    def forget(self, snapshot_id: str) -> None:
+        """Remove a snapshot, keeping a tombstone for the hash chain"""
+        self._ensure_initialized()
+        
+        try:
+            self.snapshot_manager.forget_snapshots([snapshot_id])
+        except SnapshotNotFoundError:
+            print(f"Error: Snapshot not found: {snapshot_id}")
+            return
+        
+        print(f"✓ Snapshot {snapshot_id} forgotten")
+        print("  Run 'gc' to reclaim chunks no other snapshot uses")
+    
+    def gc(self, dry_run: bool = False, full: bool = False) -> None:
+        """Reclaim chunks no snapshot references"""
+        self._ensure_initialized()
+        
+        mode = "full mark" if full else "incremental"
+        print(f"Collecting garbage in {self.store_path} ({mode}{', dry run' if dry_run else ''})...")
+        stats = GarbageCollector(self.snapshot_manager).collect(full=full, dry_run=dry_run)
+        
+        verb = "Would remove" if dry_run else "Removed"
+        print(f"{'✓ Dry run completed' if dry_run else '✓ Garbage collection completed'}")
+        print(f"  {verb} chunks: {stats['chunks']} ({stats['bytes']} bytes)")
+        print(f"  Packs deleted: {stats['packs_deleted']}, repacked: {stats['packs_repacked']} "
+              f"({stats['moved']} live chunks moved)")
+    
+    def prune(self, dry_run: bool = False, run_gc: bool = True) -> None:
+        """Forget snapshots not kept by the retention rules in policy.yaml, then gc"""
+        self._ensure_initialized()
+        
+        rules = self.policy_manager.get_retention()
+        kept, removed = apply_retention(self.snapshot_manager.list_snapshots(), rules)
+        
+        print(f"Retention: {', '.join(f'{rule} {rules[rule]}' for rule in RETENTION_RULES if rule in rules)}")
+        for snapshot_id, reasons in kept.items():
+            print(f"  keep   {snapshot_id} ({', '.join(reasons)})")
+        for snapshot_id in removed:
+            print(f"  remove {snapshot_id}")
+        print(f"Snapshots kept: {len(kept)}, removed: {len(removed)}")
+        
+        if dry_run or not removed:
+            return
+        
+        # Một transaction cho toàn bộ danh sách, metadata chỉ ghi 1 lần
+        self.snapshot_manager.forget_snapshots(removed)
+        print(f"✓ Forgot {len(removed)} snapshot(s)")
+        if run_gc:
+            self.gc()
+    
     def audit_verify(self) -> None:
         """Verify audit log integrity"""
         if not self.audit_logger:
@@ -369,6 +511,45 @@ class BackupCLI:
             
             print("-" * 100)
     
+    @staticmethod
+    def _chunker_config_from_args(args) -> Optional[Dict]:
+        """Build chunker config from init arguments"""
+        if not args.chunker:
+            return None
+        
+        config = {"type": args.chunker}
+        if args.chunker == "fixed":
+            if args.chunk_size:
+                config["chunk_size"] = args.chunk_size
+        else:
+            for key in ("min_size", "avg_size", "max_size"):
+                value = getattr(args, key)
+                if value:
+                    config[key] = value
+        return config
+    
+    def _store_config_from_args(self, args) -> Dict:
+        """Build store config from init arguments"""
+        config = {}
+        chunker_config = self._chunker_config_from_args(args)
+        if chunker_config:
+            config["chunker"] = chunker_config
+        if args.storage:
+            config["storage"] = args.storage
+        if args.pack_size:
+            config["pack_size"] = args.pack_size * 1024 * 1024
+        if args.bloom_fp_rate is not None:
+            config["bloom_fp_rate"] = args.bloom_fp_rate
+        if args.manifest_format:
+            config["manifest_format"] = args.manifest_format
+        if args.compression:
+            config["compression"] = args.compression
+        if args.catalog:
+            config["catalog"] = args.catalog
+        if args.journal_durability:
+            config["journal_durability"] = args.journal_durability
+        return config
+    
     def run(self):
         """Main CLI entry point"""
         parser = argparse.ArgumentParser(
@@ -379,23 +560,133 @@ class BackupCLI:
         # Init command
         init_parser = subparsers.add_parser("init", help="Initialize backup store")
         init_parser.add_argument("store_path", help="Path to backup store")
+        init_parser.add_argument("--chunker", choices=["fixed", "fastcdc"],
+                                 help="Chunking strategy (default: fixed 1 MiB)")
+        init_parser.add_argument("--chunk-size", type=int,
+                                 help="Chunk size in bytes for the fixed chunker")
+        init_parser.add_argument("--min-size", type=int,
+                                 help="FastCDC minimum chunk size in bytes")
+        init_parser.add_argument("--avg-size", type=int,
+                                 help="FastCDC average chunk size in bytes")
+        init_parser.add_argument("--max-size", type=int,
+                                 help="FastCDC maximum chunk size in bytes")
+        init_parser.add_argument("--storage", choices=["loose", "packed"],
+                                 help="Chunk storage layout (default: loose, one file per chunk)")
+        init_parser.add_argument("--pack-size", type=int,
+                                 help="Target pack file size in MiB for packed storage (default: 128)")
+        init_parser.add_argument("--bloom-fp-rate", type=float,
+                                 help="False-positive rate of the chunk Bloom filter (default: 0.01)")
+        init_parser.add_argument("--manifest-format", choices=list(MANIFEST_FORMATS),
+                                 help="Manifest format for new snapshots: json (v1, default) "
+                                      "jsonl (v2, streamed for very large trees) "
+                                      "or binary (v3, compact streamed records)")
+        init_parser.add_argument("--catalog", choices=list(CATALOG_BACKENDS),
+                                 help="Snapshot catalog: json (metadata.json, default) or sqlite "
+                                      "(catalog.db, indexed; existing metadata is migrated)")
+        init_parser.add_argument("--journal-durability", choices=list(DURABILITY_LEVELS),
+                                 help="When journal records are fsynced: full (every record), "
+                                      "normal (batched per transaction, default) or off (never)")
+        init_parser.add_argument("--compression", choices=list(CODECS),
+                                 help="Per-chunk compression codec (default: none); "
+                                      "incompressible chunks are stored raw")
         
         # Backup command
         backup_parser = subparsers.add_parser("backup", help="Create backup snapshot")
         backup_parser.add_argument("source_path", help="Path to backup")
         backup_parser.add_argument("--label", help="Snapshot label", default="")
+        backup_parser.add_argument("--jobs", "-j", type=int, default=1,
+                                   help="Number of parallel reader/hash/writer workers")
+        backup_parser.add_argument("--full", action="store_true",
+                                   help="Ignore the file cache and re-read every file")
+        backup_parser.add_argument("--resume", action="store_true",
+                                   help="Continue the last interrupted backup of this source")
         
         # List command
-        subparsers.add_parser("list", help="List snapshots")
+        list_parser = subparsers.add_parser("list", help="List snapshots")
+        list_parser.add_argument("--limit", type=int, help="Show at most N snapshots")
+        list_parser.add_argument("--offset", type=int, default=0,
+                                 help="Skip the N newest matching snapshots")
+        list_parser.add_argument("--label", help="Only snapshots with this label")
+        list_parser.add_argument("--since", type=parse_time,
+                                 help="Created at or after (e.g. 2024-05-01, '2024-05-01 13:30', 7d)")
+        list_parser.add_argument("--until", type=parse_time,
+                                 help="Created before (same formats as --since)")
         
         # Verify command
         verify_parser = subparsers.add_parser("verify", help="Verify snapshot")
-        verify_parser.add_argument("snapshot_id", help="Snapshot ID to verify")
+        verify_parser.add_argument("snapshot_id", nargs="?", help="Snapshot ID to verify")
+        verify_parser.add_argument("--all", action="store_true", dest="verify_all",
+                                   help="Same as verify-all")
+        verify_parser.add_argument("--deep", action="store_true",
+                                   help="Re-hash every chunk even if --max-age is given (default)")
+        verify_parser.add_argument("--max-age", type=parse_duration,
+                                   help="Reuse chunk checks younger than this (e.g. 3600, 12h, 7d); "
+                                        "without it every chunk is re-hashed")
+        verify_parser.add_argument("--jobs", "-j", type=int,
+                                   help="Number of chunks checked in parallel "
+                                        "(default: 1, or CPU count with --all)")
+        
+        # Verify all command
+        verify_all_parser = subparsers.add_parser(
+            "verify-all", help="Verify every snapshot, hashing each unique chunk once"
+        )
+        verify_all_parser.add_argument("--deep", action="store_true",
+                                       help="Re-hash every chunk even if --max-age is given (default)")
+        verify_all_parser.add_argument("--max-age", type=parse_duration,
+                                       help="Reuse chunk checks younger than this; "
+                                            "without it every chunk is re-hashed")
+        verify_all_parser.add_argument("--jobs", "-j", type=int,
+                                       help="Number of chunks checked in parallel (default: CPU count)")
         
         # Restore command
         restore_parser = subparsers.add_parser("restore", help="Restore snapshot")
         restore_parser.add_argument("snapshot_id", help="Snapshot ID to restore")
         restore_parser.add_argument("target_path", help="Target directory")
+        restore_parser.add_argument("--jobs", "-j", type=int, default=1,
+                                    help="Number of files restored in parallel")
+        restore_parser.add_argument("--verify-first", action="store_true",
+                                    help="Verify every chunk before restoring (reads chunks twice)")
+        restore_parser.add_argument("--include", action="append", metavar="PATH",
+                                    help="Only restore this file, directory or glob (repeatable)")
+        restore_parser.add_argument("--exclude", action="append", metavar="PATH",
+                                    help="Skip this file, directory or glob (repeatable)")
+        
+        # Cat command
+        cat_parser = subparsers.add_parser("cat", help="Write a file from a snapshot to stdout")
+        cat_parser.add_argument("snapshot_id", help="Snapshot ID")
+        cat_parser.add_argument("path", help="File path inside the snapshot")
+        cat_parser.add_argument("--offset", type=int, default=0, help="First byte to write")
+        cat_parser.add_argument("--length", type=int, help="Number of bytes to write (default: to the end)")
+        
+        # Migrate storage command
+        migrate_parser = subparsers.add_parser("migrate-storage",
+                                               help="Move loose chunks into pack files")
+        migrate_parser.add_argument("--pack-size", type=int,
+                                    help="Target pack file size in MiB (default: 128)")
+        
+        # Rebuild chunk index command
+        subparsers.add_parser("rebuild-index",
+                              help="Rebuild the chunk index from chunks and pack files")
+        
+        # Forget command
+        forget_parser = subparsers.add_parser("forget", help="Remove a snapshot (run gc afterwards)")
+        forget_parser.add_argument("snapshot_id", help="Snapshot ID to forget")
+        
+        # Garbage collection command
+        gc_parser = subparsers.add_parser("gc", help="Reclaim chunks no snapshot references")
+        gc_parser.add_argument("--dry-run", action="store_true",
+                               help="Only report what would be reclaimed")
+        gc_parser.add_argument("--full", action="store_true",
+                               help="Mark from every manifest instead of trusting refcounts")
+        
+        # Prune command
+        prune_parser = subparsers.add_parser(
+            "prune", help="Forget snapshots outside the retention rules in policy.yaml, then gc"
+        )
+        prune_parser.add_argument("--dry-run", action="store_true",
+                                  help="Only show which snapshots would be kept and removed")
+        prune_parser.add_argument("--no-gc", action="store_true",
+                                  help="Forget snapshots but leave chunk collection to a later gc")
         
         # Audit commands
         subparsers.add_parser("audit-verify", help="Verify audit log integrity")
@@ -412,25 +703,65 @@ class BackupCLI:
             "backup": self.backup,
             "list": self.list_snapshots,
             "verify": self.verify,
+            "verify-all": self.verify_all,
             "restore": self.restore,
             "audit-verify": self.audit_verify,
+            "migrate-storage": self.migrate_storage,
+            "rebuild-index": self.rebuild_index,
+            "forget": self.forget,
+            "gc": self.gc,
+            "prune": self.prune,
         }
         
         # Execute command
         try:
             if args.command == "init":
-                self.init(args.store_path)
+                self.init(args.store_path, self._store_config_from_args(args))
             elif args.command == "backup":
-                self.backup(args.source_path, args.label)
+                self.backup(args.source_path, args.label, args.jobs, args.full, args.resume)
             elif args.command == "list":
                 self._audit_and_enforce("list-snapshots", [],
-                                       self.list_snapshots)
+                                       self.list_snapshots, args.limit, args.offset,
+                                       args.label, args.since, args.until)
             elif args.command == "verify":
-                self._audit_and_enforce("verify", [args.snapshot_id],
-                                       self.verify, args.snapshot_id)
+                if bool(args.snapshot_id) == args.verify_all:
+                    parser.error("verify needs either a snapshot ID or --all")
+                if args.verify_all:
+                    self._audit_and_enforce("verify-all", [],
+                                           self.verify_all, args.jobs, args.max_age, args.deep)
+                else:
+                    self._audit_and_enforce("verify", [args.snapshot_id],
+                                           self.verify, args.snapshot_id, args.jobs or 1,
+                                           args.max_age, args.deep)
+            elif args.command == "verify-all":
+                self._audit_and_enforce("verify-all", [],
+                                       self.verify_all, args.jobs, args.max_age, args.deep)
             elif args.command == "restore":
-                self._audit_and_enforce("restore", [args.snapshot_id, args.target_path],
-                                       self.restore, args.snapshot_id, args.target_path)
+                filters = ([f"--include {p}" for p in args.include or []]
+                           + [f"--exclude {p}" for p in args.exclude or []])
+                self._audit_and_enforce("restore", [args.snapshot_id, args.target_path] + filters,
+                                       self.restore, args.snapshot_id, args.target_path, args.jobs,
+                                       args.verify_first, args.include, args.exclude)
+            elif args.command == "cat":
+                self._audit_and_enforce("cat", [args.snapshot_id, args.path],
+                                       self.cat, args.snapshot_id, args.path, args.offset, args.length)
+            elif args.command == "migrate-storage":
+                self._ensure_initialized()
+                pack_size = args.pack_size * 1024 * 1024 if args.pack_size else None
+                self._audit_and_enforce("migrate-storage", [str(args.pack_size or "")],
+                                       self.migrate_storage, pack_size)
+            elif args.command == "rebuild-index":
+                self._audit_and_enforce("rebuild-index", [],
+                                       self.rebuild_index)
+            elif args.command == "forget":
+                self._audit_and_enforce("forget", [args.snapshot_id],
+                                       self.forget, args.snapshot_id)
+            elif args.command == "gc":
+                self._audit_and_enforce("gc", [str(args.dry_run), str(args.full)],
+                                       self.gc, args.dry_run, args.full)
+            elif args.command == "prune":
+                self._audit_and_enforce("prune", [str(args.dry_run), str(args.no_gc)],
+                                       self.prune, args.dry_run, not args.no_gc)
             elif args.command == "audit-verify":
                 self._audit_and_enforce("audit-verify", [],
                                        self.audit_verify)
@@ -0,0 +1,101 @@
+"""
+Per-chunk compression codecs (stdlib only)
+Chunk hashes are always computed over the uncompressed data, so dedup is unaffected
+"""
+import bz2
+import lzma
+import zlib
+from typing import Tuple
+from .exceptions import IntegrityError
+
+# Codec id được ghi cạnh mỗi chunk (byte codec trong pack, frame header cho loose)
+CODEC_NONE = 0
+CODECS = {"none": CODEC_NONE, "zlib": 1, "lzma": 2, "bz2": 3}
+DEFAULT_COMPRESSION = "none"
+
+_COMPRESS = {
+    1: lambda data: zlib.compress(data, 6),
+    2: lambda data: lzma.compress(data, preset=6),
+    3: lambda data: bz2.compress(data, 9),
+}
+_DECOMPRESS = {
+    1: zlib.decompress,
+    2: lzma.decompress,
+    3: bz2.decompress,
+}
+
+# Loose chunk nén được ghi vào file "<hash>.z" kèm frame: magic | codec | payload
+# File "<hash>" (không đuôi) luôn là dữ liệu gốc → không bao giờ dò magic trong nội dung
+LOOSE_MAGIC = b"BKCHUNK1"
+LOOSE_FRAMED_SUFFIX = ".z"
+
+# Ước lượng nhanh bằng zlib level 1 trên một mẫu nhỏ trước khi nén cả chunk
+SAMPLE_SIZE = 4096
+SAMPLE_MAX_RATIO = 0.9
+
+
+def codec_id(name: str) -> int:
+    """Codec id for a config name; raises ValueError for unknown codecs"""
+    if name not in CODECS:
+        raise ValueError(f"Unknown compression codec: {name}. Must be one of {tuple(CODECS)}")
+    return CODECS[name]
+
+
+def looks_compressible(data: bytes) -> bool:
+    """Quick check on a sample from the middle of the chunk"""
+    if len(data) <= SAMPLE_SIZE:
+        sample = data
+    else:
+        start = (len(data) - SAMPLE_SIZE) // 2
+        sample = data[start:start + SAMPLE_SIZE]
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) < len(sample) * SAMPLE_MAX_RATIO
+
+
+def compress_chunk(data: bytes, codec: int) -> Tuple[int, bytes]:
+    """
+    Compress a chunk with the given codec id
+    Returns (codec actually used, payload); incompressible data is kept raw
+    """
+    if codec == CODEC_NONE or not looks_compressible(data):
+        return CODEC_NONE, data
+    payload = _COMPRESS[codec](data)
+    if len(payload) >= len(data):
+        return CODEC_NONE, data
+    return codec, payload
+
+
+def decompress_chunk(codec: int, payload: bytes) -> bytes:
+    """Decode a stored payload; raises IntegrityError if it cannot be decoded"""
+    if codec == CODEC_NONE:
+        return payload
+    if codec not in _DECOMPRESS:
+        raise IntegrityError(f"Unknown chunk codec: {codec}")
+    try:
+        return _DECOMPRESS[codec](payload)
+    except (zlib.error, lzma.LZMAError, OSError, EOFError, ValueError) as e:
+        raise IntegrityError(f"Cannot decompress chunk: {e}")
+
+
+def encode_loose(codec: int, payload: bytes) -> bytes:
+    """
+    File content for a loose chunk
+    Raw chunks are written as-is; compressed chunks go to a framed ("<hash>.z") file
+    """
+    if codec == CODEC_NONE:
+        return payload
+    return LOOSE_MAGIC + bytes([codec]) + payload
+
+
+def decode_loose(content: bytes, framed: bool) -> bytes:
+    """
+    Uncompressed chunk data from a loose chunk file
+    framed comes from the file name, never from the content
+    """
+    if not framed:
+        return content
+    header_size = len(LOOSE_MAGIC) + 1
+    if len(content) < header_size or not content.startswith(LOOSE_MAGIC):
+        raise IntegrityError("Invalid chunk frame")
+    return decompress_chunk(content[len(LOOSE_MAGIC)], content[header_size:])
@@ -22,6 +22,14 @@ class SnapshotNotFoundError(BackupSystemError):
     """Raised when snapshot is not found"""
     pass
 
+class PathNotFoundError(BackupSystemError):
+    """Raised when a file is not in a snapshot"""
+    pass
+
 class CrashRecoveryError(BackupSystemError):
     """Raised during crash recovery"""
-    pass
\ No newline at end of file
+    pass
+
+class StoreLockedError(BackupSystemError):
+    """Raised when another process holds a conflicting store lock"""
+    pass
@@ -0,0 +1,91 @@
+"""
+Per-source file cache for incremental backups
+Maps path + stat signature to the chunk list from the last snapshot
+"""
+import os
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+from .utils import compute_hash, ensure_dir
+
+FILECACHE_VERSION = 1
+
+# File sửa trong khoảng này trước lúc quét có thể bị sửa tiếp mà mtime không đổi
+# (racy-clean như git) nên không đưa vào cache
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+
+class FileCache:
+    """Stat-based cache keyed on (dev, inode, size, mtime_ns)"""
+
+    def __init__(self, store_path: str, source_path: str):
+        self.source_path = os.path.abspath(source_path)
+        self.cache_dir = os.path.join(store_path, "filecache")
+        source_key = compute_hash(self.source_path.encode())[:16]
+        self.cache_file = os.path.join(self.cache_dir, f"{source_key}.json")
+        self.entries: Dict[str, list] = {}
+        self.scan_started_ns = time.time_ns()
+
+    @staticmethod
+    def signature(st: os.stat_result) -> List[int]:
+        """Stat signature used to detect unchanged files"""
+        return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def load(self, chunker_config: Dict) -> None:
+        """Load cache; discard it if it was built with another chunker"""
+        self.entries = {}
+        if not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable file cache {self.cache_file}: {e}")
+            return
+
+        if (data.get("version") != FILECACHE_VERSION
+                or data.get("source_path") != self.source_path
+                or data.get("chunker") != chunker_config):
+            return
+
+        self.entries = data.get("files", {})
+
+    def lookup(self, rel_path: str, st: os.stat_result) -> Optional[Tuple[List[str], int]]:
+        """Return (chunks, size) if the file is unchanged since the cached snapshot"""
+        entry = self.entries.get(rel_path)
+        if entry is None or entry[:4] != self.signature(st):
+            return None
+        return entry[4], entry[2]
+
+    def save(self, entries: Dict[str, Tuple[List[int], List[str]]], chunker_config: Dict) -> None:
+        """
+        Replace the cache with entries from the snapshot just committed
+        entries: rel_path -> (signature, chunks)
+        """
+        racy_limit = self.scan_started_ns - RACY_WINDOW_NS
+        files = {
+            rel_path: list(sig) + [chunks]
+            for rel_path, (sig, chunks) in entries.items()
+            if sig[3] < racy_limit
+        }
+
+        data = {
+            "version": FILECACHE_VERSION,
+            "source_path": self.source_path,
+            "chunker": chunker_config,
+            "files": files,
+        }
+
+        ensure_dir(self.cache_dir)
+        temp_file = self.cache_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.rename(temp_file, self.cache_file)
+        self.entries = files
+
+    def clear(self) -> None:
+        """Remove the cache file (forces a full rescan next time)"""
+        self.entries = {}
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
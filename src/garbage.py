@@ -0,0 +1,194 @@
+"""
+Garbage collection: reclaim chunks no snapshot references any more
+Incremental mode sweeps chunks whose refcount dropped to zero; --full marks
+every chunk reachable from the live manifests and rebuilds the refcounts
+The chunk index may lag behind the files on disk: incremental gc never touches
+chunks without an index row (pack records included), only --full decides about
+them from the manifests and re-indexes the ones still referenced
+"""
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from .packfile import PACK_MAGIC, RECORD_HEADER
+from .chunk_index import LOOSE_LOCATION, pack_location, parse_pack_location
+from .exceptions import IntegrityError, SnapshotNotFoundError
+
+# Pack có từ 20% dữ liệu là rác trở lên thì được repack
+REPACK_MIN_GARBAGE = 0.2
+
+
+class GarbageCollector:
+    """Mark-and-sweep over snapshot manifests, driven by the chunk index refcounts"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.storage = manager.storage
+
+    def collect(self, full: bool = False, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Remove unreferenced chunks and compact packs
+        dry_run only reports what would be reclaimed
+        """
+        with self.storage.lock(exclusive=True):
+            return self._collect(full, dry_run)
+
+    def _collect(self, full: bool, dry_run: bool) -> Dict[str, int]:
+        stats = {"chunks": 0, "bytes": 0, "packs_deleted": 0, "packs_repacked": 0, "moved": 0}
+        index = self.storage.index
+
+        # 1. MARK: chunk nào còn được snapshot sống tham chiếu
+        unindexed = []
+        if full:
+            refcounts = self._mark()
+            garbage = [(h, location, size) for h, location, size, _ in index.iter_entries()
+                       if h not in refcounts]
+            indexed = {h for h, _, _, _ in index.iter_entries()}
+            # Chunk loose không có trong index: rác nếu không manifest nào tham chiếu
+            # (backup bị gián đoạn), ngược lại được ghi lại vào index
+            orphans = []
+            for chunk_hash, path in self.storage.iter_loose_chunks():
+                if chunk_hash in indexed:
+                    continue
+                if chunk_hash in refcounts:
+                    unindexed.append((chunk_hash, LOOSE_LOCATION, os.path.getsize(path)))
+                else:
+                    orphans.append((chunk_hash, path))
+            if self.storage.packs is not None:
+                for chunk_hash in refcounts:
+                    location = None if chunk_hash in indexed else self.storage.packs.locate(chunk_hash)
+                    if location is not None:
+                        unindexed.append((chunk_hash, pack_location(*location), location[2]))
+            live_records = self._live_records(refcounts)
+        else:
+            if not dry_run:
+                self.manager.release_forgotten()
+                self.manager.sync_refcounts(strict=True)
+            elif set(self.manager.catalog.live_ids()) != index.counted_snapshots():
+                # Refcount chưa cập nhật → dry-run tự mark thay vì sửa index
+                return self._collect(True, True)
+            # Chỉ chunk có dòng index với refcount 0 là rác; không mở manifest nào
+            garbage = index.unreferenced()
+            orphans = []
+            live_records = self._indexed_records({h for h, _, _ in garbage})
+
+        stats["chunks"] = len(garbage) + len(orphans)
+        stats["bytes"] = (sum(size for _, _, size in garbage)
+                          + sum(os.path.getsize(path) for _, path in orphans))
+
+        # 2. Kế hoạch cho từng pack: xóa hẳn hay repack
+        pack_plan = self._plan_packs(live_records)
+        stats["packs_deleted"] = sum(1 for live in pack_plan.values() if not live)
+        stats["packs_repacked"] = sum(1 for live in pack_plan.values() if live)
+        stats["moved"] = sum(len(live) for live in pack_plan.values())
+
+        if dry_run:
+            return stats
+
+        # 3. SWEEP: xóa khỏi index trước, sau đó mới xóa dữ liệu
+        for chunk_hash, location, _ in garbage:
+            if location == LOOSE_LOCATION:
+                self.storage.remove_loose_chunk(chunk_hash)
+            index.remove(chunk_hash)
+        index.commit()
+        for _, path in orphans:
+            os.remove(path)
+        for chunk_hash, location, size in unindexed:
+            index.add(chunk_hash, location, size)
+        index.commit()
+
+        # 4. REPACK: chép chunk còn sống sang pack mới, cập nhật index rồi mới xóa pack cũ
+        if pack_plan:
+            # Đóng pack đang ghi dở để bản chép luôn nằm trong pack mới, ngoài kế hoạch
+            self.storage.packs.close()
+        for pack_id, live in sorted(pack_plan.items()):
+            if live:
+                moved = self.storage.packs.copy_records(pack_id, live)
+                for chunk_hash, (new_pack, offset, length) in moved.items():
+                    # Incremental: record chưa có dòng index vẫn chỉ nằm trong .idx của pack
+                    # (dòng mới sẽ có refcount 0 và bị gc lần sau xóa nhầm)
+                    if full or index.contains(chunk_hash):
+                        index.add(chunk_hash, pack_location(new_pack, offset, length), length)
+                index.commit()
+            self.storage.packs.delete_pack(pack_id)
+
+        if full:
+            index.reset_refcounts(refcounts, self.manager.catalog.live_ids())
+        self.storage.rebuild_bloom()
+        return stats
+
+    def _mark(self) -> Dict[str, int]:
+        """Exact refcounts from every live manifest; unreadable manifests abort gc"""
+        refcounts: Dict[str, int] = defaultdict(int)
+        for snapshot_id in self.manager.catalog.live_ids():
+            try:
+                chunks = {h for entry in self.manager.iter_snapshot_entries(snapshot_id)
+                          for h in entry["chunks"]}
+            except (SnapshotNotFoundError, ValueError) as e:
+                raise IntegrityError(f"Cannot read manifest of {snapshot_id}: {e}")
+            for chunk_hash in chunks:
+                refcounts[chunk_hash] += 1
+        return dict(refcounts)
+
+    def _live_records(self, referenced) -> Dict[int, List[Tuple[str, int]]]:
+        """
+        Pack id -> (chunk, length) of the live records, from a full mark
+        A record is live when a live manifest references its chunk and it is the
+        copy the index points to (or, without an index row, the copy the pack
+        .idx knows about); unreferenced records and stale duplicates are garbage
+        """
+        packs = self.storage.packs
+        live: Dict[int, List[Tuple[str, int]]] = defaultdict(list)
+        if packs is None:
+            return live
+        index = self.storage.index
+        for chunk_hash in referenced:
+            entry = index.get(chunk_hash)
+            if entry is not None:
+                parsed = parse_pack_location(entry[0])
+            else:
+                # Chunk được tham chiếu nhưng mất dòng index → dựa vào .idx của pack
+                parsed = packs.locate(chunk_hash)
+            if parsed is not None:
+                live[parsed[0]].append((chunk_hash, parsed[2]))
+        return live
+
+    def _indexed_records(self, dead: set) -> Dict[int, List[Tuple[str, int]]]:
+        """
+        Pack id -> (chunk, length) of the live records, without reading manifests
+        Records the index points to are live unless their chunk is being swept;
+        records with no index row are kept too (only gc --full may drop them)
+        """
+        packs = self.storage.packs
+        live: Dict[int, List[Tuple[str, int]]] = defaultdict(list)
+        if packs is None:
+            return live
+        indexed = set()
+        for chunk_hash, location, _, _ in self.storage.index.iter_entries():
+            indexed.add(chunk_hash)
+            parsed = parse_pack_location(location)
+            if parsed is not None and chunk_hash not in dead:
+                live[parsed[0]].append((chunk_hash, parsed[2]))
+        for chunk_hash in packs:
+            if chunk_hash not in indexed:
+                pack_id, _, length = packs.locate(chunk_hash)
+                live[pack_id].append((chunk_hash, length))
+        return live
+
+    def _plan_packs(self, live: Dict[int, List[Tuple[str, int]]]) -> Dict[int, List[str]]:
+        """Packs worth rewriting -> chunks to keep (empty list: delete the pack)"""
+        packs = self.storage.packs
+        if packs is None:
+            return {}
+
+        plan = {}
+        for pack_id in packs.pack_ids():
+            records = live.get(pack_id, [])
+            total = packs.pack_size(pack_id) - len(PACK_MAGIC)
+            live_bytes = sum(RECORD_HEADER.size + length for _, length in records)
+            if total <= 0 and not records:
+                continue
+            if not records:
+                plan[pack_id] = []
+            elif total - live_bytes >= total * REPACK_MIN_GARBAGE:
+                plan[pack_id] = [h for h, _ in records]
+        return plan
@@ -1,176 +1,471 @@
 """
 Write-Ahead Log (WAL) for crash consistency - IMPROVED VERSION
+
+Binary segment format (journal.wal):
+    magic "BKWAL001" | record*
+    record: u32 length | u32 crc32 | u64 seq | u8 type | payload (length bytes)
+    payload: u16 len | tx_id (UTF-8) | JSON body (MANIFEST/METADATA/FORGET/PROGRESS/CHECKPOINT)
+crc32 covers seq, type and payload; seq tăng dần trong cả journal. Record đầu tiên bị cắt
+(torn write), sai CRC hoặc seq không tăng đánh dấu cuối log: recovery dừng sạch tại đó.
+
+Dump tool (stdlib only): python -m src.journal <store>/journal.wal [--json]
 """
 import os
+import sys
 import json
-from typing import List, Dict, Optional
+import mmap
+import time
+import zlib
+import fcntl
+import struct
 import base64
+import argparse
+from contextlib import contextmanager
+from typing import Any, BinaryIO, List, Dict, Iterator, NamedTuple, Optional, Tuple
+
+# Durability levels (store config "journal_durability"):
+#   full   — fsync sau mỗi record (hành vi cũ)
+#   normal — record được gom trong transaction, 1 lần write + fsync tại mỗi durability point
+#            (trước khi dữ liệu snapshot được publish, COMMIT, ABORT)
+#   off    — như normal nhưng không fsync (chỉ flush xuống OS; cho store tạm/test)
+DURABILITY_LEVELS = ("full", "normal", "off")
+DEFAULT_DURABILITY = "normal"
+
+# Segment đang ghi lớn hơn ngưỡng này → checkpoint (bắt đầu segment mới, bỏ transaction đã xong)
+# Recovery chỉ đọc segment hiện tại nên thời gian khởi động không tăng theo lịch sử
+CHECKPOINT_BYTES = 1024 * 1024
+
+JOURNAL_MAGIC = b"BKWAL001"
+RECORD_TYPES = {"BEGIN": 1, "MANIFEST": 2, "METADATA": 3, "FORGET": 4,
+                "COMMIT": 5, "ABORT": 6, "CHECKPOINT": 7, "PROGRESS": 8, "SUSPEND": 9}
+_RECORD_KINDS = {code: kind for kind, code in RECORD_TYPES.items()}
+_RECORD_HEADER = struct.Struct(">IIQB")
+_TX_LEN = struct.Struct(">H")
+# Length lớn hơn mức này chắc chắn là rác (header bị ghi dở)
+MAX_RECORD_SIZE = 256 * 1024 * 1024
+
+# Record có JSON body
+_PAYLOAD_RECORDS = ("MANIFEST", "METADATA", "FORGET")
+
+
+class JournalRecord(NamedTuple):
+    seq: int
+    kind: str
+    tx_id: str
+    data: Any
+    offset: int
+
+
+def encode_record(seq: int, kind: str, tx_id: str, data: Any = None) -> bytes:
+    """Frame one record: length + CRC header, then payload"""
+    tx_bytes = tx_id.encode()
+    payload = _TX_LEN.pack(len(tx_bytes)) + tx_bytes
+    if data is not None:
+        payload += json.dumps(data, sort_keys=True).encode()
+    code = RECORD_TYPES[kind]
+    crc = zlib.crc32(payload, zlib.crc32(struct.pack(">QB", seq, code)))
+    return _RECORD_HEADER.pack(len(payload), crc, seq, code) + payload
+
+
+def _decode_records(buf, start: int, last_seq: int) -> Tuple[List[JournalRecord], int]:
+    """
+    Decode records from buf[start:] until the end or the first torn/invalid record
+    Returns (records, offset right after the last valid record)
+    """
+    records = []
+    offset = start
+    size = len(buf)
+    while offset + _RECORD_HEADER.size <= size:
+        length, crc, seq, code = _RECORD_HEADER.unpack_from(buf, offset)
+        body_start = offset + _RECORD_HEADER.size
+        if length > MAX_RECORD_SIZE or body_start + length > size:
+            break
+        payload = buf[body_start:body_start + length]
+        if (zlib.crc32(payload, zlib.crc32(buf[offset + 8:body_start])) != crc
+                or code not in _RECORD_KINDS or seq <= last_seq or length < _TX_LEN.size):
+            break
+        (tx_len,) = _TX_LEN.unpack_from(payload)
+        try:
+            tx_id = bytes(payload[2:2 + tx_len]).decode()
+            body = bytes(payload[2 + tx_len:])
+            data = json.loads(body) if body else None
+        except ValueError:
+            break
+        records.append(JournalRecord(seq, _RECORD_KINDS[code], tx_id, data, offset))
+        last_seq = seq
+        offset = body_start + length
+    return records, offset
+
+
+def scan_journal(path: str, start: int = 0,
+                 last_seq: int = 0) -> Tuple[List[JournalRecord], int, int]:
+    """
+    Scan a journal segment with mmap
+    start/last_seq resume after an already scanned prefix
+    Returns (records, valid_end, file_size); valid_end < file_size means a torn tail
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [], 0, 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if buf[:len(JOURNAL_MAGIC)] != JOURNAL_MAGIC:
+                raise ValueError(f"Not a binary journal: {path}")
+            records, end = _decode_records(buf, max(start, len(JOURNAL_MAGIC)), last_seq)
+    return records, end, size
+
+
+def _read_legacy_journal(path: str) -> List[JournalRecord]:
+    """Records of a text journal written before the binary format (KIND:tx_id[:base64 JSON])"""
+    records = []
+    with open(path, 'r', errors="replace") as f:
+        for line_num, line in enumerate(f, 1):
+            kind, _, rest = line.strip().partition(":")
+            if kind in _PAYLOAD_RECORDS:
+                tx_id, _, payload = rest.partition(":")
+                try:
+                    data = json.loads(base64.b64decode(payload).decode())
+                except ValueError:
+                    data = None
+            elif kind in ("BEGIN", "COMMIT", "ABORT"):
+                tx_id, data = rest, None
+            else:
+                continue
+            records.append(JournalRecord(line_num, kind, tx_id, data, -1))
+    return records
+
+
+def _is_legacy(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(len(JOURNAL_MAGIC))
+    except FileNotFoundError:
+        return False
+    return bool(head) and head != JOURNAL_MAGIC
+
 
 class Journal:
-    """Write-Ahead Log với recovery đầy đủ"""
-    
-    def __init__(self, journal_path: str):
+    """Write-Ahead Log với recovery đầy đủ và group commit"""
+
+    def __init__(self, journal_path: str, durability: str = DEFAULT_DURABILITY,
+                 checkpoint_bytes: int = CHECKPOINT_BYTES):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown journal durability: {durability}. "
+                             f"Must be one of {DURABILITY_LEVELS}")
         self.journal_path = journal_path
+        self.durability = durability
+        self.checkpoint_bytes = checkpoint_bytes
+        self._file: Optional[BinaryIO] = None
+        # Record đã append nhưng chưa ghi xuống file (chờ durability point tiếp theo)
+        self._pending: List[Tuple[str, str, Any]] = []
+        # Vị trí cuối record hợp lệ đã biết và seq cuối trong file đang mở
+        self._end = 0
+        self._last_seq = 0
         self._ensure_dir()
-    
+
     def _ensure_dir(self):
         """Tạo thư mục nếu chưa có"""
         os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
-    
-    def _append(self, entry: str) -> None:
-        """Append entry với fsync"""
-        with open(self.journal_path, 'a') as f:
-            f.write(entry + '\n')
+
+    def _handle(self) -> BinaryIO:
+        """Persistent append handle (mở 1 lần cho cả process)"""
+        if self._file is not None and not self._file.closed:
+            # Process khác đã checkpoint (thay file bằng segment mới) → mở lại
+            try:
+                if os.stat(self.journal_path).st_ino == os.fstat(self._file.fileno()).st_ino:
+                    return self._file
+            except FileNotFoundError:
+                pass
+            self._file.close()
+        self._file = open(self.journal_path, 'ab')
+        self._end = 0
+        return self._file
+
+    @contextmanager
+    def _locked(self) -> Iterator[BinaryIO]:
+        """
+        Append handle under an exclusive flock, positioned after the last valid record
+        Record của process khác (backup song song) được đọc để nối seq; đuôi bị cắt dở
+        do crash được truncate trước khi ghi tiếp
+        """
+        if _is_legacy(self.journal_path):
+            self._convert_legacy()
+        f = self._handle()
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                f.write(JOURNAL_MAGIC)
+                f.flush()
+                self._end = len(JOURNAL_MAGIC)
+            elif size != self._end:
+                if size < self._end:
+                    self._end = 0
+                records, end, size = scan_journal(self.journal_path, self._end,
+                                                  self._last_seq if self._end else 0)
+                if records:
+                    self._last_seq = records[-1].seq
+                if end < size:
+                    print(f"[JOURNAL] Discarding {size - end} bytes of torn records at offset {end}")
+                    os.ftruncate(f.fileno(), end)
+                self._end = end
+            yield f
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _append(self, kind: str, tx_id: str, data: Any = None, sync: bool = False) -> None:
+        """Buffer record; sync=True (hoặc durability full) biến nó thành durability point"""
+        self._pending.append((kind, tx_id, data))
+        if sync or self.durability == "full":
+            self.sync()
+
+    def sync(self) -> None:
+        """
+        Durability point: ghi mọi record đang chờ bằng 1 lần write, rồi fsync
+        (trừ durability off). Gọi trước khi thay đổi mà journal bảo vệ được publish
+        """
+        if not self._pending:
+            return
+        with self._locked() as f:
+            data = bytearray()
+            for kind, tx_id, body in self._pending:
+                self._last_seq += 1
+                data += encode_record(self._last_seq, kind, tx_id, body)
+            f.write(data)
             f.flush()
-            os.fsync(f.fileno())
-    
+            if self.durability != "off":
+                os.fsync(f.fileno())
+            self._end += len(data)
+        self._pending.clear()
+
+    def close(self) -> None:
+        """Flush record còn chờ và đóng file handle"""
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
     def begin_transaction(self, snapshot_id: str) -> None:
-        """Bắt đầu transaction mới"""
-        self._append(f"BEGIN:{snapshot_id}")
+        """Bắt đầu transaction mới (được ghi cùng durability point kế tiếp)"""
+        self._append("BEGIN", snapshot_id)
 
-    def add_manifest(self, manifest_hash: str) -> None:
-        """Record manifest addition - FIX FOR LEGACY CODE"""
-        self._append(f"ADD_MANIFEST:{manifest_hash}")
-    
     def write_manifest(self, snapshot_id: str, manifest_data: Dict) -> None:
         """Ghi manifest vào journal"""
-        manifest_json = json.dumps(manifest_data, sort_keys=True)
-        # Encode để tránh newline trong journal
-        manifest_b64 = base64.b64encode(manifest_json.encode()).decode()
-        self._append(f"MANIFEST:{snapshot_id}:{manifest_b64}")
-    
+        self._append("MANIFEST", snapshot_id, manifest_data)
+
     def write_metadata(self, snapshot_id: str, metadata: Dict) -> None:
         """Ghi metadata vào journal"""
-        metadata_json = json.dumps(metadata, sort_keys=True)
-        metadata_b64 = base64.b64encode(metadata_json.encode()).decode()
-        self._append(f"METADATA:{snapshot_id}:{metadata_b64}")
-    
-    def commit(self, snapshot_id: str) -> None:
-        """Commit transaction"""
-        self._append(f"COMMIT:{snapshot_id}")
-    
-    def abort(self, snapshot_id: str) -> None:
-        """Abort transaction"""
-        self._append(f"ABORT:{snapshot_id}")
-    
-    def recover(self) -> List[Dict]:
+        self._append("METADATA", snapshot_id, metadata)
+
+    def write_forget(self, tx_id: str, snapshot_ids: List[str]) -> None:
+        """Ghi danh sách snapshot bị xóa (forget/prune) vào journal"""
+        self._append("FORGET", tx_id, list(snapshot_ids))
+
+    def write_progress(self, snapshot_id: str, progress: Dict, files: List[list]) -> None:
         """
-        Khôi phục từ crash
-        Trả về: list các transaction chưa hoàn tất với dữ liệu đầy đủ
+        Checkpoint các file đã backup xong ([path, stat signature, chunks, size]) — durability point
+        progress: source_path, chunker, scan_started_ns của lần quét
         """
+        self._append("PROGRESS", snapshot_id, dict(progress, files=files), sync=True)
+
+    def suspend(self, snapshot_id: str) -> None:
+        """
+        Backup bị gián đoạn nhưng còn PROGRESS: giữ transaction để `backup --resume` dùng lại
+        (không còn được recover() trả về)
+        """
+        self._append("SUSPEND", snapshot_id, sync=True)
+
+    def commit(self, snapshot_id: str) -> None:
+        """Commit transaction (durability point)"""
+        self._append("COMMIT", snapshot_id, sync=True)
+
+    def abort(self, snapshot_id: str) -> None:
+        """Abort transaction (durability point)"""
+        self._append("ABORT", snapshot_id, sync=True)
+
+    def records(self) -> List[JournalRecord]:
+        """Valid records of the active segment (journal cũ dạng text: cả file)"""
+        self.sync()
         if not os.path.exists(self.journal_path):
             return []
-        
-        incomplete_transactions = []
-        current_tx = None
-        tx_data = {}
-        
-        with open(self.journal_path, 'r') as f:
-            lines = f.readlines()
-        
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
-                continue
-            
-            if line.startswith("BEGIN:"):
-                # Kết thúc transaction trước nếu có
-                if current_tx and tx_data:
-                    incomplete_transactions.append(tx_data.copy())
-                
-                # Bắt đầu transaction mới
-                current_tx = line.split(":", 1)[1]
-                tx_data = {
-                    "snapshot_id": current_tx,
-                    "start_line": line_num,
+        if _is_legacy(self.journal_path):
+            return _read_legacy_journal(self.journal_path)
+        records, _, _ = scan_journal(self.journal_path)
+        return records
+
+    def _scan(self) -> Tuple[Dict[str, Any], Dict[str, Dict], List[JournalRecord]]:
+        """
+        One pass over the active segment
+        Returns (checkpoint info, transactions by id in BEGIN order, records)
+        """
+        records = self.records()
+        checkpoint, transactions = self._replay(records)
+        return checkpoint, transactions, records
+
+    @staticmethod
+    def _replay(records: List[JournalRecord]) -> Tuple[Dict[str, Any], Dict[str, Dict]]:
+        checkpoint = {"segment": 0, "last_committed": None}
+        transactions: Dict[str, Dict] = {}
+
+        for record_num, record in enumerate(records, 1):
+            kind, tx_id = record.kind, record.tx_id
+            if kind == "CHECKPOINT":
+                if isinstance(record.data, dict):
+                    checkpoint = dict(record.data)
+            elif kind == "BEGIN":
+                transactions[tx_id] = {
+                    "snapshot_id": tx_id,
+                    "start_line": record_num,
                     "manifest": None,
                     "metadata": None,
+                    "forget": None,
+                    "progress": None,
+                    "suspended": False,
                     "completed": False
                 }
-            
-            elif line.startswith("MANIFEST:") and current_tx:
-                parts = line.split(":", 2)
-                if len(parts) == 3 and parts[1] == current_tx:
-                    try:
-                        manifest_json = base64.b64decode(parts[2]).decode()
-                        tx_data["manifest"] = json.loads(manifest_json)
-                    except:
-                        tx_data["manifest"] = None
-            
-            elif line.startswith("METADATA:") and current_tx:
-                parts = line.split(":", 2)
-                if len(parts) == 3 and parts[1] == current_tx:
-                    try:
-                        metadata_json = base64.b64decode(parts[2]).decode()
-                        tx_data["metadata"] = json.loads(metadata_json)
-                    except:
-                        tx_data["metadata"] = None
-            
-            elif line.startswith("COMMIT:") or line.startswith("ABORT:"):
-                tx_id = line.split(":", 1)[1]
-                if current_tx == tx_id:
-                    tx_data["completed"] = True
-                    current_tx = None
-        
-        # Thêm transaction cuối nếu chưa hoàn tất
-        if current_tx and not tx_data.get("completed"):
-            incomplete_transactions.append(tx_data)
-        
-        return incomplete_transactions
-    
+            elif kind in _PAYLOAD_RECORDS and tx_id in transactions:
+                transactions[tx_id][kind.lower()] = record.data
+            elif kind == "PROGRESS" and tx_id in transactions and isinstance(record.data, dict):
+                progress = transactions[tx_id]["progress"]
+                if progress is None:
+                    progress = transactions[tx_id]["progress"] = dict(record.data, files=[])
+                progress["files"].extend(record.data.get("files", []))
+            elif kind == "SUSPEND" and tx_id in transactions:
+                transactions[tx_id]["suspended"] = True
+            elif kind in ("COMMIT", "ABORT") and tx_id in transactions:
+                transactions[tx_id]["completed"] = True
+                if kind == "COMMIT":
+                    checkpoint["last_committed"] = tx_id
+
+        return checkpoint, transactions
+
+    def recover(self) -> List[Dict]:
+        """
+        Khôi phục từ crash: chỉ đọc từ checkpoint cuối (segment hiện tại),
+        dừng ở record bị cắt dở đầu tiên
+        Trả về: list các transaction chưa hoàn tất với dữ liệu đầy đủ
+        """
+        _, transactions, _ = self._scan()
+        return [tx for tx in transactions.values() if not tx["completed"] and not tx["suspended"]]
+
+    def suspended(self, source_path: Optional[str] = None) -> List[Dict]:
+        """Interrupted backups that can be resumed (oldest first), optionally for one source"""
+        _, transactions, _ = self._scan()
+        return [tx for tx in transactions.values()
+                if tx["suspended"] and not tx["completed"]
+                and (source_path is None or tx["progress"]["source_path"] == source_path)]
+
     def cleanup_incomplete(self, snapshot_id: str) -> bool:
         """
-        Cleanup sau khi recovery
+        Đánh dấu transaction đã được rollback (ABORT); checkpoint kế tiếp sẽ bỏ nó khỏi journal
         Trả về: True nếu cleanup thành công
         """
         try:
-            # 1. Đọc toàn bộ journal
-            with open(self.journal_path, 'r') as f:
-                lines = f.readlines()
-            
-            # 2. Tìm lines cần giữ lại (trước BEGIN của transaction này)
-            keep_lines = []
-            in_transaction = False
-            
-            for line in lines:
-                if line.startswith(f"BEGIN:{snapshot_id}"):
-                    in_transaction = True
-                
-                if not in_transaction:
-                    keep_lines.append(line)
-                
-                if in_transaction and (line.startswith(f"COMMIT:{snapshot_id}") or 
-                                      line.startswith(f"ABORT:{snapshot_id}")):
-                    in_transaction = False
-                    # KHÔNG giữ commit/abort line vì transaction bị rollback
-            
-            # 3. Ghi lại journal
-            with open(self.journal_path, 'w') as f:
-                f.writelines(keep_lines)
-            
+            self.abort(snapshot_id)
             return True
-            
-        except Exception as e:
+        except OSError as e:
             print(f"Journal cleanup failed: {e}")
             return False
-    
+
     def get_last_committed(self) -> Optional[str]:
-        """Lấy snapshot_id cuối cùng đã commit thành công"""
-        if not os.path.exists(self.journal_path):
-            return None
-        
-        last_committed = None
-        with open(self.journal_path, 'r') as f:
-            for line in reversed(f.readlines()):
-                line = line.strip()
-                if line.startswith("COMMIT:"):
-                    last_committed = line.split(":", 1)[1]
-                    break
-        
-        return last_committed
-    
-    def _flush_current(self):
-        """Flush current file handle"""
-        # Với implementation hiện tại, mỗi lần _append đều có flush
-        # Nhưng có thể optimize bằng cách giữ file handle mở
-        pass  # Hiện tại đã có flush trong _append
\ No newline at end of file
+        """Lấy snapshot_id cuối cùng đã commit thành công (được mang qua các checkpoint)"""
+        checkpoint, _, _ = self._scan()
+        return checkpoint["last_committed"]
+
+    def needs_checkpoint(self) -> bool:
+        try:
+            return (os.path.getsize(self.journal_path) >= self.checkpoint_bytes
+                    or _is_legacy(self.journal_path))
+        except FileNotFoundError:
+            return False
+
+    def checkpoint(self) -> int:
+        """
+        Compact the journal into a new segment
+        The new segment starts with a CHECKPOINT record and keeps only the records of
+        transactions that are still open; committed/aborted ones are dropped (their effects
+        are already durable in the catalog). The segment is swapped in atomically.
+        Caller must ensure no other process is appending (exclusive store lock).
+        Returns the number of records dropped
+        """
+        checkpoint, transactions, records = self._scan()
+        open_txs = {tx_id for tx_id, tx in transactions.items() if not tx["completed"]}
+        keep = [record for record in records if record.kind != "CHECKPOINT" and record.tx_id in open_txs]
+        self._rewrite(checkpoint, records, keep)
+        return len(records) - len(keep)
+
+    def _convert_legacy(self) -> None:
+        """Chuyển journal dạng text cũ sang segment binary (giữ transaction còn mở)"""
+        records = _read_legacy_journal(self.journal_path)
+        checkpoint, transactions = self._replay(records)
+        keep = [record for record in records if record.tx_id in transactions
+                and not transactions[record.tx_id]["completed"]]
+        self._rewrite(checkpoint, [], keep)
+
+    def _rewrite(self, checkpoint: Dict[str, Any], records: List[JournalRecord],
+                 keep: List[JournalRecord]) -> None:
+        """Atomically replace the journal with CHECKPOINT + keep (seq tiếp tục tăng)"""
+        seq = max([self._last_seq] + [record.seq for record in records])
+        info = {"segment": checkpoint.get("segment", 0) + 1,
+                "last_committed": checkpoint.get("last_committed"),
+                "created_at": time.time()}
+        data = bytearray(JOURNAL_MAGIC)
+        seq += 1
+        data += encode_record(seq, "CHECKPOINT", "", info)
+        for record in keep:
+            seq += 1
+            data += encode_record(seq, record.kind, record.tx_id, record.data)
+
+        temp_path = self.journal_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            if self.durability != "off":
+                os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.rename(temp_path, self.journal_path)
+        if self.durability != "off":
+            dir_fd = os.open(os.path.dirname(self.journal_path) or ".", os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        self._last_seq = seq
+
+
+def dump(path: str, as_json: bool = False, out=sys.stdout) -> int:
+    """Print every record of a journal segment; returns 1 if it ends in a torn record"""
+    if _is_legacy(path):
+        records, end, size = _read_legacy_journal(path), 0, 0
+        print(f"{path}: legacy text journal", file=out)
+    else:
+        records, end, size = scan_journal(path)
+    for record in records:
+        if as_json:
+            print(json.dumps(record._asdict(), sort_keys=True), file=out)
+            continue
+        summary = ""
+        if record.data is not None:
+            summary = json.dumps(record.data, sort_keys=True)
+            if len(summary) > 100:
+                summary = summary[:97] + "..."
+        print(f"{record.seq:>8} @{record.offset:<10} {record.kind:<10} {record.tx_id} {summary}".rstrip(),
+              file=out)
+    if end < size:
+        print(f"torn tail: {size - end} bytes after offset {end}", file=out)
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Dump the records of a backup store journal")
+    parser.add_argument("journal", help="Path to journal.wal")
+    parser.add_argument("--json", action="store_true", help="One JSON object per record")
+    args = parser.parse_args(argv)
+    return dump(args.journal, args.json)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
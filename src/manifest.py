@@ -0,0 +1,405 @@
+"""
+Snapshot manifest formats
+v1 ("json"): one canonical JSON document with a "files" list
+v2 ("jsonl"): JSON Lines — header, one canonical entry per file (sorted by path), footer
+v3 ("binary"): JSON header, then front-coded paths, varint sizes and raw 32-byte digests
+v2 and v3 are written and read as a stream, so memory does not grow with the number of files
+"""
+import os
+import json
+import hashlib
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from .utils import canonical_json
+from .merkle import MerkleBuilder
+
+MANIFEST_FORMATS = {"json": 1, "jsonl": 2, "binary": 3}
+DEFAULT_MANIFEST_FORMAT = "json"
+
+_READ_BLOCK = 1024 * 1024
+
+# Binary manifest (v3):
+#   magic | varint len | header JSON | record* | END
+#   record: FILE | varint prefix chung với path trước | varint len | phần còn lại của path (UTF-8)
+#           | varint size | varint số chunk | digest 32 byte * số chunk
+#   END | varint total_files | varint total_chunks
+BINARY_MAGIC = b"BKMANIF3"
+_RECORD_FILE = 0x01
+_RECORD_END = 0x00
+_DIGEST_SIZE = 32
+
+
+def _encode_varint(value: int) -> bytes:
+    """Unsigned LEB128"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _encode_path(path: str) -> bytes:
+    # surrogateescape: giữ nguyên tên file không phải UTF-8 hợp lệ
+    return path.encode("utf-8", "surrogateescape")
+
+
+class ManifestWriter:
+    """
+    Base writer: entries must be added in manifest (sorted path) order
+    The manifest is built in a temp file and moved into place by commit()
+    """
+
+    version = 0
+
+    def __init__(self, path: str, header: Dict[str, Any]):
+        self.path = path
+        self.temp_path = path + ".tmp"
+        self.header = dict(header, version=self.version)
+        self.merkle = MerkleBuilder()
+        self.total_files = 0
+        self.total_chunks = 0
+        self.manifest_hash: Optional[str] = None
+        self._last_path: Optional[str] = None
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        path = entry["path"]
+        if self._last_path is not None and path <= self._last_path:
+            raise ValueError(f"Manifest entries out of order: {path}")
+        self._last_path = path
+
+        self.merkle.add_entry(entry)
+        self.total_files += 1
+        self.total_chunks += len(entry["chunks"])
+        self._write_entry(entry)
+
+    def _write_entry(self, entry: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> Dict[str, Any]:
+        """Complete the temp file; returns merkle_root, manifest_hash and totals"""
+        raise NotImplementedError
+
+    def journal_record(self) -> Dict[str, Any]:
+        """What the journal MANIFEST record stores for this manifest"""
+        # Không nhét cả manifest vào journal: chỉ header + hash của file
+        return dict(self.header, manifest_hash=self.manifest_hash,
+                    total_files=self.total_files, total_chunks=self.total_chunks)
+
+    def commit(self) -> None:
+        os.rename(self.temp_path, self.path)
+
+    def abort(self) -> None:
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def _summary(self) -> Dict[str, Any]:
+        return {
+            "merkle_root": self.merkle.root(),
+            "manifest_hash": self.manifest_hash,
+            "total_files": self.total_files,
+            "total_chunks": self.total_chunks,
+        }
+
+
+class JsonManifestWriter(ManifestWriter):
+    """v1: entries are kept in memory and serialised as one canonical JSON document"""
+
+    version = 1
+
+    def __init__(self, path: str, header: Dict[str, Any]):
+        super().__init__(path, header)
+        self.entries: List[Dict[str, Any]] = []
+
+    def _write_entry(self, entry: Dict[str, Any]) -> None:
+        self.entries.append(entry)
+
+    def finish(self) -> Dict[str, Any]:
+        manifest_json = canonical_json(dict(self.header, files=self.entries))
+        with open(self.temp_path, 'w') as f:
+            f.write(manifest_json)
+            # Durable trước khi journal ghi METADATA: recovery có thể hoàn tất snapshot từ file tạm
+            f.flush()
+            os.fsync(f.fileno())
+        self.manifest_hash = hashlib.sha256(manifest_json.encode()).hexdigest()
+        return self._summary()
+
+
+class StreamManifestWriter(ManifestWriter):
+    """Base for formats written straight to the temp file while hashing it"""
+
+    def __init__(self, path: str, header: Dict[str, Any]):
+        super().__init__(path, header)
+        self._hasher = hashlib.sha256()
+        self._file = open(self.temp_path, 'wb')
+
+    def _write(self, data: bytes) -> None:
+        self._hasher.update(data)
+        self._file.write(data)
+
+    def _write_footer(self) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> Dict[str, Any]:
+        # Footer: phát hiện manifest bị cắt cụt
+        self._write_footer()
+        # Durable trước khi journal ghi METADATA: recovery có thể hoàn tất snapshot từ file tạm
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self.manifest_hash = self._hasher.hexdigest()
+        return self._summary()
+
+    def abort(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        super().abort()
+
+
+class JsonLinesManifestWriter(StreamManifestWriter):
+    """v2: header line, one line per entry, footer line with totals"""
+
+    version = 2
+
+    def __init__(self, path: str, header: Dict[str, Any]):
+        super().__init__(path, header)
+        self._write_line(self.header)
+
+    def _write_line(self, record: Dict[str, Any]) -> None:
+        self._write((canonical_json(record) + "\n").encode())
+
+    def _write_entry(self, entry: Dict[str, Any]) -> None:
+        self._write_line(entry)
+
+    def _write_footer(self) -> None:
+        self._write_line({"end": True, "total_files": self.total_files,
+                          "total_chunks": self.total_chunks})
+
+
+class BinaryManifestWriter(StreamManifestWriter):
+    """v3: compact binary records; Merkle root is computed over the same logical entries"""
+
+    version = 3
+
+    def __init__(self, path: str, header: Dict[str, Any]):
+        super().__init__(path, header)
+        header_bytes = canonical_json(self.header).encode()
+        self._write(BINARY_MAGIC + _encode_varint(len(header_bytes)) + header_bytes)
+        self._prev_path = b""
+
+    def _write_entry(self, entry: Dict[str, Any]) -> None:
+        path = _encode_path(entry["path"])
+        shared = os.path.commonprefix([self._prev_path, path])
+        suffix = path[len(shared):]
+        self._prev_path = path
+
+        record = bytearray([_RECORD_FILE])
+        record += _encode_varint(len(shared))
+        record += _encode_varint(len(suffix))
+        record += suffix
+        record += _encode_varint(entry["size"])
+        record += _encode_varint(len(entry["chunks"]))
+        for chunk_hash in entry["chunks"]:
+            record += bytes.fromhex(chunk_hash)
+        self._write(bytes(record))
+
+    def _write_footer(self) -> None:
+        self._write(bytes([_RECORD_END]) + _encode_varint(self.total_files)
+                    + _encode_varint(self.total_chunks))
+
+
+_WRITERS = {"json": JsonManifestWriter, "jsonl": JsonLinesManifestWriter,
+            "binary": BinaryManifestWriter}
+
+
+def open_manifest_writer(manifest_format: str, path: str, header: Dict[str, Any]) -> ManifestWriter:
+    """Create a writer for one of MANIFEST_FORMATS"""
+    if manifest_format not in _WRITERS:
+        raise ValueError(f"Unknown manifest format: {manifest_format}. "
+                         f"Must be one of {tuple(MANIFEST_FORMATS)}")
+    return _WRITERS[manifest_format](path, header)
+
+
+class _BinaryReader:
+    """Buffered reader for the binary manifest (avoids one read() per byte)"""
+
+    def __init__(self, f: BinaryIO):
+        self._file = f
+        self._buffer = b""
+        self._pos = 0
+
+    def _fill(self, needed: int) -> None:
+        if len(self._buffer) - self._pos >= needed:
+            return
+        rest = self._buffer[self._pos:]
+        chunks = [rest]
+        have = len(rest)
+        while have < needed:
+            block = self._file.read(max(_READ_BLOCK, needed - have))
+            if not block:
+                raise ValueError("Manifest truncated")
+            chunks.append(block)
+            have += len(block)
+        self._buffer = b"".join(chunks)
+        self._pos = 0
+
+    def read(self, size: int) -> bytes:
+        self._fill(size)
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += size
+        return data
+
+    def byte(self) -> int:
+        if self._pos >= len(self._buffer):
+            self._fill(1)
+        value = self._buffer[self._pos]
+        self._pos += 1
+        return value
+
+    def varint(self) -> int:
+        # Fast path: phần lớn giá trị (độ dài, số chunk) nằm gọn trong 1 byte
+        pos = self._pos
+        if pos < len(self._buffer) and self._buffer[pos] < 0x80:
+            self._pos = pos + 1
+            return self._buffer[pos]
+
+        result = 0
+        shift = 0
+        while True:
+            byte = self.byte()
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+            if shift > 63:
+                raise ValueError("Invalid varint in manifest")
+
+    def at_eof(self) -> bool:
+        if self._pos < len(self._buffer):
+            return False
+        return not self._file.read(1)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _open_manifest(path: str) -> Tuple[Dict[str, Any], Optional[str], Optional[Any]]:
+    """
+    Parse the manifest header
+    Returns (header, kind, reader positioned at the first entry) for streamed formats,
+    or (whole manifest, None, None) for v1 (which has no newline)
+    """
+    f = open(path, 'rb')
+    try:
+        if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            reader = _BinaryReader(f)
+            header = json.loads(reader.read(reader.varint()))
+            return header, "binary", reader
+        f.seek(0)
+        first = json.loads(f.readline())
+        if not isinstance(first, dict):
+            raise ValueError("Manifest is not a JSON object")
+        if first.get("version") == 2 and "files" not in first:
+            return first, "jsonl", f
+    except BaseException:
+        f.close()
+        raise
+    f.close()
+    return first, None, None
+
+
+def read_manifest_header(path: str) -> Dict[str, Any]:
+    """Manifest fields without the file list"""
+    header, kind, reader = _open_manifest(path)
+    if reader is not None:
+        reader.close()
+        return header
+    return {k: v for k, v in header.items() if k != "files"}
+
+
+def _iter_jsonl_entries(f) -> Iterator[Dict[str, Any]]:
+    count = 0
+    for line in f:
+        record = json.loads(line)
+        if record.get("end") is True:
+            if record.get("total_files") != count:
+                raise ValueError("Manifest footer does not match entry count")
+            if f.read(1):
+                raise ValueError("Data after manifest footer")
+            return
+        count += 1
+        yield record
+    raise ValueError("Manifest truncated (missing footer)")
+
+
+def _iter_binary_entries(reader: _BinaryReader) -> Iterator[Dict[str, Any]]:
+    count = 0
+    chunk_count = 0
+    prev_path = b""
+    read_byte, read_varint, read = reader.byte, reader.varint, reader.read
+    while True:
+        record_type = read_byte()
+        if record_type == _RECORD_END:
+            if read_varint() != count or read_varint() != chunk_count:
+                raise ValueError("Manifest footer does not match entry count")
+            if not reader.at_eof():
+                raise ValueError("Data after manifest footer")
+            return
+        if record_type != _RECORD_FILE:
+            raise ValueError(f"Unknown manifest record type: {record_type}")
+
+        shared = read_varint()
+        if shared > len(prev_path):
+            raise ValueError("Invalid path prefix in manifest")
+        path = prev_path[:shared] + read(read_varint())
+        prev_path = path
+        size = read_varint()
+        num_chunks = read_varint()
+        digests = read(num_chunks * _DIGEST_SIZE)
+
+        count += 1
+        chunk_count += num_chunks
+        hex_digests = digests.hex()
+        yield {
+            "path": path.decode("utf-8", "surrogateescape"),
+            "chunks": [hex_digests[i:i + 2 * _DIGEST_SIZE]
+                       for i in range(0, len(hex_digests), 2 * _DIGEST_SIZE)],
+            "size": size,
+        }
+
+
+def iter_manifest_entries(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield file entries in manifest order
+    Raises ValueError for a corrupted or truncated manifest
+    """
+    manifest, kind, reader = _open_manifest(path)
+    if reader is None:
+        yield from manifest.get("files", [])
+        return
+
+    try:
+        if kind == "binary":
+            yield from _iter_binary_entries(reader)
+        else:
+            yield from _iter_jsonl_entries(reader)
+    finally:
+        reader.close()
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """Whole manifest as a dict with a "files" list (any version)"""
+    manifest = read_manifest_header(path)
+    manifest["files"] = list(iter_manifest_entries(path))
+    return manifest
+
+
+def hash_manifest_file(path: str) -> str:
+    """SHA-256 of the manifest bytes, read in blocks"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
@@ -3,7 +3,10 @@ Merkle tree implementation for snapshot integrity verification
 """
 import hashlib
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Optional
+
+# Merkle root của snapshot rỗng
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
 
 class MerkleTree:
     """Merkle Tree implementation for snapshot verification"""
@@ -37,11 +40,22 @@ class MerkleTree:
         
         # Handle empty directory
         if not leaf_hashes:
-            return hashlib.sha256(b"").hexdigest()
+            return EMPTY_ROOT
         
         # Build Merkle tree
         return MerkleTree._build_tree(leaf_hashes)
     
+    @staticmethod
+    def compute_root_from_entries(file_entries: Iterable[Dict[str, Any]]) -> str:
+        """
+        Compute Merkle root from file entries without loading them all
+        Gives the same root as compute_merkle_root on the equivalent manifest
+        """
+        builder = MerkleBuilder()
+        for file_entry in file_entries:
+            builder.add_entry(file_entry)
+        return builder.root()
+    
     @staticmethod
     def _build_tree(hashes: List[str]) -> str:
         """Recursively build Merkle tree"""
@@ -66,4 +80,93 @@ class MerkleTree:
     def verify_merkle_root(manifest_json: str, expected_root: str) -> bool:
         """Verify manifest against expected Merkle root"""
         computed_root = MerkleTree.compute_merkle_root(manifest_json)
-        return computed_root == expected_root
\ No newline at end of file
+        return computed_root == expected_root
+
+def _hash_pair(left: str, right: str) -> str:
+    return hashlib.sha256((left + right).encode()).hexdigest()
+
+
+class MerkleBuilder:
+    """
+    Incremental Merkle root over leaves added in manifest order
+    Keeps one pending node per tree level, so memory is O(log n)
+    """
+    
+    def __init__(self):
+        self._levels: List[Optional[str]] = []
+        self.count = 0
+    
+    def add_leaf(self, leaf_hash: str) -> None:
+        self.count += 1
+        node = leaf_hash
+        level = 0
+        while True:
+            if level == len(self._levels):
+                self._levels.append(None)
+            if self._levels[level] is None:
+                self._levels[level] = node
+                return
+            # Đủ cặp ở level này → đẩy lên level trên
+            node = _hash_pair(self._levels[level], node)
+            self._levels[level] = None
+            level += 1
+    
+    def add_entry(self, file_entry: Dict[str, Any]) -> None:
+        self.add_leaf(MerkleTree.compute_leaf_hash(file_entry))
+    
+    def root(self) -> str:
+        """Finish the tree (odd node at a level is paired with itself, as in _build_tree)"""
+        if self.count == 0:
+            return EMPTY_ROOT
+        
+        nodes = self.count
+        carry = None
+        level = 0
+        while True:
+            pending = self._levels[level] if level < len(self._levels) else None
+            if nodes == 1:
+                return pending if pending is not None else carry
+            if pending is not None and carry is not None:
+                carry = _hash_pair(pending, carry)
+            elif pending is not None:
+                carry = _hash_pair(pending, pending)
+            elif carry is not None:
+                carry = _hash_pair(carry, carry)
+            nodes = (nodes + 1) // 2
+            level += 1
+
+
+def parent_level(nodes: bytes) -> bytes:
+    """
+    Parents of one tree level given as concatenated raw 32-byte digests
+    Same pairing as _build_tree (odd last node paired with itself)
+    """
+    parents = bytearray()
+    for i in range(0, len(nodes), 64):
+        left = nodes[i:i + 32].hex()
+        right = nodes[i + 32:i + 64].hex() or left
+        parents += hashlib.sha256((left + right).encode()).digest()
+    return bytes(parents)
+
+
+def level_sizes(count: int) -> List[int]:
+    """Number of nodes on each level of a tree with `count` leaves (leaves first, root last)"""
+    sizes = [count]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def root_from_path(leaf_hash: str, position: int, sizes: List[int],
+                   sibling: Callable[[int, int], str]) -> str:
+    """
+    Root reached from a leaf through its siblings (inclusion proof)
+    sibling(level, index) returns the node at that position of the stored tree
+    """
+    node = leaf_hash
+    for level, size in enumerate(sizes[:-1]):
+        other = position ^ 1
+        pair = node if other >= size else sibling(level, other)
+        node = _hash_pair(node, pair) if position % 2 == 0 else _hash_pair(pair, node)
+        position //= 2
+    return node
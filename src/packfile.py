@@ -0,0 +1,308 @@
+"""
+Append-only packfile storage for chunks
+Groups many chunks into large pack files with an offset/length index per pack
+"""
+import os
+import re
+import struct
+import threading
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+from .utils import ensure_dir
+from .exceptions import IntegrityError
+
+PACK_MAGIC = b"BKPACK01"
+DEFAULT_PACK_SIZE = 128 * 1024 * 1024  # 128 MiB
+MIN_PACK_SIZE = 1024 * 1024
+
+# Record trong pack: digest (32 byte) | codec (1 byte) | length (4 byte) | data
+RECORD_HEADER = struct.Struct(">32sBI")
+# Record trong .idx: digest | offset của data | length
+INDEX_RECORD = struct.Struct(">32sQI")
+
+_PACK_NAME = re.compile(r"^pack-(\d{6})\.pack$")
+
+
+class PackStore:
+    """
+    Append-only pack files with an in-memory hash -> (pack, offset, length) index
+    The .idx files are only loaded when a lookup needs them; callers that keep
+    their own index (ChunkStorage with ChunkIndex) can read by location directly
+    """
+
+    def __init__(self, packs_dir: str, max_pack_size: int = DEFAULT_PACK_SIZE):
+        if max_pack_size < MIN_PACK_SIZE:
+            raise ValueError(f"Pack size must be at least {MIN_PACK_SIZE} bytes")
+        self.packs_dir = packs_dir
+        self.max_pack_size = max_pack_size
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, int, int]] = {}
+        self._index_loaded = False
+        self._pack_sizes: Dict[int, int] = {}
+        self._current_id: Optional[int] = None
+        self._pack_fh: Optional[BinaryIO] = None
+        self._idx_fh: Optional[BinaryIO] = None
+
+        ensure_dir(self.packs_dir)
+
+    # ---------- paths ----------
+
+    def pack_path(self, pack_id: int) -> str:
+        return os.path.join(self.packs_dir, f"pack-{pack_id:06d}.pack")
+
+    def index_path(self, pack_id: int) -> str:
+        return os.path.join(self.packs_dir, f"pack-{pack_id:06d}.idx")
+
+    def pack_ids(self) -> list:
+        """Sorted ids of all pack files on disk"""
+        ids = []
+        for name in os.listdir(self.packs_dir):
+            match = _PACK_NAME.match(name)
+            if match:
+                ids.append(int(match.group(1)))
+        return sorted(ids)
+
+    # ---------- index ----------
+
+    def _pack_size(self, pack_id: int) -> int:
+        if pack_id not in self._pack_sizes:
+            self._pack_sizes[pack_id] = os.path.getsize(self.pack_path(pack_id))
+        return self._pack_sizes[pack_id]
+
+    def _ensure_index(self) -> None:
+        with self._lock:
+            if not self._index_loaded:
+                self._load_index()
+                self._index_loaded = True
+
+    def _load_index(self) -> None:
+        """Load all .idx files; rebuild an index that is missing or damaged"""
+        for pack_id in self.pack_ids():
+            pack_size = self._pack_size(pack_id)
+
+            idx_path = self.index_path(pack_id)
+            if not os.path.exists(idx_path):
+                self.rebuild_pack_index(pack_id)
+                continue
+
+            with open(idx_path, 'rb') as f:
+                data = f.read()
+
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            for pos in range(0, usable, INDEX_RECORD.size):
+                digest, offset, length = INDEX_RECORD.unpack_from(data, pos)
+                # Bỏ qua entry trỏ ra ngoài pack (crash giữa lúc ghi pack và idx)
+                if offset + length > pack_size:
+                    continue
+                self._index[digest.hex()] = (pack_id, offset, length)
+
+    def rebuild_pack_index(self, pack_id: int) -> int:
+        """Rebuild one .idx file by scanning its pack; returns number of chunks"""
+        entries = list(self.scan_pack(pack_id))
+
+        temp_path = self.index_path(pack_id) + ".tmp"
+        with open(temp_path, 'wb') as f:
+            for chunk_hash, _, offset, length in entries:
+                f.write(INDEX_RECORD.pack(bytes.fromhex(chunk_hash), offset, length))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temp_path, self.index_path(pack_id))
+
+        for chunk_hash, _, offset, length in entries:
+            self._index[chunk_hash] = (pack_id, offset, length)
+        return len(entries)
+
+    def scan_pack(self, pack_id: int) -> Iterator[Tuple[str, int, int, int]]:
+        """
+        Walk the records of a pack file
+        Yields (chunk_hash, codec, data_offset, length); stops at a torn tail record
+        """
+        path = self.pack_path(pack_id)
+        pack_size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            if f.read(len(PACK_MAGIC)) != PACK_MAGIC:
+                raise IntegrityError(f"Not a pack file: {path}")
+            pos = len(PACK_MAGIC)
+            while pos + RECORD_HEADER.size <= pack_size:
+                header = f.read(RECORD_HEADER.size)
+                digest, codec, length = RECORD_HEADER.unpack(header)
+                data_offset = pos + RECORD_HEADER.size
+                if data_offset + length > pack_size:
+                    break
+                yield digest.hex(), codec, data_offset, length
+                f.seek(length, os.SEEK_CUR)
+                pos = data_offset + length
+
+    # ---------- read ----------
+
+    def contains(self, chunk_hash: str) -> bool:
+        self._ensure_index()
+        return chunk_hash in self._index
+
+    def locate(self, chunk_hash: str) -> Optional[Tuple[int, int, int]]:
+        """(pack_id, offset, length) of a chunk, or None"""
+        self._ensure_index()
+        return self._index.get(chunk_hash)
+
+    def get(self, chunk_hash: str) -> Tuple[int, bytes]:
+        """Read (codec, stored data) of a chunk from its pack"""
+        self._ensure_index()
+        location = self._index.get(chunk_hash)
+        if location is None:
+            raise IntegrityError(f"Chunk not found: {chunk_hash}")
+        return self.read_record(*location)
+
+    def read_at(self, pack_id: int, offset: int, length: int) -> bytes:
+        """Read raw bytes from a pack"""
+        with self._lock:
+            # Dữ liệu đang nằm trong buffer của pack hiện tại phải được flush trước khi đọc
+            if pack_id == self._current_id and self._pack_fh is not None:
+                self._pack_fh.flush()
+        with open(self.pack_path(pack_id), 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        if len(data) != length:
+            raise IntegrityError(f"Truncated pack record in pack {pack_id} at offset {offset}")
+        return data
+
+    def read_record(self, pack_id: int, offset: int, length: int) -> Tuple[int, bytes]:
+        """Read (codec, stored data) of the record whose data starts at offset"""
+        record = self.read_at(pack_id, offset - RECORD_HEADER.size, RECORD_HEADER.size + length)
+        _, codec, stored_length = RECORD_HEADER.unpack_from(record)
+        if stored_length != length:
+            raise IntegrityError(f"Pack record length mismatch in pack {pack_id} at offset {offset}")
+        return codec, record[RECORD_HEADER.size:]
+
+    def __len__(self) -> int:
+        self._ensure_index()
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[str]:
+        self._ensure_index()
+        return iter(list(self._index))
+
+    # ---------- write ----------
+
+    def _open_current(self, needed: int, reuse_last: bool = True) -> None:
+        """Open the pack to append to, rolling over to a new pack when full"""
+        if self._pack_fh is not None:
+            size = self._pack_sizes[self._current_id]
+            if size + needed <= self.max_pack_size or size <= len(PACK_MAGIC):
+                return
+            self._close_current()
+            reuse_last = False
+
+        ids = self.pack_ids()
+        if ids and reuse_last:
+            last = ids[-1]
+            if self._pack_size(last) + needed <= self.max_pack_size:
+                self._current_id = last
+                self._pack_fh = open(self.pack_path(last), 'ab')
+                self._idx_fh = open(self.index_path(last), 'ab')
+                return
+
+        new_id = (ids[-1] + 1) if ids else 1
+        self._current_id = new_id
+        self._pack_fh = open(self.pack_path(new_id), 'ab')
+        self._idx_fh = open(self.index_path(new_id), 'ab')
+        self._pack_fh.write(PACK_MAGIC)
+        self._pack_sizes[new_id] = len(PACK_MAGIC)
+
+    def put(self, chunk_hash: str, data: bytes, codec: int = 0) -> Tuple[int, int, int]:
+        """
+        Append a chunk and return its location
+        Deduplicates against the pack indexes when they are loaded; otherwise the
+        caller is expected to have checked its own index first
+        """
+        with self._lock:
+            location = self._index.get(chunk_hash)
+            if location is not None:
+                return location
+
+            self._open_current(RECORD_HEADER.size + len(data))
+            return self._append(chunk_hash, data, codec)
+
+    def _append(self, chunk_hash: str, data: bytes, codec: int) -> Tuple[int, int, int]:
+        """Write one record to the current pack (caller holds the lock)"""
+        pack_id = self._current_id
+        offset = self._pack_sizes[pack_id] + RECORD_HEADER.size
+
+        self._pack_fh.write(RECORD_HEADER.pack(bytes.fromhex(chunk_hash), codec, len(data)))
+        self._pack_fh.write(data)
+        # Pack phải được ghi trước index để idx không trỏ tới dữ liệu chưa có
+        self._pack_fh.flush()
+        self._idx_fh.write(INDEX_RECORD.pack(bytes.fromhex(chunk_hash), offset, len(data)))
+
+        self._pack_sizes[pack_id] = offset + len(data)
+        location = (pack_id, offset, len(data))
+        self._index[chunk_hash] = location
+        return location
+
+    # ---------- garbage collection ----------
+
+    def copy_records(self, pack_id: int, keep: Iterable[str]) -> Dict[str, Tuple[int, int, int]]:
+        """
+        Copy the records of `keep` out of a pack into newer packs (used by gc repack)
+        Records keep their codec and payload; the source pack is left untouched
+        until delete_pack(). Returns the new location of every copied chunk
+        """
+        keep = set(keep)
+        moved: Dict[str, Tuple[int, int, int]] = {}
+        with self._lock:
+            # Không bao giờ ghi vào chính pack đang được repack
+            if self._current_id == pack_id or self._pack_fh is None:
+                self._close_current()
+                self._open_current(0, reuse_last=False)
+
+        with open(self.pack_path(pack_id), 'rb') as src:
+            for chunk_hash, codec, offset, length in self.scan_pack(pack_id):
+                if chunk_hash not in keep:
+                    continue
+                src.seek(offset)
+                data = src.read(length)
+                with self._lock:
+                    self._open_current(RECORD_HEADER.size + length)
+                    moved[chunk_hash] = self._append(chunk_hash, data, codec)
+        self.flush()
+        return moved
+
+    def delete_pack(self, pack_id: int) -> None:
+        """Remove a pack and its .idx file"""
+        with self._lock:
+            if self._current_id == pack_id:
+                self._close_current()
+            for path in (self.pack_path(pack_id), self.index_path(pack_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._pack_sizes.pop(pack_id, None)
+            for chunk_hash in [h for h, loc in self._index.items() if loc[0] == pack_id]:
+                del self._index[chunk_hash]
+
+    def pack_size(self, pack_id: int) -> int:
+        """Current size of a pack file in bytes"""
+        with self._lock:
+            return self._pack_size(pack_id)
+
+    def flush(self) -> None:
+        """Make appended chunks durable (fsync pack, then index)"""
+        with self._lock:
+            if self._pack_fh is not None:
+                self._pack_fh.flush()
+                os.fsync(self._pack_fh.fileno())
+                self._idx_fh.flush()
+                os.fsync(self._idx_fh.fileno())
+
+    def _close_current(self) -> None:
+        if self._pack_fh is not None:
+            self._pack_fh.flush()
+            os.fsync(self._pack_fh.fileno())
+            self._pack_fh.close()
+            self._idx_fh.flush()
+            os.fsync(self._idx_fh.fileno())
+            self._idx_fh.close()
+        self._pack_fh = None
+        self._idx_fh = None
+        self._current_id = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_current()
@@ -0,0 +1,287 @@
+"""
+Sorted path index per snapshot (<snapshot_id>.pathidx, sidecar of the manifest)
+One file or one directory is found with a binary search + range scan instead of
+parsing the whole manifest, whatever the manifest format
+The sidecar is not trusted: it stores the snapshot's Merkle tree, and every entry
+read with a merkle_root is checked by an inclusion proof up to that root
+"""
+import os
+import sys
+import json
+import mmap
+import struct
+import fnmatch
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from .merkle import MerkleTree, EMPTY_ROOT, level_sizes, parent_level, root_from_path
+from .exceptions import IntegrityError
+
+PATH_INDEX_MAGIC = b"BKPIDX02"
+# File: magic | entry* | offset u64 * N | tree | trailer JSON
+#       | u64 offsets_start | u64 tree_start | u32 trailer len | magic
+#   entry: JSON của manifest entry (sort_keys) + "\n", theo thứ tự path của manifest
+#   tree: mọi level của Merkle tree (digest 32 byte), từ leaf tới root
+#   trailer: snapshot_id, merkle_root, manifest_hash, total_files của snapshot
+_FOOTER = struct.Struct(">QQI8s")
+_OFFSET = struct.Struct(">Q")
+_NODE_SIZE = 32
+_GLOB_CHARS = "*?["
+
+
+def _encode_entry(entry: Dict[str, Any]) -> bytes:
+    # ensure_ascii: tên file không phải UTF-8 (surrogateescape) được escape trong JSON
+    return (json.dumps(entry, sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+
+def normalize_path(path: str) -> str:
+    """User-supplied path → manifest form (relative, "/" separators, no leading "./")"""
+    path = path.replace(os.sep, "/")
+    while path.startswith("./"):
+        path = path[2:]
+    return path.strip("/")
+
+
+class PathIndexWriter:
+    """
+    Entries must be added in manifest (sorted path) order
+    The index is built in a temp file and moved into place by commit()
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.temp_path = path + ".tmp"
+        self._file = open(self.temp_path, 'wb')
+        self._file.write(PATH_INDEX_MAGIC)
+        self._pos = len(PATH_INDEX_MAGIC)
+        self._offsets = array("Q")
+        self._leaves = bytearray()
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        data = _encode_entry(entry)
+        self._offsets.append(self._pos)
+        self._file.write(data)
+        self._pos += len(data)
+        self._leaves += bytes.fromhex(MerkleTree.compute_leaf_hash(entry))
+
+    def finish(self, info: Dict[str, Any]) -> None:
+        """
+        Write the offset table, the Merkle tree and the trailer (info of the snapshot)
+        Raises IntegrityError if the entries do not hash to info["merkle_root"]
+        """
+        offsets_start = self._pos
+        # Bảng offset big-endian (u64), ghi 1 lần thay vì pack từng giá trị
+        if sys.byteorder == "little":
+            self._offsets.byteswap()
+        self._file.write(self._offsets.tobytes())
+        tree_start = offsets_start + len(self._offsets) * _OFFSET.size
+        
+        level = bytes(self._leaves)
+        self._file.write(level)
+        while len(level) > _NODE_SIZE:
+            level = parent_level(level)
+            self._file.write(level)
+        root = level.hex() if level else EMPTY_ROOT
+        if root != info.get("merkle_root", root):
+            raise IntegrityError("Path index entries do not match the snapshot Merkle root")
+        
+        trailer = json.dumps(dict(info, total_files=len(self._offsets)), sort_keys=True).encode()
+        self._file.write(trailer + _FOOTER.pack(offsets_start, tree_start, len(trailer),
+                                                PATH_INDEX_MAGIC))
+        # Không fsync: index là dữ liệu dẫn xuất, file hỏng được dựng lại từ manifest
+        self._file.close()
+
+    def commit(self) -> None:
+        os.replace(self.temp_path, self.path)
+
+    def abort(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def build_path_index(path: str, entries: Iterable[Dict[str, Any]], info: Dict[str, Any]) -> None:
+    """Write a complete path index for manifest entries (in manifest order)"""
+    writer = PathIndexWriter(path)
+    try:
+        for entry in entries:
+            writer.add(entry)
+        writer.finish(info)
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+class PathIndex:
+    """
+    Read-only view of a path index (mmap)
+    Raises ValueError when the file is not a complete path index
+    
+    With merkle_root (from the authenticated snapshot metadata) every entry that is
+    read is proven to be the manifest entry at its position, and lookups/scans check
+    that no entry was dropped or repeated; otherwise IntegrityError is raised.
+    The entry "size" is not covered by the Merkle leaf: readers check it against the
+    chunk lengths
+    """
+
+    def __init__(self, path: str, merkle_root: Optional[str] = None):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(PATH_INDEX_MAGIC) + _FOOTER.size:
+                raise ValueError("Path index truncated")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            offsets_start, tree_start, trailer_len, magic = _FOOTER.unpack_from(
+                self._map, size - _FOOTER.size)
+            trailer_start = size - _FOOTER.size - trailer_len
+            if (magic != PATH_INDEX_MAGIC or self._map[:len(PATH_INDEX_MAGIC)] != PATH_INDEX_MAGIC
+                    or not len(PATH_INDEX_MAGIC) <= offsets_start <= tree_start <= trailer_start):
+                raise ValueError("Path index truncated or corrupted")
+            self.info = json.loads(self._map[trailer_start:size - _FOOTER.size])
+            self._count = (tree_start - offsets_start) // _OFFSET.size
+            if not isinstance(self.info, dict) or self.info.get("total_files") != self._count:
+                raise ValueError("Path index trailer does not match its offset table")
+            # Vị trí bắt đầu của từng level trong tree
+            self._sizes = level_sizes(self._count)
+            self._level_starts = []
+            pos = tree_start
+            for level_size in self._sizes if self._count else []:
+                self._level_starts.append(pos)
+                pos += level_size * _NODE_SIZE
+            if pos != trailer_start:
+                raise ValueError("Path index Merkle tree truncated")
+        except BaseException:
+            self._map.close()
+            raise
+        self._offsets_start = offsets_start
+        self._root = merkle_root
+        if merkle_root is not None and self._count == 0 and merkle_root != EMPTY_ROOT:
+            self._map.close()
+            raise IntegrityError("Path index is empty but the snapshot is not")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "PathIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _node(self, level: int, i: int) -> str:
+        start = self._level_starts[level] + i * _NODE_SIZE
+        return self._map[start:start + _NODE_SIZE].hex()
+
+    def _entry(self, i: int) -> Dict[str, Any]:
+        start = _OFFSET.unpack_from(self._map, self._offsets_start + i * _OFFSET.size)[0]
+        end = self._map.find(b"\n", start, self._offsets_start)
+        if end < 0:
+            raise ValueError("Path index entry truncated")
+        entry = json.loads(self._map[start:end])
+        if self._root is not None:
+            # Inclusion proof: O(log n) hash từ leaf của entry lên tới merkle_root
+            try:
+                leaf = MerkleTree.compute_leaf_hash(entry)
+            except (KeyError, TypeError, AttributeError, UnicodeError):
+                raise IntegrityError(f"Path index entry {i} is malformed")
+            if root_from_path(leaf, i, self._sizes, self._node) != self._root:
+                raise IntegrityError(f"Path index entry {i} does not belong to the snapshot manifest")
+        return entry
+
+    def _lower_bound(self, path: str) -> int:
+        """Position of the first entry whose path is >= path (O(log n) entries parsed)"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)["path"] < path:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self._count and lo and self._root is not None:
+            # Entry cuối được chứng minh ở đúng vị trí cuối → index không bị cắt bớt
+            self._entry(lo - 1)
+        return lo
+
+    def lookup(self, path: str) -> Optional[Dict[str, Any]]:
+        """Manifest entry of one file, or None"""
+        i = self._lower_bound(path)
+        if i < self._count:
+            entry = self._entry(i)
+            if entry["path"] == path:
+                return entry
+        return None
+
+    def iter_prefix(self, prefix: str = "") -> Iterator[Dict[str, Any]]:
+        """Entries whose path starts with prefix, in manifest order (range scan)"""
+        i = self._lower_bound(prefix) if prefix else 0
+        previous = None
+        while i < self._count:
+            entry = self._entry(i)
+            if previous is not None and entry["path"] <= previous:
+                # Manifest sắp xếp chặt theo path: entry lặp lại = index bị sửa
+                raise IntegrityError(f"Path index entries out of order at {i}")
+            if not entry["path"].startswith(prefix):
+                return
+            yield entry
+            previous = entry["path"]
+            i += 1
+
+
+class PathFilter:
+    """
+    restore --include/--exclude
+    Pattern không có ký tự glob chọn đúng 1 file hoặc cả một thư mục; glob (fnmatch, `*` khớp
+    cả "/") được so với path và với từng thư mục cha của nó. Không có include = mọi file
+    """
+
+    def __init__(self, includes: Iterable[str] = (), excludes: Iterable[str] = ()):
+        self.includes = [self._normalize(p) for p in includes]
+        self.excludes = [self._normalize(p) for p in excludes]
+
+    @staticmethod
+    def _normalize(pattern: str) -> str:
+        return normalize_path(pattern)
+
+    @staticmethod
+    def _literal_prefix(pattern: str) -> str:
+        for i, char in enumerate(pattern):
+            if char in _GLOB_CHARS:
+                return pattern[:i]
+        return pattern
+
+    @staticmethod
+    def _matches(path: str, pattern: str) -> bool:
+        if not pattern:
+            return True
+        if not any(char in pattern for char in _GLOB_CHARS):
+            return path == pattern or path.startswith(pattern + "/")
+        parts = path.split("/")
+        return any(fnmatch.fnmatchcase("/".join(parts[:i]), pattern)
+                   for i in range(1, len(parts) + 1))
+
+    def matches(self, path: str) -> bool:
+        if self.includes and not any(self._matches(path, p) for p in self.includes):
+            return False
+        return not any(self._matches(path, p) for p in self.excludes)
+
+    def prefixes(self) -> List[str]:
+        """Sorted, non-overlapping path prefixes to range-scan ([""] = whole snapshot)"""
+        if not self.includes:
+            return [""]
+        merged: List[str] = []
+        for prefix in sorted({self._literal_prefix(p) for p in self.includes}):
+            if merged and prefix.startswith(merged[-1]):
+                continue
+            merged.append(prefix)
+        return merged
+
+    def select(self, index: PathIndex) -> Iterator[Dict[str, Any]]:
+        """Matching entries of a snapshot, in manifest order"""
+        for prefix in self.prefixes():
+            for entry in index.iter_prefix(prefix):
+                if self.matches(entry["path"]):
+                    yield entry
@@ -0,0 +1,383 @@
+"""
+Parallel pipelines
+Backup: reader threads -> hash workers -> writer workers
+Restore: file workers writing in order, fed by a chunk prefetch pool
+"""
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .utils import compute_hash, ensure_dir, is_zero_chunk, zero_chunk_marker, zero_chunk_length
+from .exceptions import IntegrityError
+
+# Sentinel báo hết việc cho worker
+_DONE = object()
+
+
+class _FileState:
+    """Progress of one file moving through the pipeline"""
+
+    __slots__ = ("rel_path", "hashes", "size", "expected", "stored")
+
+    def __init__(self, rel_path: str):
+        self.rel_path = rel_path
+        self.hashes: Dict[int, str] = {}
+        self.size = 0
+        self.expected: Optional[int] = None
+        self.stored = 0
+
+    def is_complete(self) -> bool:
+        return self.expected is not None and self.stored == self.expected
+
+
+class BackupPipeline:
+    """
+    Producer/consumer pipeline for chunking, hashing and storing files
+
+    Readers split files into chunks, hash workers compute SHA-256 (hashlib
+    releases the GIL for large buffers, so hashing scales across cores) and
+    writers store chunks. All queues are bounded so memory stays proportional
+    to the number of jobs. Results are yielded in input order, so the
+    resulting manifest is identical to a serial backup.
+    """
+
+    def __init__(self, storage, jobs: int, queue_size: Optional[int] = None,
+                 max_pending_files: Optional[int] = None):
+        if jobs < 1:
+            raise ValueError(f"Invalid number of jobs: {jobs}")
+        self.storage = storage
+        self.jobs = jobs
+        self.queue_size = queue_size or jobs * 2
+        self.max_pending_files = max_pending_files or jobs * 64
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._states: Dict[int, _FileState] = {}
+
+    # ---------- helpers ----------
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up when the pipeline aborts"""
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        """Blocking get that returns the sentinel when the pipeline aborts"""
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error: BaseException) -> None:
+        with self._cond:
+            if self._error is None:
+                self._error = error
+            self._abort.set()
+            self._cond.notify_all()
+
+    def _stage_finished(self, counter: List[int], next_queue: Optional[queue.Queue],
+                        next_workers: int) -> None:
+        """Last worker of a stage forwards sentinels to the next stage"""
+        with self._lock:
+            counter[0] -= 1
+            last = counter[0] == 0
+        if last and next_queue is not None:
+            for _ in range(next_workers):
+                self._put(next_queue, _DONE)
+
+    # ---------- stages ----------
+
+    def _feed(self, files: Iterable[Tuple[str, str, Optional[Tuple[List[str], int]]]],
+              file_queue: queue.Queue, pending: threading.Semaphore) -> None:
+        try:
+            for idx, (rel_path, file_path, cached) in enumerate(files):
+                # Giới hạn số file đang chờ để reorder buffer không phình to
+                while not pending.acquire(timeout=0.1):
+                    if self._abort.is_set():
+                        return
+
+                state = _FileState(rel_path)
+                if cached is not None:
+                    # File không đổi (file cache): đi thẳng ra output, không đọc lại
+                    chunks, size = cached
+                    state.hashes = dict(enumerate(chunks))
+                    state.size = size
+                    state.expected = state.stored = len(chunks)
+
+                with self._cond:
+                    self._states[idx] = state
+                    if cached is not None:
+                        self._cond.notify_all()
+                        continue
+                if not self._put(file_queue, (idx, file_path)):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.jobs):
+                self._put(file_queue, _DONE)
+
+    def _read(self, file_queue: queue.Queue, hash_queue: queue.Queue,
+              readers: List[int]) -> None:
+        try:
+            while True:
+                item = self._get(file_queue)
+                if item is _DONE:
+                    break
+                idx, file_path = item
+
+                count = 0
+                size = 0
+                for chunk in self.storage.chunker.chunk_file(file_path):
+                    if not self._put(hash_queue, (idx, count, chunk)):
+                        return
+                    count += 1
+                    size += len(chunk)
+
+                with self._cond:
+                    state = self._states[idx]
+                    state.size = size
+                    state.expected = count
+                    if state.is_complete():
+                        self._cond.notify_all()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stage_finished(readers, hash_queue, self.jobs)
+
+    def _hash(self, hash_queue: queue.Queue, write_queue: queue.Queue,
+              hashers: List[int]) -> None:
+        try:
+            while True:
+                item = self._get(hash_queue)
+                if item is _DONE:
+                    break
+                idx, chunk_idx, chunk = item
+                if is_zero_chunk(chunk):
+                    chunk_hash = zero_chunk_marker(len(chunk))
+                else:
+                    chunk_hash = compute_hash(chunk)
+                if not self._put(write_queue, (idx, chunk_idx, chunk_hash, chunk)):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stage_finished(hashers, write_queue, self.jobs)
+
+    def _write(self, write_queue: queue.Queue, writers: List[int]) -> None:
+        try:
+            while True:
+                item = self._get(write_queue)
+                if item is _DONE:
+                    break
+                idx, chunk_idx, chunk_hash, chunk = item
+                self.storage.store_chunk(chunk, chunk_hash=chunk_hash)
+
+                with self._cond:
+                    state = self._states[idx]
+                    state.hashes[chunk_idx] = chunk_hash
+                    state.stored += 1
+                    if state.is_complete():
+                        self._cond.notify_all()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stage_finished(writers, None, 0)
+
+    # ---------- driver ----------
+
+    def run(self, files: Iterable[Tuple[str, str, Optional[Tuple[List[str], int]]]]
+            ) -> Iterator[Tuple[str, List[str], int]]:
+        """
+        Process (rel_path, file_path, cached) items
+        cached is (chunk_hashes, size) for files known to be unchanged, else None
+        Yields (rel_path, chunk_hashes, size) in the same order as the input
+        """
+        file_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        hash_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        pending = threading.Semaphore(self.max_pending_files)
+        feed_done = threading.Event()
+
+        def feed():
+            self._feed(files, file_queue, pending)
+            feed_done.set()
+            with self._cond:
+                self._cond.notify_all()
+
+        readers = [self.jobs]
+        hashers = [self.jobs]
+        writers = [self.jobs]
+        threads = [threading.Thread(target=feed, name="backup-feed", daemon=True)]
+        for i in range(self.jobs):
+            threads.append(threading.Thread(target=self._read, name=f"backup-read-{i}",
+                                            args=(file_queue, hash_queue, readers), daemon=True))
+            threads.append(threading.Thread(target=self._hash, name=f"backup-hash-{i}",
+                                            args=(hash_queue, write_queue, hashers), daemon=True))
+            threads.append(threading.Thread(target=self._write, name=f"backup-write-{i}",
+                                            args=(write_queue, writers), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            next_idx = 0
+            while True:
+                with self._cond:
+                    while True:
+                        if self._error is not None:
+                            raise self._error
+                        state = self._states.get(next_idx)
+                        if state is not None and state.is_complete():
+                            del self._states[next_idx]
+                            break
+                        if state is None and feed_done.is_set():
+                            state = None
+                            break
+                        self._cond.wait(0.1)
+
+                if state is None:
+                    break
+
+                pending.release()
+                hashes = [state.hashes[i] for i in range(state.expected)]
+                yield state.rel_path, hashes, state.size
+                next_idx += 1
+        finally:
+            self._abort.set()
+            for thread in threads:
+                thread.join()
+
+
+class RestorePipeline:
+    """
+    Restore many files at once
+
+    File workers each rebuild one file at a time, writing chunks strictly in
+    order. Chunks are fetched and re-hashed ahead of the writer by a shared
+    prefetch pool; each file keeps at most `prefetch` chunks in flight, so
+    memory stays bounded by jobs * prefetch chunks.
+    """
+
+    def __init__(self, storage, jobs: int, prefetch: int = 4):
+        if jobs < 1:
+            raise ValueError(f"Invalid number of jobs: {jobs}")
+        self.storage = storage
+        self.jobs = jobs
+        self.prefetch = max(1, prefetch)
+
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def _fail(self, error: BaseException) -> None:
+        with self._lock:
+            if self._error is None:
+                self._error = error
+            self._abort.set()
+
+    def _fetch(self, chunk_hash: str) -> bytes:
+        """Read a chunk and check it against its hash"""
+        chunk_data = self.storage.get_chunk(chunk_hash)
+        if compute_hash(chunk_data) != chunk_hash:
+            raise IntegrityError(f"Chunk corrupted: {chunk_hash[:16]}...")
+        return chunk_data
+
+    def _restore_file(self, file_entry: Dict, target_path: str,
+                      fetcher: ThreadPoolExecutor) -> None:
+        file_path = os.path.join(target_path, file_entry["path"])
+        ensure_dir(os.path.dirname(file_path))
+
+        chunks = iter(file_entry["chunks"])
+        in_flight = deque()
+        with open(file_path, 'wb') as f:
+            while True:
+                # Prefetch trước tối đa `prefetch` chunk, ghi theo đúng thứ tự
+                while len(in_flight) < self.prefetch:
+                    chunk_hash = next(chunks, None)
+                    if chunk_hash is None:
+                        break
+                    # Chunk toàn 0: chỉ giữ độ dài, không cần đọc
+                    zero_length = zero_chunk_length(chunk_hash)
+                    in_flight.append(zero_length if zero_length is not None
+                                     else fetcher.submit(self._fetch, chunk_hash))
+                if not in_flight:
+                    break
+                if self._abort.is_set():
+                    return
+                item = in_flight.popleft()
+                if isinstance(item, int):
+                    # Tạo lại hole bằng seek thay vì ghi byte 0
+                    f.seek(item, os.SEEK_CUR)
+                else:
+                    f.write(item.result())
+            f.truncate()
+
+    def _worker(self, file_queue: queue.Queue, target_path: str,
+                fetcher: ThreadPoolExecutor) -> None:
+        while not self._abort.is_set():
+            try:
+                file_entry = file_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if file_entry is _DONE:
+                return
+            try:
+                self._restore_file(file_entry, target_path, fetcher)
+            except BaseException as e:
+                self._fail(e)
+                return
+
+    def run(self, files: Iterable[Dict], target_path: str) -> int:
+        """Restore manifest file entries under target_path; returns number of files"""
+        file_queue: queue.Queue = queue.Queue(maxsize=self.jobs * 2)
+        count = 0
+
+        with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="restore-fetch") as fetcher:
+            workers = [
+                threading.Thread(target=self._worker, name=f"restore-write-{i}",
+                                 args=(file_queue, target_path, fetcher), daemon=True)
+                for i in range(self.jobs)
+            ]
+            for worker in workers:
+                worker.start()
+
+            try:
+                for file_entry in files:
+                    while not self._abort.is_set():
+                        try:
+                            file_queue.put(file_entry, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if self._abort.is_set():
+                        break
+                    count += 1
+                for _ in workers:
+                    while not self._abort.is_set():
+                        try:
+                            file_queue.put(_DONE, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+            except BaseException as e:
+                # Lỗi khi đọc manifest (hoặc Ctrl-C): dừng worker trước khi join
+                self._fail(e)
+                raise
+            finally:
+                for worker in workers:
+                    worker.join()
+
+        if self._error is not None:
+            raise self._error
+        return count
@@ -5,6 +5,7 @@ import yaml
 import os
 from typing import Dict, List, Set, Optional
 from .utils import get_os_user
+from .retention import validate_retention
 from .exceptions import PolicyDeniedError
 
 class PolicyManager:
@@ -34,14 +35,15 @@ class PolicyManager:
             "roles": {
                 "admin": [
                     "init", "backup", "list-snapshots", 
-                    "verify", "restore", "audit-verify"
+                    "verify", "verify-all", "restore", "cat", "audit-verify",
+                    "migrate-storage", "rebuild-index", "forget", "gc", "prune"
                 ],
                 "operator": [
                     "backup", "list-snapshots", "verify", 
-                    "restore", "audit-verify"
+                    "verify-all", "restore", "cat", "audit-verify"
                 ],
                 "auditor": [
-                    "list-snapshots", "verify", "audit-verify"
+                    "list-snapshots", "verify", "verify-all", "audit-verify"
                 ]
             }
         }
@@ -56,6 +58,14 @@ class PolicyManager:
         required_roles = {"admin", "operator", "auditor"}
         if not required_roles.issubset(self.policy["roles"].keys()):
             raise ValueError(f"Policy must contain roles: {required_roles}")
+        
+        # Section retention là tùy chọn (chỉ dùng cho prune)
+        if self.policy.get("retention") is not None:
+            validate_retention(self.policy["retention"])
+    
+    def get_retention(self) -> Dict[str, int]:
+        """Retention rules for prune (empty if the policy has none)"""
+        return dict(self.policy.get("retention") or {})
     
     def check_permission(self, command: str, user: Optional[str] = None) -> bool:
         """
@@ -0,0 +1,116 @@
+"""
+Random-access reads of one file inside a snapshot
+Byte offsets are mapped to chunks through cumulative chunk lengths, so only the
+chunks overlapping the requested range are read (and hash-checked)
+"""
+import io
+import bisect
+from typing import Dict, Iterator, List, Optional, Tuple
+from .utils import compute_hash, zero_chunk_length
+from .exceptions import IntegrityError
+
+
+class SnapshotReader(io.RawIOBase):
+    """
+    Seekable, read-only file object for one manifest entry
+
+    Chunk lengths come from the chunk index; a chunk stored before lengths were
+    recorded is read once to learn its length (and the length is kept in the index).
+    """
+
+    def __init__(self, storage, entry: Dict):
+        super().__init__()
+        self.storage = storage
+        self.path: str = entry["path"]
+        self.size: int = entry["size"]
+        self._chunks: List[str] = entry["chunks"]
+        self._starts: Optional[List[int]] = None
+        self._pos = 0
+        # Chunk vừa đọc: đọc tuần tự từng đoạn nhỏ không phải lấy lại chunk
+        self._cached: Optional[Tuple[int, bytes]] = None
+
+    def _chunk(self, i: int) -> bytes:
+        """Chunk i of the file, checked against its hash"""
+        if self._cached is not None and self._cached[0] == i:
+            return self._cached[1]
+        chunk_hash = self._chunks[i]
+        chunk_data = self.storage.get_chunk(chunk_hash)
+        if zero_chunk_length(chunk_hash) is None and compute_hash(chunk_data) != chunk_hash:
+            raise IntegrityError(f"Chunk corrupted: {chunk_hash[:16]}...")
+        self._cached = (i, chunk_data)
+        return chunk_data
+
+    def _chunk_starts(self) -> List[int]:
+        """Offset of the first byte of every chunk in the file"""
+        if self._starts is not None:
+            return self._starts
+
+        lengths = self.storage.index.get_lengths(self._chunks)
+        learned = False
+        starts = []
+        offset = 0
+        for i, chunk_hash in enumerate(self._chunks):
+            starts.append(offset)
+            length = zero_chunk_length(chunk_hash)
+            if length is None:
+                length = lengths.get(chunk_hash)
+            if length is None:
+                length = lengths[chunk_hash] = len(self._chunk(i))
+                self.storage.index.set_length(chunk_hash, length)
+                learned = True
+            offset += length
+        if learned:
+            self.storage.index.commit()
+        if offset != self.size:
+            raise IntegrityError(f"Chunks of {self.path} hold {offset} bytes, manifest says {self.size}")
+        self._starts = starts
+        return starts
+
+    def iter_range(self, offset: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the bytes [offset, offset + length) piece by piece (length=None: to the end)"""
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError("Offset and length must not be negative")
+        end = self.size if length is None else min(self.size, offset + length)
+        if offset >= end:
+            return
+
+        starts = self._chunk_starts()
+        i = bisect.bisect_right(starts, offset) - 1
+        while i < len(starts) and starts[i] < end:
+            chunk_data = self._chunk(i)
+            yield chunk_data[max(offset - starts[i], 0):min(end - starts[i], len(chunk_data))]
+            i += 1
+
+    # ---------- io.RawIOBase ----------
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._pos = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        count = 0
+        for piece in self.iter_range(self._pos, len(view)):
+            view[count:count + len(piece)] = piece
+            count += len(piece)
+        self._pos += count
+        return count
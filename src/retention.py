@@ -0,0 +1,63 @@
+"""
+Retention rules for prune (keep-last/hourly/daily/weekly/monthly)
+Evaluated in one pass over the snapshot list, newest first
+"""
+import time
+from typing import Dict, List, Tuple
+
+# Rule → định dạng bucket thời gian (None: keep-last, không theo bucket)
+RETENTION_RULES = {
+    "keep-last": None,
+    "keep-hourly": "%Y-%m-%d %H",
+    "keep-daily": "%Y-%m-%d",
+    "keep-weekly": "%G-W%V",
+    "keep-monthly": "%Y-%m",
+}
+
+
+def validate_retention(rules: Dict) -> None:
+    """Raise ValueError for unknown rules or counts that are not non-negative integers"""
+    if not isinstance(rules, dict):
+        raise ValueError("Policy section 'retention' must be a mapping")
+    for rule, count in rules.items():
+        if rule not in RETENTION_RULES:
+            raise ValueError(f"Unknown retention rule: {rule}. Must be one of {tuple(RETENTION_RULES)}")
+        if isinstance(count, bool) or not isinstance(count, int) or count < 0:
+            raise ValueError(f"Retention rule {rule} must be a non-negative integer, got {count!r}")
+
+
+def apply_retention(snapshots: List[Dict], rules: Dict) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Decide which snapshots to keep
+    snapshots: list_snapshots() entries; returns ({kept id: [rules]}, [removed ids])
+    Each bucket rule keeps the newest snapshot of its N most recent buckets
+    """
+    validate_retention(rules)
+    if not any(rules.values()):
+        raise ValueError("No retention rules configured; refusing to prune every snapshot")
+
+    remaining = {rule: rules[rule] for rule in RETENTION_RULES if rules.get(rule)}
+    last_bucket: Dict[str, str] = {}
+    kept: Dict[str, List[str]] = {}
+    removed: List[str] = []
+
+    for snap in sorted(snapshots, key=lambda s: s["created_at"], reverse=True):
+        local_time = time.localtime(snap["created_at"])
+        reasons = []
+        for rule, left in remaining.items():
+            if left <= 0:
+                continue
+            bucket_format = RETENTION_RULES[rule]
+            if bucket_format is not None:
+                bucket = time.strftime(bucket_format, local_time)
+                if last_bucket.get(rule) == bucket:
+                    continue
+                last_bucket[rule] = bucket
+            remaining[rule] = left - 1
+            reasons.append(rule)
+
+        if reasons:
+            kept[snap["id"]] = reasons
+        else:
+            removed.append(snap["id"])
+    return kept, removed
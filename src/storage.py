@@ -4,76 +4,476 @@ Storage engine for chunk storage and snapshot management
 import os
 import json
 import time
-from typing import Dict, List, Tuple, Any, Optional
-from .journal import Journal
+import fcntl
+import shutil
+import sqlite3
+import itertools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple, Any, Optional, Iterator, Iterable
+from .journal import Journal, DURABILITY_LEVELS, DEFAULT_DURABILITY
 from .utils import (
-    CHUNK_SIZE, compute_hash, read_file_in_chunks, 
-    ensure_dir, canonical_json
+    compute_hash, ensure_dir, is_zero_chunk, zero_chunk_marker, zero_chunk_length
 )
-from .merkle import MerkleTree
-from .exceptions import IntegrityError, SnapshotNotFoundError
+from .merkle import MerkleTree, MerkleBuilder
+from .chunker import get_chunker
+from .pipeline import BackupPipeline, RestorePipeline
+from .filecache import FileCache, RACY_WINDOW_NS
+from .pathindex import PathIndex, PathIndexWriter, PathFilter, build_path_index, normalize_path
+from .reader import SnapshotReader
+from .packfile import PackStore, DEFAULT_PACK_SIZE
+from .bloom import BloomFilter, DEFAULT_FP_RATE
+from .compression import (
+    DEFAULT_COMPRESSION, CODEC_NONE, LOOSE_FRAMED_SUFFIX, codec_id, compress_chunk,
+    decompress_chunk, encode_loose, decode_loose
+)
+from .manifest import (
+    MANIFEST_FORMATS, DEFAULT_MANIFEST_FORMAT, open_manifest_writer,
+    read_manifest_header, iter_manifest_entries, load_manifest, hash_manifest_file
+)
+from .catalog import CATALOG_BACKENDS, DEFAULT_CATALOG, open_catalog
+from .chunk_index import (
+    ChunkIndex, COMMIT_EVERY, LOOSE_LOCATION, pack_location, parse_pack_location
+)
+from .exceptions import IntegrityError, SnapshotNotFoundError, StoreLockedError, PathNotFoundError
 
 class ChunkStorage:
     """Content-addressable storage for file chunks"""
     
+    STORAGE_BACKENDS = ("loose", "packed")
+    
     def __init__(self, store_path: str):
         self.store_path = store_path
         self.chunks_dir = os.path.join(store_path, "chunks")
+        self.packs_dir = os.path.join(store_path, "packs")
         self.snapshots_dir = os.path.join(store_path, "snapshots")
         self.metadata_file = os.path.join(store_path, "metadata.json")
+        self.config_file = os.path.join(store_path, "config.json")
+        self.index_file = os.path.join(store_path, "index.db")
+        self.bloom_file = os.path.join(store_path, "chunks.bloom")
+        self.snapshot_index_file = os.path.join(store_path, "snapshot_index.json")
+        self.catalog_file = os.path.join(store_path, "catalog.db")
+        self.lock_file = os.path.join(store_path, "store.lock")
         
         ensure_dir(self.chunks_dir)
         ensure_dir(self.snapshots_dir)
+        
+        self.config = self._load_config()
+        self.chunker = get_chunker(self.config.get("chunker"))
+        self.codec = codec_id(self.config.get("compression", DEFAULT_COMPRESSION))
+        self.packs = self._open_packs(self.config)
+        
+        # Prefix dirs đã tạo trong process này (tránh makedirs cho mỗi chunk)
+        self._chunk_dirs = set()
+        self._lock = threading.Lock()
+        self._unflushed = 0
+        
+        # Chunk index: tra cứu dedup không cần chạm filesystem
+        self.index = ChunkIndex(self.index_file)
+        if self.index.created:
+            # Store cũ chưa có index → build một lần từ chunks/ và packs/
+            self.rebuild_index()
+        
+        # Bloom filter trước index: chunk mới chắc chắn không có → bỏ qua tra index
+        self.bloom = self._load_bloom()
+        self._bloom_dirty = False
     
-    def _chunk_path(self, chunk_hash: str) -> str:
-        """Get file path for a chunk"""
+    def _load_config(self) -> Dict:
+        """Load store config (empty dict for legacy stores)"""
+        if not os.path.exists(self.config_file):
+            return {}
+        
+        with open(self.config_file, 'r') as f:
+            return json.load(f)
+    
+    def _bloom_fp_rate(self, config: Dict) -> float:
+        fp_rate = config.get("bloom_fp_rate", DEFAULT_FP_RATE)
+        if not 0 < fp_rate < 1:
+            raise ValueError(f"Invalid Bloom filter false-positive rate: {fp_rate}")
+        return fp_rate
+    
+    def _load_bloom(self) -> BloomFilter:
+        """Load the persisted Bloom filter, rebuilding it if it is stale or missing"""
+        try:
+            bloom = BloomFilter.load(self.bloom_file)
+            # Lệch số chunk với index (crash trước khi lưu, chunk bị xóa...) → build lại
+            if (bloom.count == self.index.count() and not bloom.is_full()
+                    and bloom.fp_rate == self._bloom_fp_rate(self.config)):
+                return bloom
+        except (OSError, ValueError):
+            pass
+        return self.rebuild_bloom()
+    
+    def rebuild_bloom(self) -> BloomFilter:
+        """Rebuild the Bloom filter from the chunk index, sized from the chunk count"""
+        bloom = BloomFilter.for_count(self.index.count(), self._bloom_fp_rate(self.config))
+        bloom.update(self.index.iter_hashes())
+        bloom.save(self.bloom_file)
+        self.bloom = bloom
+        self._bloom_dirty = False
+        return bloom
+    
+    def _open_packs(self, config: Dict) -> Optional[PackStore]:
+        """Open the pack store when the store uses the packed backend"""
+        backend = config.get("storage", "loose")
+        if backend not in self.STORAGE_BACKENDS:
+            raise ValueError(f"Unknown storage backend: {backend}. Must be one of {self.STORAGE_BACKENDS}")
+        if backend != "packed":
+            return None
+        return PackStore(self.packs_dir, config.get("pack_size", DEFAULT_PACK_SIZE))
+    
+    def update_config(self, **changes) -> None:
+        """Update store config atomically and reload dependent components"""
+        config = dict(self.config)
+        config.update(changes)
+        
+        # Validate trước khi ghi
+        chunker = get_chunker(config.get("chunker"))
+        fp_rate = self._bloom_fp_rate(config)
+        codec = codec_id(config.get("compression", DEFAULT_COMPRESSION))
+        manifest_format = config.get("manifest_format", DEFAULT_MANIFEST_FORMAT)
+        if manifest_format not in MANIFEST_FORMATS:
+            raise ValueError(f"Unknown manifest format: {manifest_format}. "
+                             f"Must be one of {tuple(MANIFEST_FORMATS)}")
+        catalog = config.get("catalog", DEFAULT_CATALOG)
+        if catalog not in CATALOG_BACKENDS:
+            raise ValueError(f"Unknown catalog backend: {catalog}. Must be one of {CATALOG_BACKENDS}")
+        durability = config.get("journal_durability", DEFAULT_DURABILITY)
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown journal durability: {durability}. "
+                             f"Must be one of {DURABILITY_LEVELS}")
+        if catalog == "json" and self.catalog_backend == "sqlite" and os.path.exists(self.catalog_file):
+            raise ValueError("Cannot switch the snapshot catalog from sqlite back to json")
+        if self.packs is not None:
+            self.packs.close()
+        packs = self._open_packs(config)
+        
+        temp_file = self.config_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(config, f, indent=2, sort_keys=True)
+        os.rename(temp_file, self.config_file)
+        
+        self.config = config
+        self.chunker = chunker
+        self.codec = codec
+        self.packs = packs
+        if fp_rate != self.bloom.fp_rate:
+            self.rebuild_bloom()
+    
+    @property
+    def manifest_format(self) -> str:
+        """Format used for new snapshot manifests"""
+        return self.config.get("manifest_format", DEFAULT_MANIFEST_FORMAT)
+    
+    @property
+    def catalog_backend(self) -> str:
+        """Where snapshot metadata is kept: metadata.json or catalog.db"""
+        return self.config.get("catalog", DEFAULT_CATALOG)
+    
+    @property
+    def journal_durability(self) -> str:
+        """When journal records are fsynced (see journal.DURABILITY_LEVELS)"""
+        return self.config.get("journal_durability", DEFAULT_DURABILITY)
+    
+    @contextmanager
+    def lock(self, exclusive: bool = False):
+        """
+        Store-wide advisory lock
+        Backups share it; forget/gc take it exclusively so no chunk that an
+        in-flight backup is about to reference can be swept
+        """
+        with open(self.lock_file, 'a') as f:
+            try:
+                fcntl.flock(f, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise StoreLockedError(
+                    f"Store {self.store_path} is in use by another backup, forget or gc"
+                )
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def _chunk_path(self, chunk_hash: str, create: bool = True, framed: bool = False) -> str:
+        """Get file path for a chunk (loose layout); framed = compressed "<hash>.z" file"""
         # Use first 2 chars as directory for better distribution
         prefix = chunk_hash[:2]
         dir_path = os.path.join(self.chunks_dir, prefix)
-        ensure_dir(dir_path)
-        return os.path.join(dir_path, chunk_hash)
+        if create and prefix not in self._chunk_dirs:
+            ensure_dir(dir_path)
+            self._chunk_dirs.add(prefix)
+        return os.path.join(dir_path, chunk_hash + LOOSE_FRAMED_SUFFIX if framed else chunk_hash)
+    
+    def _loose_paths(self, chunk_hash: str) -> List[Tuple[str, bool]]:
+        """Candidate (path, framed) files of a loose chunk, the likelier one first"""
+        order = (True, False) if self.codec != CODEC_NONE else (False, True)
+        return [(self._chunk_path(chunk_hash, create=False, framed=framed), framed)
+                for framed in order]
+    
+    def remove_loose_chunk(self, chunk_hash: str) -> bool:
+        """Delete both loose variants of a chunk; True if any file was removed"""
+        removed = False
+        for path, _ in self._loose_paths(chunk_hash):
+            try:
+                os.remove(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
     
-    def store_chunk(self, chunk_data: bytes) -> str:
+    def store_chunk(self, chunk_data: bytes, chunk_hash: Optional[str] = None) -> str:
         """
         Store chunk and return its hash
         Deduplication: if chunk already exists, just return hash
+        chunk_hash may be passed when the caller has already hashed the data
+        All-zero chunks are not stored: their hash is a zero-chunk marker
         """
-        chunk_hash = compute_hash(chunk_data)
-        chunk_path = self._chunk_path(chunk_hash)
+        if chunk_hash is None:
+            if is_zero_chunk(chunk_data):
+                chunk_hash = zero_chunk_marker(len(chunk_data))
+            else:
+                chunk_hash = compute_hash(chunk_data)
+        if zero_chunk_length(chunk_hash) is not None:
+            return chunk_hash
+        
+        # Deduplication: Bloom filter loại nhanh chunk mới, sau đó mới tra index
+        if chunk_hash in self.bloom and self.index.contains(chunk_hash):
+            return chunk_hash
         
-        # Deduplication: only store if not exists
-        if not os.path.exists(chunk_path):
+        # Nén sau khi dedup: hash luôn tính trên dữ liệu gốc
+        codec, payload = compress_chunk(chunk_data, self.codec)
+        
+        if self.packs is not None:
+            location = pack_location(*self.packs.put(chunk_hash, payload, codec))
+        else:
+            chunk_path = self._chunk_path(chunk_hash, framed=codec != CODEC_NONE)
             # Write to temp file first, then rename atomically
-            temp_path = chunk_path + ".tmp"
+            # Tên temp riêng cho mỗi thread để các writer song song không ghi đè nhau
+            temp_path = f"{chunk_path}.{os.getpid()}.{threading.get_ident()}.tmp"
             with open(temp_path, 'wb') as f:
-                f.write(chunk_data)
+                f.write(encode_loose(codec, payload))
             os.rename(temp_path, chunk_path)
+            location = LOOSE_LOCATION
+        
+        self.index.add(chunk_hash, location, len(payload))
+        self.index.set_length(chunk_hash, len(chunk_data))
+        self.bloom.add(chunk_hash)
+        
+        with self._lock:
+            self._bloom_dirty = True
+            self._unflushed += 1
+            flush_now = self._unflushed >= COMMIT_EVERY
+        if flush_now:
+            self.flush()
         
         return chunk_hash
     
+    def has_chunk(self, chunk_hash: str) -> bool:
+        """Check if chunk is stored (without reading or re-hashing it)"""
+        if zero_chunk_length(chunk_hash) is not None:
+            return True
+        if self.index.contains(chunk_hash):
+            return True
+        # Chunk chưa có trong index (vd. copy tay vào store) → hỏi filesystem
+        if self.packs is not None and self.packs.contains(chunk_hash):
+            return True
+        return any(os.path.exists(path) for path, _ in self._loose_paths(chunk_hash))
+    
     def get_chunk(self, chunk_hash: str) -> bytes:
-        """Retrieve chunk data by hash"""
-        chunk_path = self._chunk_path(chunk_hash)
-        if not os.path.exists(chunk_path):
-            raise IntegrityError(f"Chunk not found: {chunk_hash}")
+        """Retrieve (decompressed) chunk data by hash"""
+        zero_length = zero_chunk_length(chunk_hash)
+        if zero_length is not None:
+            return bytes(zero_length)
+        entry = self.index.get(chunk_hash)
+        if entry is not None:
+            location = parse_pack_location(entry[0])
+            if location is not None:
+                if self.packs is None:
+                    raise IntegrityError(f"Chunk {chunk_hash} is packed but the store is not")
+                return decompress_chunk(*self.packs.read_record(*location))
+        elif self.packs is not None and self.packs.contains(chunk_hash):
+            return decompress_chunk(*self.packs.get(chunk_hash))
         
-        with open(chunk_path, 'rb') as f:
-            return f.read()
+        # Loose layout (hoặc chunk chưa migrate sang pack)
+        for chunk_path, framed in self._loose_paths(chunk_hash):
+            try:
+                with open(chunk_path, 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                continue
+            return decode_loose(content, framed)
+        if entry is not None:
+            # Index trỏ tới file đã mất → bỏ entry để backup sau ghi lại chunk
+            self.index.remove(chunk_hash)
+            self.index.commit()
+        raise IntegrityError(f"Chunk not found: {chunk_hash}")
     
     def chunk_exists(self, chunk_hash: str) -> bool:
             """Check if chunk exists AND content matches hash"""
-            chunk_path = self._chunk_path(chunk_hash)
-            if not os.path.exists(chunk_path):
+            if not self.has_chunk(chunk_hash):
                 return False
+            if zero_chunk_length(chunk_hash) is not None:
+                return True
             
             # THÊM PHẦN NÀY: Kiểm tra nội dung
             try:
-                with open(chunk_path, 'rb') as f:
-                    chunk_data = f.read()
+                chunk_data = self.get_chunk(chunk_hash)
                 computed_hash = compute_hash(chunk_data)
                 return computed_hash == chunk_hash
             except:
                 return False
+    
+    def chunk_signature(self, chunk_hash: str) -> Optional[str]:
+        """
+        Stat-based signature of the file holding a chunk (None if unknown)
+        Any rewrite of the file changes it, so a cached verification result is reused
+        only while the signature still matches
+        """
+        entry = self.index.get(chunk_hash)
+        if entry is None:
+            return None
+        location = parse_pack_location(entry[0])
+        if location is not None:
+            if self.packs is None:
+                return None
+            path = self.packs.pack_path(location[0])
+        else:
+            path = next((p for p, _ in self._loose_paths(chunk_hash) if os.path.exists(p)), None)
+            if path is None:
+                return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f"{entry[0]}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}:{st.st_ctime_ns}"
+    
+    def verify_chunk(self, chunk_hash: str, max_age: Optional[float] = None) -> Tuple[bool, bool]:
+        """
+        Check that a chunk exists and matches its hash
+        With max_age, a previous successful check younger than max_age seconds is
+        reused when the backing file is unchanged; max_age=None always re-hashes
+        Returns (ok, from_cache)
+        """
+        signature = self.chunk_signature(chunk_hash)
+        now = time.time()
+        if max_age is not None and signature is not None:
+            cached = self.index.get_verified(chunk_hash)
+            if cached is not None and cached[1] == signature and now - cached[0] <= max_age:
+                return True, True
+        
+        ok = self.chunk_exists(chunk_hash)
+        if ok and signature is not None:
+            self.index.mark_verified(chunk_hash, signature, now)
+        elif not ok:
+            self.index.clear_verified(chunk_hash)
+        return ok, False
+    
+    def flush(self) -> None:
+        """Make stored chunks durable before snapshot metadata references them"""
+        if self.packs is not None:
+            self.packs.flush()
+        # Index chỉ được commit sau khi dữ liệu chunk đã durable
+        self.index.commit()
+        with self._lock:
+            self._unflushed = 0
+            bloom_dirty = self._bloom_dirty
+            self._bloom_dirty = False
+        
+        if self.bloom.is_full():
+            # Vượt capacity → tăng kích thước theo số chunk hiện tại
+            self.rebuild_bloom()
+        elif bloom_dirty:
+            self.bloom.save(self.bloom_file)
+    
+    def rebuild_index(self) -> int:
+        """
+        Rebuild the chunk index from the loose chunk directory and pack files
+        Refcounts are reset; SnapshotManager.sync_refcounts() recomputes them
+        """
+        entries: Dict[str, Tuple[str, int]] = {}
+        for chunk_hash, path in self.iter_loose_chunks():
+            entries[chunk_hash] = (LOOSE_LOCATION, os.path.getsize(path))
+        
+        if self.packs is not None:
+            self.packs.flush()
+            for pack_id in self.packs.pack_ids():
+                for chunk_hash, _, offset, length in self.packs.scan_pack(pack_id):
+                    # Chunk trong pack được ưu tiên hơn bản loose (migrate bị gián đoạn)
+                    entries[chunk_hash] = (pack_location(pack_id, offset, length), length)
+        
+        count = self.index.replace_all(
+            (chunk_hash, location, size)
+            for chunk_hash, (location, size) in entries.items()
+        )
+        self.rebuild_bloom()
+        return count
+    
+    def iter_loose_chunks(self) -> Iterator[Tuple[str, str]]:
+        """Yield (chunk_hash, path) for every chunk in the loose layout (raw and framed files)"""
+        if not os.path.isdir(self.chunks_dir):
+            return
+        for prefix in sorted(os.listdir(self.chunks_dir)):
+            dir_path = os.path.join(self.chunks_dir, prefix)
+            if not os.path.isdir(dir_path):
+                continue
+            for name in sorted(os.listdir(dir_path)):
+                chunk_hash = name[:-len(LOOSE_FRAMED_SUFFIX)] if name.endswith(LOOSE_FRAMED_SUFFIX) else name
+                if len(chunk_hash) == 64 and chunk_hash.startswith(prefix):
+                    yield chunk_hash, os.path.join(dir_path, name)
+    
+    def migrate_to_packs(self, pack_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Move loose chunks into pack files and switch the store to the packed backend
+        Safe to re-run: loose files are only deleted after packs are fsynced
+        and the config points at the packed backend
+        """
+        stats = {"migrated": 0, "corrupted": 0, "removed": 0}
+        
+        if self.packs is None:
+            packs = PackStore(self.packs_dir, pack_size or self.config.get("pack_size", DEFAULT_PACK_SIZE))
+        else:
+            packs = self.packs
+        
+        # 1. Copy chunk hợp lệ vào pack
+        for chunk_hash, path in self.iter_loose_chunks():
+            location = packs.locate(chunk_hash)
+            if location is None:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                try:
+                    chunk_data = decode_loose(content, path.endswith(LOOSE_FRAMED_SUFFIX))
+                except IntegrityError:
+                    chunk_data = None
+                if chunk_data is None or compute_hash(chunk_data) != chunk_hash:
+                    # Giữ lại chunk hỏng để verify vẫn báo lỗi, không đưa vào pack
+                    print(f"Warning: Skipping corrupted chunk {chunk_hash[:16]}...")
+                    stats["corrupted"] += 1
+                    continue
+                codec, payload = compress_chunk(chunk_data, self.codec)
+                location = packs.put(chunk_hash, payload, codec)
+                stats["migrated"] += 1
+            self.index.add(chunk_hash, pack_location(*location), location[2])
+        packs.flush()
+        
+        # 2. Chuyển store sang packed backend
+        if self.packs is None:
+            packs.close()
+            changes = {"storage": "packed"}
+            if pack_size:
+                changes["pack_size"] = pack_size
+            self.update_config(**changes)
+        
+        # Index trỏ sang pack trước khi file loose bị xóa
+        self.index.commit()
+        
+        # 3. Xóa loose chunks đã nằm trong pack
+        for chunk_hash, path in self.iter_loose_chunks():
+            if self.packs.contains(chunk_hash):
+                os.remove(path)
+                stats["removed"] += 1
+        
+        return stats
 
 class SnapshotManager:
     """Manages snapshot creation với journaling tích hợp"""
@@ -81,51 +481,251 @@ class SnapshotManager:
     def __init__(self, storage: ChunkStorage, journal=None):
         self.storage = storage
         self.journal = journal
-        self.metadata = self._load_metadata()
+        # metadata.json (mặc định) hoặc catalog SQLite (init --catalog sqlite)
+        self.catalog = open_catalog(
+            storage.catalog_backend, storage.metadata_file,
+            storage.snapshot_index_file, storage.catalog_file
+        )
+        # Số chunk được hash lại / lấy từ verification cache ở lần verify gần nhất
+        self.verify_stats = {"hashed": 0, "cached": 0}
+        
+        # Recovery + checkpoint khi khởi động (chỉ đọc journal từ checkpoint cuối)
+        self._maintain_journal()
+        
+        # Index vừa được build lại → tính refcount từ các snapshot hiện có
+        if self.storage.index.created:
+            self.sync_refcounts()
+    
+    def sync_refcounts(self, strict: bool = False) -> int:
+        """
+        Add chunk references of snapshots not yet counted in the index; returns count
+        strict=True raises instead of skipping an unreadable manifest (gc must not
+        treat that snapshot's chunks as garbage)
+        """
+        counted = self.storage.index.counted_snapshots()
+        synced = 0
+        for snapshot_id in self.catalog.live_ids():
+            if snapshot_id in counted:
+                continue
+            try:
+                self.storage.index.add_snapshot_refs(
+                    snapshot_id,
+                    (h for entry in self.iter_snapshot_entries(snapshot_id) for h in entry["chunks"])
+                )
+            except (SnapshotNotFoundError, ValueError) as e:
+                if strict:
+                    raise IntegrityError(f"Cannot read manifest of {snapshot_id}: {e}")
+                print(f"Warning: Cannot read manifest of {snapshot_id}, refcounts skipped")
+                continue
+            synced += 1
+        return synced
+    
+    def forget_snapshots(self, snapshot_ids: List[str]) -> int:
+        """
+        Remove snapshots from the store
+        Each one leaves a tombstone with its chain fields so the hash chain stays
+        verifiable; chunk refcounts are released and `gc` reclaims the chunks
+        """
+        with self.storage.lock(exclusive=True):
+            for snapshot_id in snapshot_ids:
+                self.get_snapshot(snapshot_id)
+            if not snapshot_ids:
+                return 0
+            
+            # 1. Journal: cả danh sách là 1 transaction
+            tx_id = f"forget_{int(time.time())}_{compute_hash(str(time.time_ns()).encode())[:8]}"
+            if self.journal:
+                self.journal.begin_transaction(tx_id)
+                self.journal.write_forget(tx_id, list(snapshot_ids))
+                self.journal.sync()
+            
+            # 2. Chuyển snapshot sang tombstone (1 lần commit catalog cho cả danh sách)
+            self.catalog.forget(snapshot_ids, time.time())
+            self.catalog.commit()
+            if self.journal:
+                self.journal.commit(tx_id)
+            
+            # 3. Giảm refcount + xóa manifest (làm lại được bằng release_forgotten nếu crash)
+            self.release_forgotten()
+            
+            if self.journal and self.journal.needs_checkpoint():
+                self.journal.checkpoint()
+        return len(snapshot_ids)
+    
+    def release_forgotten(self) -> int:
+        """
+        Release refcounts and manifests of snapshots that are counted in the index
+        but no longer live (forget interrupted by a crash, or just finished)
+        """
+        released = 0
+        for snapshot_id in sorted(self.storage.index.counted_snapshots()):
+            if snapshot_id in self.catalog:
+                continue
+            manifest_path = os.path.join(self.storage.snapshots_dir, f"{snapshot_id}.manifest")
+            try:
+                self.storage.index.remove_snapshot_refs(
+                    snapshot_id,
+                    (h for entry in iter_manifest_entries(manifest_path) for h in entry["chunks"])
+                )
+            except (OSError, ValueError):
+                # Không đọc được manifest → refcount chỉ sửa được bằng `gc --full`
+                print(f"Warning: Cannot read manifest of forgotten snapshot {snapshot_id}; "
+                      f"run gc --full to reclaim its chunks")
+                self.storage.index.drop_snapshot_refs(snapshot_id)
+            released += 1
+        
+        # Manifest của snapshot không còn trong metadata (kể cả bản tạm bị bỏ lại)
+        for name in os.listdir(self.storage.snapshots_dir):
+            snapshot_id = name.split(".", 1)[0]
+            if name.endswith((".manifest", ".pathidx")) and self.catalog.is_forgotten(snapshot_id):
+                os.remove(os.path.join(self.storage.snapshots_dir, name))
+        return released
+    
+    def _maintain_journal(self, recover: bool = True) -> None:
+        """
+        Recover incomplete transactions and checkpoint the journal when it has grown
+        Cần khóa độc quyền: backup đang chạy ở process khác có transaction đang mở
+        không được rollback, và checkpoint thay file journal mà process đó đang ghi
+        """
+        if not self.journal:
+            return
+        if not recover and not self.journal.needs_checkpoint():
+            return
+        try:
+            with self.storage.lock(exclusive=True):
+                if recover:
+                    self._recover_from_crash()
+                if self.journal.needs_checkpoint():
+                    self.journal.checkpoint()
+        except StoreLockedError:
+            pass
     
     def _recover_from_crash(self) -> None:
-        """Khôi phục từ crash khi khởi động"""
+        """
+        Khôi phục từ crash khi khởi động
+        Transaction đã có MANIFEST + METADATA trong journal được hoàn tất (redo) nếu manifest
+        còn nguyên và mọi chunk đều có trong store; chỉ transaction dở dang thật sự bị rollback
+        """
         if not self.journal:
             return
         
         incomplete_txs = self.journal.recover()
+        rolled_forward = 0
+        suspended = 0
         
         for tx in incomplete_txs:
             snapshot_id = tx["snapshot_id"]
             print(f"[RECOVERY] Found incomplete transaction: {snapshot_id}")
             
+            if tx.get("forget") is not None:
+                # forget/prune: catalog được ghi atomic → hoặc chưa xóa gì, hoặc đã có tombstone;
+                # chỉ cần hoàn tất phần giải phóng refcount/manifest
+                self.release_forgotten()
+                if all(self.catalog.is_forgotten(s) for s in tx["forget"]):
+                    self.journal.commit(snapshot_id)
+                else:
+                    self.journal.cleanup_incomplete(snapshot_id)
+                continue
+            
+            reason = self._redo_snapshot(tx)
+            if reason is None:
+                print(f"[RECOVERY] Rolled forward snapshot {snapshot_id}")
+                rolled_forward += 1
+                continue
+            
             # CLEANUP TÀI NGUYÊN
             self._cleanup_incomplete_snapshot(snapshot_id)
             
+            if tx.get("progress") and not tx.get("metadata"):
+                # Bị gián đoạn giữa lúc duyệt: giữ progress cho `backup --resume`
+                print(f"[RECOVERY] Backup {snapshot_id} of {tx['progress']['source_path']} "
+                      f"interrupted after {len(tx['progress']['files'])} file(s); "
+                      f"continue it with: backup --resume")
+                self.journal.suspend(snapshot_id)
+                suspended += 1
+                continue
+            print(f"[RECOVERY] Rolling back {snapshot_id}: {reason}")
+            
             # CLEANUP JOURNAL
             self.journal.cleanup_incomplete(snapshot_id)
         
+        # Không còn backup nào đang chạy (đang giữ khóa độc quyền) → manifest tạm là rác
+        for name in os.listdir(self.storage.snapshots_dir):
+            if name.endswith((".manifest.tmp", ".pathidx.tmp")):
+                os.remove(os.path.join(self.storage.snapshots_dir, name))
+        
         if incomplete_txs:
-            print(f"[RECOVERY] Cleaned {len(incomplete_txs)} incomplete transactions")
+            print(f"[RECOVERY] Completed {rolled_forward}, suspended {suspended}, cleaned "
+                  f"{len(incomplete_txs) - rolled_forward - suspended} incomplete transactions")
+    
+    def _redo_snapshot(self, tx: Dict) -> Optional[str]:
+        """
+        Roll a journaled snapshot transaction forward
+        Returns None on success, otherwise why it has to be rolled back
+        """
+        snapshot_id = tx["snapshot_id"]
+        metadata = tx.get("metadata")
+        manifest_record = tx.get("manifest")
+        if not metadata or not manifest_record:
+            return "no MANIFEST/METADATA record"
+        if metadata.get("id") != snapshot_id:
+            return "METADATA record belongs to another snapshot"
+        if manifest_record.get("manifest_hash") not in (None, metadata.get("manifest_hash")):
+            return "MANIFEST and METADATA records disagree"
+        
+        # 1. Manifest: đã được đổi tên hoặc vẫn là file tạm, nội dung phải khớp hash đã journal
+        manifest_path = os.path.join(self.storage.snapshots_dir, f"{snapshot_id}.manifest")
+        source = manifest_path if os.path.exists(manifest_path) else manifest_path + ".tmp"
+        try:
+            if hash_manifest_file(source) != metadata.get("manifest_hash"):
+                return "manifest hash mismatch"
+            entries = iter_manifest_entries(source)
+            missing = next((h for entry in entries for h in entry["chunks"]
+                            if not self.storage.has_chunk(h)), None)
+        except (OSError, ValueError):
+            return "manifest missing or unreadable"
+        if missing is not None:
+            return f"chunk missing: {missing[:16]}..."
+        
+        if snapshot_id not in self.catalog:
+            # 2. Chỉ nối được vào đầu chain hiện tại với đúng sequence kế tiếp
+            head = self.catalog.head()
+            head_chain_hash = self.catalog.get_link(head)["chain_hash"] if head else "0" * 64
+            if metadata.get("prev_chain_hash") != head_chain_hash:
+                return "hash chain has moved on"
+            if metadata.get("sequence") != self.catalog.next_sequence():
+                return "sequence number already taken"
+        
+        # 3. REDO: manifest vào chỗ, metadata vào catalog, COMMIT
+        if source != manifest_path:
+            os.rename(source, manifest_path)
+        if snapshot_id not in self.catalog:
+            self.catalog.add(metadata)
+            self.catalog.commit()
+        self.journal.commit(snapshot_id)
+        
+        try:
+            self.storage.index.add_snapshot_refs(
+                snapshot_id,
+                (h for entry in iter_manifest_entries(manifest_path) for h in entry["chunks"])
+            )
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Warning: Could not update chunk refcounts: {e}")
+        return None
     
     def _cleanup_incomplete_snapshot(self, snapshot_id: str) -> None:
         """Xóa tài nguyên của snapshot chưa hoàn tất"""
         try:
-            # 1. Xóa manifest file
+            # 1. Xóa manifest file (kể cả bản tạm đang ghi dở)
             manifest_path = os.path.join(self.storage.snapshots_dir, f"{snapshot_id}.manifest")
-            if os.path.exists(manifest_path):
-                os.remove(manifest_path)
+            index_path = self._path_index_path(snapshot_id)
+            for path in (manifest_path, manifest_path + ".tmp", index_path, index_path + ".tmp"):
+                if os.path.exists(path):
+                    os.remove(path)
             
             # 2. Xóa metadata entry nếu có
-            if snapshot_id in self.metadata["snapshots"]:
-                del self.metadata["snapshots"][snapshot_id]
-                
-                # Nếu đây là latest snapshot, tìm lại latest
-                if self.metadata.get("latest_snapshot") == snapshot_id:
-                    snapshots = self.metadata["snapshots"]
-                    if snapshots:
-                        latest = max(snapshots.items(), 
-                                   key=lambda x: x[1]["created_at"])
-                        self.metadata["latest_snapshot"] = latest[0]
-                    else:
-                        self.metadata["latest_snapshot"] = None
-                
-                self._save_metadata()
+            if self.catalog.discard(snapshot_id):
+                self.catalog.commit()
             
             # 3. CHÚ Ý: KHÔNG xóa chunks vì chúng có thể được dùng bởi snapshot khác
             # Deduplication sẽ xử lý
@@ -133,14 +733,120 @@ class SnapshotManager:
         except Exception as e:
             print(f"[RECOVERY] Cleanup error for {snapshot_id}: {e}")
     
-    def create_snapshot(self, source_path: str, label: str = "") -> Dict:
+    def _iter_source_files(self, source_path: str, rel_dir: str = "") -> Iterator[Tuple[str, str]]:
+        """
+        Yield (rel_path, file_path) for every file under source_path, sorted by rel_path
+        Thư mục được sort với key "name/" nên thứ tự duyệt trùng với sort toàn bộ đường dẫn,
+        manifest có thể ghi dạng stream mà không cần gom rồi sort
+        """
+        dir_path = os.path.join(source_path, rel_dir) if rel_dir else source_path
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            # Giống os.walk: bỏ qua thư mục không đọc được
+            return
+        
+        keyed = []
+        for entry in entries:
+            is_dir = entry.is_dir()
+            if is_dir and entry.is_symlink():
+                # os.walk không đi theo symlink tới thư mục
+                continue
+            keyed.append((entry.name + os.sep if is_dir else entry.name, entry, is_dir))
+        keyed.sort(key=lambda item: item[0])
+        
+        for _, entry, is_dir in keyed:
+            rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            if is_dir:
+                yield from self._iter_source_files(source_path, rel_path)
+            else:
+                yield rel_path, entry.path
+    
+    def _plan_source_files(self, source_path: str, cache: Optional[FileCache],
+                           signatures: Dict[str, List[int]], stats: Dict[str, int],
+                           resume: Optional[Dict[str, list]] = None
+                           ) -> Iterator[Tuple[str, str, Optional[Tuple[List[str], int]]]]:
+        """
+        Stat every source file and look it up in the file cache, then in the
+        progress of the interrupted backup being resumed
+        Yields (rel_path, file_path, cached) where cached is (chunks, size) or None
+        """
+        for rel_path, file_path in self._iter_source_files(source_path):
+            st = os.stat(file_path)
+            signatures[rel_path] = FileCache.signature(st)
+            
+            cached = cache.lookup(rel_path, st) if cache else None
+            resumed = False
+            if cached is None and resume:
+                entry = resume.get(rel_path)
+                if entry is not None and entry[0] == signatures[rel_path]:
+                    cached, resumed = (entry[1], entry[2]), True
+            # Chunk có thể đã bị xóa khỏi store → đọc lại file
+            if cached and not all(self.storage.has_chunk(h) for h in cached[0]):
+                cached = None
+            if cached:
+                stats["resumed_files" if resumed else "reused_files"] += 1
+            
+            yield rel_path, file_path, cached
+    
+    # Progress checkpoint trong journal: sau mỗi chừng này dữ liệu mới đọc, số file hoặc thời gian
+    PROGRESS_EVERY_BYTES = 256 * 1024 * 1024
+    PROGRESS_EVERY_FILES = 10_000
+    PROGRESS_INTERVAL = 60.0
+    
+    def _resume_entries(self, tx: Dict, chunker_config: Dict) -> Dict[str, list]:
+        """rel_path -> [signature, chunks, size] from the progress of an interrupted backup"""
+        progress = tx["progress"]
+        if progress.get("chunker") != chunker_config:
+            return {}
+        # Giống file cache: file sửa sát lúc quét có thể đã đổi mà mtime không đổi
+        racy_limit = progress.get("scan_started_ns", 0) - RACY_WINDOW_NS
+        return {path: [sig, chunks, size] for path, sig, chunks, size in progress["files"]
+                if sig[3] < racy_limit}
+    
+    def _process_files_serial(self, files: Iterator[Tuple[str, str, Optional[Tuple[List[str], int]]]]
+                              ) -> Iterator[Tuple[str, List[str], int]]:
+        """Chunk, hash and store files one by one (jobs=1)"""
+        for rel_path, file_path, cached in files:
+            if cached is not None:
+                yield rel_path, cached[0], cached[1]
+                continue
+            
+            chunk_hashes = []
+            file_size = 0
+            
+            for chunk in self.storage.chunker.chunk_file(file_path):
+                chunk_hashes.append(self.storage.store_chunk(chunk))
+                file_size += len(chunk)
+            
+            yield rel_path, chunk_hashes, file_size
+    
+    def create_snapshot(self, source_path: str, label: str = "", jobs: int = 1,
+                        use_cache: bool = True, resume: bool = False) -> Dict:
         """
         Tạo snapshot mới với journaling tích hợp
+        jobs > 1 dùng pipeline song song (đọc → hash → ghi), manifest giữ nguyên thứ tự
+        use_cache=False bỏ qua file cache và đọc lại toàn bộ source (full rescan)
+        resume=True dùng lại các file đã checkpoint trong journal bởi backup bị gián đoạn
+        gần nhất của cùng source (file không đổi thì không đọc/hash lại)
         """
+        # Giữ shared lock suốt quá trình backup: gc không được xóa chunk đang được dùng lại
+        with self.storage.lock():
+            metadata = self._create_snapshot(source_path, label, jobs, use_cache, resume)
+        
+        # Transaction đã commit, catalog đã durable → có thể compact journal
+        self._maintain_journal(recover=False)
+        return metadata
+    
+    def _create_snapshot(self, source_path: str, label: str, jobs: int, use_cache: bool,
+                         resume: bool = False) -> Dict:
         # 1. KIỂM TRA INPUT
         source_path = os.path.abspath(source_path)
         if not os.path.exists(source_path):
             raise ValueError(f"Source path does not exist: {source_path}")
+        if jobs < 1:
+            raise ValueError(f"Invalid number of jobs: {jobs}")
         
         # 2. TẠO SNAPSHOT ID
         snapshot_id = f"snap_{int(time.time())}_{compute_hash(str(time.time_ns()).encode())[:8]}"
@@ -149,55 +855,89 @@ class SnapshotManager:
         if self.journal:
             self.journal.begin_transaction(snapshot_id)
         
+        manifest_path = os.path.join(self.storage.snapshots_dir, f"{snapshot_id}.manifest")
+        writer = None
+        index_writer = None
+        
         try:
-            # 4. THU THẬP DỮ LIỆU FILE
-            files_data = {}
-            total_chunks = 0
-            
-            for root, dirs, files in os.walk(source_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(file_path, source_path)
-                    
-                    chunk_hashes = []
-                    file_size = 0
-                    
-                    for chunk in read_file_in_chunks(file_path):
-                        chunk_hash = self.storage.store_chunk(chunk)
-                        chunk_hashes.append(chunk_hash)
-                        total_chunks += 1
-                        file_size += len(chunk)
-                    
-                    files_data[rel_path] = {
-                        "chunks": chunk_hashes,
-                        "size": file_size
-                    }
-            
-            # 5. TẠO MANIFEST
-            manifest = {
-                "version": 1,
+            # 4. THU THẬP DỮ LIỆU FILE → ghi thẳng vào manifest theo thứ tự path (stream)
+            chunker_config = self.storage.chunker.to_config()
+            writer = open_manifest_writer(self.storage.manifest_format, manifest_path, {
                 "snapshot_id": snapshot_id,
                 "source_path": source_path,
                 "created_at": time.time(),
                 "label": label,
-                "files": [
-                    {
-                        "path": path,
-                        "chunks": data["chunks"],
-                        "size": data["size"]
-                    }
-                    for path, data in sorted(files_data.items())
-                ]
-            }
+                "chunker": chunker_config
+            })
+            # Path index sidecar được ghi song song với manifest (cùng thứ tự path)
+            index_writer = PathIndexWriter(self._path_index_path(snapshot_id))
             
-            # 6. TÍNH MERKLE ROOT
-            manifest_json = canonical_json(manifest)
-            merkle_root = MerkleTree.compute_merkle_root(manifest_json)
+            # File cache: file không đổi (dev, inode, size, mtime_ns) dùng lại chunk list cũ
+            cache = FileCache(self.storage.store_path, source_path)
+            if use_cache:
+                cache.load(chunker_config)
+            signatures: Dict[str, List[int]] = {}
+            cache_entries: Dict[str, Tuple[List[int], List[str]]] = {}
+            stats = {"reused_files": 0, "resumed_files": 0}
+            
+            # Backup bị gián đoạn của cùng source: snapshot này thay thế chúng
+            suspended = self.journal.suspended(source_path) if self.journal else []
+            resume_files = None
+            if resume and suspended:
+                resume_files = self._resume_entries(suspended[-1], chunker_config)
+                print(f"Resuming {suspended[-1]['snapshot_id']}: "
+                      f"{len(resume_files)} file(s) already backed up")
+            
+            source_files = self._plan_source_files(source_path, cache, signatures, stats,
+                                                   resume_files)
+            if jobs > 1:
+                results = BackupPipeline(self.storage, jobs).run(source_files)
+            else:
+                results = self._process_files_serial(source_files)
+            
+            # PROGRESS: file đã xong được checkpoint định kỳ để `backup --resume` tiếp tục được
+            progress = {"source_path": source_path, "chunker": chunker_config,
+                        "scan_started_ns": cache.scan_started_ns}
+            batch: List[list] = []
+            batch_bytes = 0
+            last_progress = time.monotonic()
+            
+            for rel_path, chunk_hashes, file_size in results:
+                entry = {
+                    "path": rel_path,
+                    "chunks": chunk_hashes,
+                    "size": file_size
+                }
+                writer.add(entry)
+                index_writer.add(entry)
+                signature = signatures.pop(rel_path)
+                cache_entries[rel_path] = (signature, chunk_hashes)
+                
+                if self.journal:
+                    batch.append([rel_path, signature, chunk_hashes, file_size])
+                    batch_bytes += file_size
+                    if (batch_bytes >= self.PROGRESS_EVERY_BYTES
+                            or len(batch) >= self.PROGRESS_EVERY_FILES
+                            or time.monotonic() - last_progress >= self.PROGRESS_INTERVAL):
+                        # Chunk phải durable trước khi progress tham chiếu tới
+                        self.storage.flush()
+                        self.journal.write_progress(snapshot_id, progress, batch)
+                        batch, batch_bytes = [], 0
+                        last_progress = time.monotonic()
+            
+            # Chunk phải durable trước khi manifest/metadata tham chiếu tới
+            self.storage.flush()
+            
+            # 5. HOÀN TẤT MANIFEST (file tạm, chưa đổi tên)
+            # 6. TÍNH MERKLE ROOT (incremental trong lúc ghi entries)
+            summary = writer.finish()
+            merkle_root = summary["merkle_root"]
             
             # 7. TÍNH HASH CHAIN (chống rollback)
-            prev_snapshot_id = self.metadata.get("latest_snapshot")
+            # Snapshot trước = đầu chain (có thể là tombstone của snapshot đã forget)
+            prev_snapshot_id = self.catalog.head()
             if prev_snapshot_id:
-                prev_metadata = self.metadata["snapshots"][prev_snapshot_id]
+                prev_metadata = self.catalog.get_link(prev_snapshot_id)
                 prev_root = prev_metadata["merkle_root"]
                 prev_chain_hash = prev_metadata.get("chain_hash", "0" * 64)
             else:
@@ -217,107 +957,248 @@ class SnapshotManager:
                 "prev_root": prev_root,
                 "prev_chain_hash": prev_chain_hash,
                 "chain_hash": chain_hash,
-                "manifest_hash": compute_hash(manifest_json.encode()),
-                "total_files": len(files_data),
-                "total_chunks": total_chunks,
-                "sequence": len(self.metadata.get("prev_root_chain", []))
+                "manifest_hash": summary["manifest_hash"],
+                "total_files": summary["total_files"],
+                "total_chunks": summary["total_chunks"],
+                "reused_files": stats["reused_files"],
+                "resumed_files": stats["resumed_files"],
+                "sequence": self.catalog.next_sequence()
             }
             
             # 9. GHI VÀO JOURNAL TRƯỚC (Write-Ahead Log)
             if self.journal:
-                # Ghi manifest và metadata vào journal
-                self.journal.write_manifest(snapshot_id, manifest)
+                # Ghi manifest (header + hash, mọi định dạng) và metadata vào journal
+                self.journal.write_manifest(snapshot_id, writer.journal_record())
                 self.journal.write_metadata(snapshot_id, snapshot_metadata)
                 
-                # FLUSH để đảm bảo trên disk
-                self.journal._flush_current()
+                # Durability point: BEGIN/MANIFEST/METADATA được ghi + fsync 1 lần (group commit)
+                self.journal.sync()
             
             # 10. LƯU DỮ LIỆU THẬT (SAU KHI JOURNAL ĐÃ GHI)
-            # 10.1. Lưu manifest file
-            manifest_path = os.path.join(self.storage.snapshots_dir, f"{snapshot_id}.manifest")
-            with open(manifest_path, 'w') as f:
-                f.write(manifest_json)
+            # 10.1. Lưu manifest file (+ path index)
+            writer.commit()
+            index_writer.finish({"snapshot_id": snapshot_id, "merkle_root": merkle_root,
+                                 "manifest_hash": summary["manifest_hash"]})
+            index_writer.commit()
             
             # 10.2. Lưu metadata
-            self.metadata["snapshots"][snapshot_id] = snapshot_metadata
-            self.metadata["latest_snapshot"] = snapshot_id
-            self.metadata["latest_snapshot_root"] = merkle_root
-            self.metadata["prev_root_chain"].append(merkle_root)
-            
-            self._save_metadata()
+            self.catalog.add(snapshot_metadata)
+            self.catalog.commit()
             
             # 11. COMMIT JOURNAL (sau khi mọi thứ thành công)
             if self.journal:
                 self.journal.commit(snapshot_id)
+                # Backup bị gián đoạn của cùng source không cần resume nữa
+                for tx in suspended:
+                    self.journal.abort(tx["snapshot_id"])
+            
+            # 12. CẬP NHẬT FILE CACHE (lỗi cache không làm hỏng snapshot đã commit)
+            try:
+                cache.save(cache_entries, chunker_config)
+            except OSError as e:
+                print(f"Warning: Could not update file cache: {e}")
+            
+            # 13. CẬP NHẬT REFCOUNT TRONG CHUNK INDEX (sửa lại được bằng rebuild-index)
+            try:
+                self.storage.index.add_snapshot_refs(
+                    snapshot_id,
+                    (h for entry in iter_manifest_entries(manifest_path) for h in entry["chunks"])
+                )
+            except (sqlite3.Error, ValueError) as e:
+                print(f"Warning: Could not update chunk refcounts: {e}")
             
             return snapshot_metadata
             
         except Exception as e:
-            # 12. ROLLBACK NẾU CÓ LỖI
+            # 14. ROLLBACK NẾU CÓ LỖI
             if self.journal:
                 self.journal.abort(snapshot_id)
             
             # Cleanup any partial files
+            if writer is not None:
+                writer.abort()
+            if index_writer is not None:
+                index_writer.abort()
             self._cleanup_incomplete_snapshot(snapshot_id)
             
             raise RuntimeError(f"Snapshot creation failed: {str(e)}") from e
     
-    def _load_metadata(self) -> Dict:
-        """Load metadata from file"""
-        if not os.path.exists(self.storage.metadata_file):
-            return {
-                "snapshots": {},
-                "latest_snapshot": None,
-                "prev_root_chain": []
-            }
+    def find_snapshots_by_root(self, merkle_root: str) -> List[str]:
+        """Chain links (snapshots or tombstones) with this Merkle root, in chain order"""
+        return self.catalog.find_by_root(merkle_root)
+    
+    def get_snapshot_by_sequence(self, sequence: int) -> Optional[str]:
+        return self.catalog.by_sequence(sequence)
+    
+    def _find_prev_snapshot(self, metadata: Dict) -> Optional[Tuple[str, Dict]]:
+        """
+        Predecessor of a snapshot in the hash chain, or None
+        Looked up by sequence first; by Merkle root otherwise, where identical roots
+        are disambiguated by prev_chain_hash
+        """
+        if isinstance(metadata.get("sequence"), int) and metadata["sequence"] > 0:
+            prev_id = self.get_snapshot_by_sequence(metadata["sequence"] - 1)
+            if prev_id is not None:
+                prev = self.catalog.get_link(prev_id)
+                if metadata["prev_root"] == "0" * 64 or prev["merkle_root"] == metadata["prev_root"]:
+                    return prev_id, prev
         
-        with open(self.storage.metadata_file, 'r') as f:
-            return json.load(f)
+        candidates = [(snap_id, self.catalog.get_link(snap_id))
+                      for snap_id in self.find_snapshots_by_root(metadata["prev_root"])]
+        for snap_id, entry in candidates:
+            if entry.get("chain_hash") == metadata["prev_chain_hash"]:
+                return snap_id, entry
+        if candidates:
+            return candidates[-1]
+        return None
     
-    def _save_metadata(self) -> None:
-        """Save metadata to file atomically"""
-        temp_file = self.storage.metadata_file + ".tmp"
-        with open(temp_file, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
-        os.rename(temp_file, self.storage.metadata_file)
+    def walk_chain(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Validate the whole hash chain from genesis in one linear pass
+        Yields (snapshot_id, rollback reason or None) in chain order, tombstones included
+        """
+        yield from self._walk_hash_chain(self.catalog.iter_chain())
     
     def get_snapshot(self, snapshot_id: str) -> Dict:
         """Get snapshot metadata"""
-        if snapshot_id not in self.metadata["snapshots"]:
+        metadata = self.catalog.get(snapshot_id)
+        if metadata is None:
             raise SnapshotNotFoundError(f"Snapshot not found: {snapshot_id}")
         
-        return self.metadata["snapshots"][snapshot_id]
+        return metadata
     
-    def get_snapshot_manifest(self, snapshot_id: str) -> Dict:
-        """Get snapshot manifest"""
+    def _manifest_path(self, snapshot_id: str) -> str:
         manifest_path = os.path.join(self.storage.snapshots_dir, f"{snapshot_id}.manifest")
         if not os.path.exists(manifest_path):
             raise SnapshotNotFoundError(f"Manifest not found for snapshot: {snapshot_id}")
+        return manifest_path
+    
+    def _path_index_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.storage.snapshots_dir, f"{snapshot_id}.pathidx")
+    
+    def open_path_index(self, snapshot_id: str) -> PathIndex:
+        """
+        Sorted path index of a snapshot (lookup / prefix range scan without parsing the manifest)
+        Mọi entry đọc ra được kiểm tra bằng Merkle inclusion proof tới merkle_root của metadata
+        (IntegrityError nếu sidecar bị sửa). Index thiếu, cũ hoặc hỏng được dựng lại từ manifest
+        sau khi kiểm tra manifest hash; index dựng lại phải cho đúng merkle_root
+        """
+        metadata = self.get_snapshot(snapshot_id)
+        index_path = self._path_index_path(snapshot_id)
+        try:
+            index = PathIndex(index_path, metadata["merkle_root"])
+            # Header chỉ dùng để phát hiện index cũ, không phải để tin entry
+            if (index.info.get("merkle_root") == metadata["merkle_root"]
+                    and index.info.get("manifest_hash") == metadata.get("manifest_hash")):
+                return index
+            index.close()
+        except (OSError, ValueError, IntegrityError):
+            pass
         
-        with open(manifest_path, 'r') as f:
-            return json.load(f)
+        manifest_path = self._manifest_path(snapshot_id)
+        if hash_manifest_file(manifest_path) != metadata.get("manifest_hash"):
+            raise IntegrityError(f"Manifest hash mismatch for snapshot {snapshot_id}")
+        build_path_index(index_path, iter_manifest_entries(manifest_path),
+                         {"snapshot_id": snapshot_id, "merkle_root": metadata["merkle_root"],
+                          "manifest_hash": metadata.get("manifest_hash")})
+        return PathIndex(index_path, metadata["merkle_root"])
+    
+    def _read_path_index(self, snapshot_id: str, read: Callable[[PathIndex], Any]) -> Any:
+        """
+        Run read(index) on the snapshot's path index
+        An entry failing its inclusion proof means the sidecar was tampered with: the
+        index is dropped, rebuilt from the manifest and read once more
+        """
+        try:
+            with self.open_path_index(snapshot_id) as index:
+                return read(index)
+        except IntegrityError as e:
+            index_path = self._path_index_path(snapshot_id)
+            if not os.path.exists(index_path):
+                raise
+            print(f"Warning: Path index of {snapshot_id} rejected ({e}); rebuilding from manifest")
+            os.remove(index_path)
+        with self.open_path_index(snapshot_id) as index:
+            return read(index)
+    
+    def open_file(self, snapshot_id: str, path: str) -> SnapshotReader:
+        """
+        Seekable reader for one file of a snapshot, found through the path index
+        Hash chain và inclusion proof của entry được kiểm tra như selective restore;
+        hash của chunk được kiểm tra khi đọc, size được so với tổng độ dài chunk
+        """
+        self.get_snapshot(snapshot_id)
+        is_rollback, reason = self._check_rollback_hash_chain(snapshot_id)
+        if is_rollback:
+            raise IntegrityError(f"Cannot read from invalid snapshot: Rollback detected: {reason}")
+        
+        entry = self._read_path_index(snapshot_id, lambda index: index.lookup(normalize_path(path)))
+        if entry is None:
+            raise PathNotFoundError(f"File not found in snapshot {snapshot_id}: {path}")
+        return SnapshotReader(self.storage, entry)
+    
+    def _check_path_index(self, snapshot_id: str, manifest_path: str) -> None:
+        """Drop a path index whose entries differ from the manifest (rebuilt on next use)"""
+        index_path = self._path_index_path(snapshot_id)
+        if not os.path.exists(index_path):
+            return
+        try:
+            with PathIndex(index_path) as index:
+                matches = all(a == b for a, b in itertools.zip_longest(
+                    index.iter_prefix(), iter_manifest_entries(manifest_path)))
+        except ValueError:
+            matches = False
+        if not matches:
+            print(f"Warning: Path index of {snapshot_id} does not match its manifest; removed")
+            os.remove(index_path)
     
-    def list_snapshots(self) -> List[Dict]:
-        """List all snapshots"""
+    def get_snapshot_manifest(self, snapshot_id: str) -> Dict:
+        """Get snapshot manifest (whole file list in memory; prefer iter_snapshot_entries)"""
+        return load_manifest(self._manifest_path(snapshot_id))
+    
+    def get_manifest_header(self, snapshot_id: str) -> Dict:
+        """Manifest fields without the file list"""
+        return read_manifest_header(self._manifest_path(snapshot_id))
+    
+    def iter_snapshot_entries(self, snapshot_id: str) -> Iterator[Dict]:
+        """Stream the file entries of a snapshot manifest"""
+        return iter_manifest_entries(self._manifest_path(snapshot_id))
+    
+    def list_snapshots(self, offset: int = 0, limit: Optional[int] = None,
+                       label: Optional[str] = None, since: Optional[float] = None,
+                       until: Optional[float] = None) -> List[Dict]:
+        """
+        List snapshots, newest first
+        label/since/until filter, offset/limit page the result (indexed queries with the sqlite catalog)
+        """
         snapshots = []
-        for snap_id, metadata in self.metadata["snapshots"].items():
+        for metadata in self.catalog.list_snapshots(offset, limit, label, since, until):
             snapshots.append({
-                "id": snap_id,
+                "id": metadata["id"],
                 "created_at": metadata["created_at"],
                 "label": metadata.get("label", ""),
                 "merkle_root": metadata["merkle_root"],
                 "total_files": metadata["total_files"],
                 "total_chunks": metadata["total_chunks"]
             })
-        
-        # Sort by creation time (newest first)
-        return sorted(snapshots, key=lambda x: x["created_at"], reverse=True)
+        return snapshots
+    
+    def count_snapshots(self, label: Optional[str] = None, since: Optional[float] = None,
+                        until: Optional[float] = None) -> int:
+        return self.catalog.count(label, since, until)
     
-    def verify_snapshot(self, snapshot_id: str) -> Tuple[bool, str]:
+    def verify_snapshot(self, snapshot_id: str, jobs: int = 1,
+                        max_age: Optional[float] = None,
+                        check_chunks: bool = True) -> Tuple[bool, str]:
         """
         Verify snapshot integrity với hash chain
+        jobs > 1 kiểm tra chunks song song
+        max_age: dùng lại kết quả verify chunk gần đây (None = luôn hash lại toàn bộ)
+        check_chunks=False chỉ kiểm tra manifest, Merkle root, hash chain (restore tự kiểm tra
+        hash của chunk trong lúc đọc)
         Returns: (is_valid, message)
         """
+        self.verify_stats = {"hashed": 0, "cached": 0}
         try:
             # 1. Đọc metadata và manifest
             metadata = self.get_snapshot(snapshot_id)
@@ -327,27 +1208,28 @@ class SnapshotManager:
             if not os.path.exists(manifest_path):
                 return False, "Manifest file not found"
             
-            with open(manifest_path, 'r') as f:
-                manifest_json_from_disk = f.read()
-            
-            # Parse manifest
+            # 3. Tính Merkle root từ manifest (đọc entries dạng stream)
             try:
-                manifest = json.loads(manifest_json_from_disk)
+                computed_root = MerkleTree.compute_root_from_entries(
+                    iter_manifest_entries(manifest_path)
+                )
             except json.JSONDecodeError:
                 return False, "Manifest file corrupted (invalid JSON)"
-            
-            # 3. Tính Merkle root từ manifest
-            computed_root = MerkleTree.compute_merkle_root(manifest_json_from_disk)
+            except ValueError as e:
+                return False, f"Manifest file corrupted ({e})"
             
             # 4. So sánh với stored Merkle root
             if computed_root != metadata["merkle_root"]:
                 return False, f"Merkle root mismatch. Computed: {computed_root[:16]}..., Stored: {metadata['merkle_root'][:16]}..."
             
             # 5. Kiểm tra tất cả chunks
-            for file_entry in manifest["files"]:
-                for chunk_hash in file_entry["chunks"]:
-                    if not self.storage.chunk_exists(chunk_hash):
-                        return False, f"Chunk missing or corrupted: {chunk_hash[:16]}..."
+            if check_chunks:
+                bad_chunk = self._find_bad_chunk(
+                    (h for entry in iter_manifest_entries(manifest_path) for h in entry["chunks"]),
+                    jobs, max_age
+                )
+                if bad_chunk is not None:
+                    return False, f"Chunk missing or corrupted: {bad_chunk[:16]}..."
             
             # 6. ========== KIỂM TRA ROLLBACK VỚI HASH CHAIN ==========
             is_rollback, rollback_reason = self._check_rollback_hash_chain(snapshot_id)
@@ -355,15 +1237,208 @@ class SnapshotManager:
                 return False, f"Rollback detected: {rollback_reason}"
             
             # 7. Thêm: Kiểm tra manifest hash
-            computed_manifest_hash = compute_hash(manifest_json_from_disk.encode())
+            computed_manifest_hash = hash_manifest_file(manifest_path)
             if computed_manifest_hash != metadata.get("manifest_hash"):
                 return False, f"Manifest hash mismatch"
             
+            # 8. Path index (dữ liệu dẫn xuất) phải khớp manifest đã được kiểm tra
+            if check_chunks:
+                self._check_path_index(snapshot_id, manifest_path)
+            
             return True, f"Snapshot valid (Merkle root: {computed_root[:16]}..., Chain hash: {metadata['chain_hash'][:16]}...)"
             
         except Exception as e:
             return False, f"Verification failed: {str(e)}"
               
+    # Số chunk đã kiểm tra được nhớ để bỏ qua chunk lặp lại (giới hạn bộ nhớ)
+    VERIFY_DEDUP_LIMIT = 1_000_000
+    
+    def _check_chunks(self, chunk_hashes: Iterable[str], jobs: int = 1,
+                      max_age: Optional[float] = None) -> Iterator[Tuple[str, bool]]:
+        """
+        Yield (chunk_hash, ok) in input order, updating verify_stats
+        jobs > 1 checks batches in a thread pool
+        """
+        chunk_hashes = iter(chunk_hashes)
+        stats = self.verify_stats
+        
+        def check(chunk_hash: str) -> Tuple[bool, bool]:
+            return self.storage.verify_chunk(chunk_hash, max_age)
+        
+        def results():
+            if jobs <= 1:
+                for chunk_hash in chunk_hashes:
+                    yield chunk_hash, check(chunk_hash)
+                return
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                while True:
+                    batch = list(itertools.islice(chunk_hashes, jobs * 256))
+                    if not batch:
+                        return
+                    yield from zip(batch, pool.map(check, batch))
+        
+        try:
+            for chunk_hash, (ok, from_cache) in results():
+                stats["cached" if from_cache else "hashed"] += 1
+                yield chunk_hash, ok
+        finally:
+            # Lưu kết quả verify vào cache (cả khi dừng sớm vì gặp chunk hỏng)
+            self.storage.index.commit()
+    
+    def _find_bad_chunk(self, chunk_hashes: Iterator[str], jobs: int = 1,
+                        max_age: Optional[float] = None) -> Optional[str]:
+        """
+        First chunk (in manifest order) that is missing or corrupted, or None
+        Each chunk is checked once
+        """
+        seen = set()
+        
+        def unique():
+            for chunk_hash in chunk_hashes:
+                if chunk_hash in seen:
+                    continue
+                if len(seen) >= self.VERIFY_DEDUP_LIMIT:
+                    seen.clear()
+                seen.add(chunk_hash)
+                yield chunk_hash
+        
+        checks = self._check_chunks(unique(), jobs, max_age)
+        try:
+            for chunk_hash, ok in checks:
+                if not ok:
+                    return chunk_hash
+            return None
+        finally:
+            checks.close()
+    
+    def verify_all_snapshots(self, jobs: int = 1,
+                             max_age: Optional[float] = None) -> List[Tuple[str, bool, str]]:
+        """
+        Verify every snapshot in one pass
+        Each manifest is read once, the union of their chunks is checked once
+        (in parallel) and the hash chain is walked linearly in sequence order
+        Returns [(snapshot_id, is_valid, message)] in chain order
+        """
+        self.verify_stats = {"hashed": 0, "cached": 0}
+        live = dict(self.catalog.iter_live())
+        order = list(live)
+        failures: Dict[str, str] = {}
+        manifest_mismatch = set()
+        unique_chunks = set()
+        
+        # 1. Đọc mỗi manifest 1 lần: Merkle root + gom chunk
+        for snapshot_id in order:
+            metadata = live[snapshot_id]
+            manifest_path = os.path.join(self.storage.snapshots_dir, f"{snapshot_id}.manifest")
+            if not os.path.exists(manifest_path):
+                failures[snapshot_id] = "Manifest file not found"
+                continue
+            builder = MerkleBuilder()
+            try:
+                for entry in iter_manifest_entries(manifest_path):
+                    builder.add_entry(entry)
+                    unique_chunks.update(entry["chunks"])
+                computed_root = builder.root()
+                if hash_manifest_file(manifest_path) != metadata.get("manifest_hash"):
+                    manifest_mismatch.add(snapshot_id)
+            except json.JSONDecodeError:
+                failures[snapshot_id] = "Manifest file corrupted (invalid JSON)"
+                continue
+            except ValueError as e:
+                failures[snapshot_id] = f"Manifest file corrupted ({e})"
+                continue
+            except Exception as e:
+                failures[snapshot_id] = f"Verification failed: {e}"
+                continue
+            if computed_root != metadata["merkle_root"]:
+                failures[snapshot_id] = (f"Merkle root mismatch. Computed: {computed_root[:16]}..., "
+                                         f"Stored: {metadata['merkle_root'][:16]}...")
+        
+        # 2. Hash mỗi chunk duy nhất đúng 1 lần
+        bad_chunks = {chunk_hash for chunk_hash, ok in self._check_chunks(unique_chunks, jobs, max_age)
+                      if not ok}
+        if bad_chunks:
+            # Gán chunk hỏng cho các snapshot tham chiếu tới nó (đọc lại manifest chỉ khi có lỗi)
+            for snapshot_id in order:
+                if snapshot_id in failures:
+                    continue
+                for entry in iter_manifest_entries(self._manifest_path(snapshot_id)):
+                    bad = next((h for h in entry["chunks"] if h in bad_chunks), None)
+                    if bad is not None:
+                        failures[snapshot_id] = f"Chunk missing or corrupted: {bad[:16]}..."
+                        break
+        
+        # 3. Hash chain: 1 lượt tuyến tính theo sequence
+        broken_tombstone = None
+        for snapshot_id, reason in self.walk_chain():
+            if snapshot_id not in live:
+                # Link hỏng ở snapshot đã forget → báo cho snapshot còn sống kế tiếp
+                if reason is not None and broken_tombstone is None:
+                    broken_tombstone = f"forgotten snapshot {snapshot_id}: {reason}"
+                continue
+            if reason is None and broken_tombstone is not None:
+                reason = broken_tombstone
+            broken_tombstone = None
+            if reason is not None:
+                failures.setdefault(snapshot_id, f"Rollback detected: {reason}")
+        
+        # 4. Manifest hash
+        for snapshot_id in manifest_mismatch:
+            failures.setdefault(snapshot_id, "Manifest hash mismatch")
+        
+        results = []
+        for snapshot_id in order:
+            if snapshot_id in failures:
+                results.append((snapshot_id, False, failures[snapshot_id]))
+            else:
+                metadata = live[snapshot_id]
+                results.append((snapshot_id, True,
+                                f"Snapshot valid (Merkle root: {metadata['merkle_root'][:16]}..., "
+                                f"Chain hash: {metadata['chain_hash'][:16]}...)"))
+        return results
+    
+    def _walk_hash_chain(self, links: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Validate each link of the hash chain against its predecessor in order
+        Yields (snapshot_id, rollback reason or None)
+        """
+        genesis = "0" * 64
+        prev = None
+        for snapshot_id, metadata in links:
+            try:
+                reason = self._check_chain_link(metadata, prev, genesis)
+            except (KeyError, TypeError) as e:
+                reason = f"Rollback check error: {e}"
+            
+            yield snapshot_id, reason
+            prev = (snapshot_id, metadata)
+    
+    @staticmethod
+    def _check_chain_link(metadata: Dict, prev: Optional[Tuple[str, Dict]],
+                          genesis: str) -> Optional[str]:
+        """Rollback reason for one link of the chain, or None"""
+        expected_chain_hash = compute_hash(
+            f"{metadata['prev_chain_hash']}{metadata['merkle_root']}{metadata['prev_root']}".encode()
+        )
+        
+        if metadata["prev_root"] == genesis:
+            if prev is not None:
+                return f"Unexpected genesis snapshot after {prev[0]}"
+            if metadata["chain_hash"] != expected_chain_hash:
+                return "Genesis snapshot chain hash mismatch"
+            return None
+        if prev is None or prev[1]["merkle_root"] != metadata["prev_root"]:
+            return f"Previous snapshot not found for root: {metadata['prev_root'][:16]}..."
+        if metadata["prev_chain_hash"] != prev[1]["chain_hash"]:
+            return "Chain hash mismatch with previous snapshot"
+        if metadata["chain_hash"] != expected_chain_hash:
+            return "Chain hash verification failed"
+        if ("sequence" in metadata and "sequence" in prev[1]
+                and metadata["sequence"] != prev[1]["sequence"] + 1):
+            return (f"Sequence number mismatch: expected {prev[1]['sequence'] + 1}, "
+                    f"got {metadata['sequence']}")
+        return None
+    
     def _check_rollback(self, snapshot_id: str) -> bool:
         """Backward compatibility - use hash chain version"""
         is_rollback, _ = self._check_rollback_hash_chain(snapshot_id)
@@ -377,64 +1452,81 @@ class SnapshotManager:
         try:
             metadata = self.get_snapshot(snapshot_id)
             
-            # 1. Kiểm tra genesis snapshot
-            if metadata["prev_root"] == "0" * 64:
-                # Đây là snapshot đầu tiên, chỉ cần kiểm tra chain_hash tính đúng
-                expected_chain_hash = compute_hash(
-                    f"{metadata['prev_chain_hash']}{metadata['merkle_root']}{metadata['prev_root']}".encode()
-                )
-                if metadata["chain_hash"] != expected_chain_hash:
-                    return True, "Genesis snapshot chain hash mismatch"
-                return False, "OK"
-            
-            # 2. Tìm snapshot trước đó (dựa vào prev_root)
-            prev_snapshot = None
-            for snap_id, snap_meta in self.metadata["snapshots"].items():
-                if snap_meta["merkle_root"] == metadata["prev_root"]:
-                    prev_snapshot = snap_meta
-                    break
-            
-            if not prev_snapshot:
-                return True, f"Previous snapshot not found for root: {metadata['prev_root'][:16]}..."
-            
-            # 3. Kiểm tra chain hash của snapshot trước có khớp với prev_chain_hash không
-            if metadata["prev_chain_hash"] != prev_snapshot["chain_hash"]:
-                return True, f"Chain hash mismatch with previous snapshot"
-            
-            # 4. Tính toán chain hash hiện tại
-            expected_chain_hash = compute_hash(
-                f"{metadata['prev_chain_hash']}{metadata['merkle_root']}{metadata['prev_root']}".encode()
-            )
-            
-            if metadata["chain_hash"] != expected_chain_hash:
-                return True, f"Chain hash verification failed"
-            
-            # 5. Kiểm tra sequence number (tùy chọn nhưng hữu ích)
-            if "sequence" in metadata and "sequence" in prev_snapshot:
-                if metadata["sequence"] != prev_snapshot["sequence"] + 1:
-                    return True, f"Sequence number mismatch: expected {prev_snapshot['sequence'] + 1}, got {metadata['sequence']}"
-            
+            # Predecessor tra qua index (sequence, rồi merkle_root) thay vì quét mọi snapshot
+            prev = self._find_prev_snapshot(metadata)
+            reason = self._check_chain_link(metadata, prev, "0" * 64)
+            if reason is not None:
+                return True, reason
             return False, "Hash chain valid"
             
         except Exception as e:
             return True, f"Rollback check error: {str(e)}"
 
-    def restore_snapshot(self, snapshot_id: str, target_path: str) -> None:
+    def restore_snapshot(self, snapshot_id: str, target_path: str, jobs: int = 1,
+                         verify_first: bool = False, includes: Iterable[str] = (),
+                         excludes: Iterable[str] = ()) -> None:
         """
         Restore snapshot to target directory
+        jobs > 1 khôi phục nhiều file song song, chunks được prefetch và kiểm tra hash trong pool
+        Manifest, Merkle root và hash chain được kiểm tra trước; hash của chunk chỉ được kiểm tra
+        trong lần đọc duy nhất lúc ghi file (verify_first=True: verify toàn bộ chunk trước như cũ).
+        File được ghi vào thư mục staging và chỉ được chuyển vào target khi restore thành công
+        includes/excludes: chỉ restore các path/glob này, tìm qua path index
+        (O(log n + dữ liệu được restore) thay vì đọc cả manifest)
         """
+        if jobs < 1:
+            raise ValueError(f"Invalid number of jobs: {jobs}")
+        
+        path_filter = PathFilter(includes, excludes)
+        selective = bool(path_filter.includes or path_filter.excludes)
+        
         # Verify snapshot first
-        is_valid, message = self.verify_snapshot(snapshot_id)
-        if not is_valid:
-            raise IntegrityError(f"Cannot restore invalid snapshot: {message}")
+        if selective and not verify_first:
+            # Manifest được đại diện bởi path index: entry được chọn có inclusion proof tới merkle_root
+            self.get_snapshot(snapshot_id)
+            is_rollback, reason = self._check_rollback_hash_chain(snapshot_id)
+            if is_rollback:
+                raise IntegrityError(f"Cannot restore invalid snapshot: Rollback detected: {reason}")
+        else:
+            is_valid, message = self.verify_snapshot(snapshot_id, jobs=jobs, check_chunks=verify_first)
+            if not is_valid:
+                raise IntegrityError(f"Cannot restore invalid snapshot: {message}")
         
-        manifest = self.get_snapshot_manifest(snapshot_id)
+        # Staging cạnh target (cùng filesystem → rename được)
+        target_path = os.path.abspath(target_path)
+        parent, name = os.path.split(target_path)
+        ensure_dir(parent)
+        staging_path = os.path.join(parent, f".{name}.restore-{os.getpid()}")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        ensure_dir(staging_path)
+        
+        try:
+            if selective:
+                # Chọn (và chứng minh) mọi entry trước khi ghi: index bị sửa không để lại file nào
+                entries = self._read_path_index(snapshot_id, lambda index: list(path_filter.select(index)))
+            else:
+                entries = self.iter_snapshot_entries(snapshot_id)
+            restored = self._restore_entries(entries, staging_path, jobs)
+            if selective and restored == 0:
+                raise ValueError("No files in the snapshot match the given paths")
+            self._publish_restore(staging_path, target_path)
+        except BaseException:
+            # Chunk hỏng/thiếu giữa chừng: target không bị đụng tới
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
         
-        # Clean target directory
-        ensure_dir(target_path)
+        print(f"Restored snapshot {snapshot_id} to {target_path}")
+        print(f"Total files restored: {restored}")
+    
+    def _restore_entries(self, entries: Iterable[Dict], target_path: str, jobs: int) -> int:
+        """Write manifest file entries under target_path, checking every chunk hash; returns file count"""
+        if jobs > 1:
+            return RestorePipeline(self.storage, jobs).run(entries, target_path)
         
         # Restore files
-        for file_entry in manifest["files"]:
+        restored = 0
+        for file_entry in entries:
+            restored += 1
             file_path = os.path.join(target_path, file_entry["path"])
             file_dir = os.path.dirname(file_path)
             ensure_dir(file_dir)
@@ -442,14 +1534,39 @@ class SnapshotManager:
             # Reconstruct file from chunks
             with open(file_path, 'wb') as f:
                 for chunk_hash in file_entry["chunks"]:
+                    zero_length = zero_chunk_length(chunk_hash)
+                    if zero_length is not None:
+                        # Chunk toàn 0 → seek qua, tạo lại hole thay vì ghi byte 0
+                        f.seek(zero_length, os.SEEK_CUR)
+                        continue
                     chunk_data = self.storage.get_chunk(chunk_hash)
-
+                    
                     # KIỂM TRA THÊM: Verify chunk hash
                     computed_hash = compute_hash(chunk_data)
                     if computed_hash != chunk_hash:
                         raise IntegrityError(f"Chunk corrupted: {chunk_hash[:16]}...")
-
+                    
                     f.write(chunk_data)
+                # Hole ở cuối file: seek không đổi kích thước
+                f.truncate()
+        return restored
+    
+    @staticmethod
+    def _publish_restore(staging_path: str, target_path: str) -> None:
+        """
+        Move a fully restored staging tree into place
+        A missing or empty target is swapped in with a single rename; into a non-empty
+        target every file is replaced atomically (os.replace), other files are kept
+        """
+        if os.path.isdir(target_path) and not os.listdir(target_path):
+            os.rmdir(target_path)
+        if not os.path.lexists(target_path):
+            os.rename(staging_path, target_path)
+            return
         
-        print(f"Restored snapshot {snapshot_id} to {target_path}")
-        print(f"Total files restored: {len(manifest['files'])}")
\ No newline at end of file
+        for root, _, files in os.walk(staging_path):
+            dest_root = os.path.normpath(os.path.join(target_path, os.path.relpath(root, staging_path)))
+            ensure_dir(dest_root)
+            for file_name in files:
+                os.replace(os.path.join(root, file_name), os.path.join(dest_root, file_name))
+        shutil.rmtree(staging_path)
@@ -2,14 +2,20 @@
 Utility functions for the backup system
 """
 import os
+import math
+import time
 import hashlib
 import json
-from typing import Dict, List
+from typing import BinaryIO, Dict, List, Optional
 
 # Constants
 CHUNK_SIZE = 1024 * 1024  # 1 MiB
 HASH_ALGORITHM = 'sha256'
 
+# Chunk toàn byte 0 (vd. hole của VM image) không được hash/lưu: manifest ghi marker 32 byte
+# = 24 byte 0 + độ dài u64 của đoạn thay cho hash (SHA-256 thật không bao giờ có 192 bit 0 đầu)
+ZERO_CHUNK_PREFIX = "00" * 24
+
 def get_os_user() -> str:
     """
     Get OS user with sudo preference
@@ -33,10 +39,86 @@ def compute_hash(data: bytes) -> str:
     """Compute SHA-256 hash of data"""
     return hashlib.sha256(data).hexdigest()
 
+def zero_chunk_marker(length: int) -> str:
+    """Manifest entry of a chunk of `length` zero bytes"""
+    return f"{ZERO_CHUNK_PREFIX}{length:016x}"
+
+def zero_chunk_length(chunk_hash: str) -> Optional[int]:
+    """Length of the zero run a chunk hash stands for, or None for a real chunk"""
+    if chunk_hash.startswith(ZERO_CHUNK_PREFIX):
+        return int(chunk_hash[len(ZERO_CHUNK_PREFIX):], 16)
+    return None
+
+def is_zero_chunk(data: bytes) -> bool:
+    """True if data is all zero bytes (so it is recorded as a zero-chunk marker)"""
+    # So với bytes(n) (calloc) → memcmp, dừng ở byte khác 0 đầu tiên
+    return bool(data) and data[0] == 0 and data == bytes(len(data))
+
+class SparseFile:
+    """
+    Read-only file whose holes (SEEK_DATA/SEEK_HOLE) are returned as zeros without
+    reading the disk; read(n) always returns n bytes until EOF, like a regular file
+    """
+    
+    def __init__(self, file_path: str):
+        self._file = open(file_path, 'rb')
+        self._fd = self._file.fileno()
+        self._size = os.fstat(self._fd).st_size
+        self._pos = 0
+        # Extent dữ liệu chứa/tiếp sau vị trí hiện tại: [data_start, data_end)
+        self._data_start = self._data_end = 0
+    
+    def __enter__(self) -> "SparseFile":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        self._file.close()
+    
+    def _next_extent(self) -> None:
+        try:
+            self._data_start = os.lseek(self._fd, self._pos, os.SEEK_DATA)
+        except OSError:
+            # ENXIO: phần còn lại của file là hole
+            self._data_start = self._data_end = self._size
+            return
+        self._data_end = os.lseek(self._fd, self._data_start, os.SEEK_HOLE)
+    
+    def read(self, size: int = -1) -> bytes:
+        end = self._size if size < 0 else min(self._size, self._pos + size)
+        pieces = []
+        while self._pos < end:
+            if self._pos >= self._data_end:
+                self._next_extent()
+            if self._pos < self._data_start:
+                # Trong hole: byte 0, không đọc đĩa
+                count = min(end, self._data_start) - self._pos
+                pieces.append(bytes(count))
+            else:
+                count = min(end, self._data_end) - self._pos
+                data = os.pread(self._fd, count, self._pos)
+                if not data:
+                    # File bị cắt ngắn trong lúc đọc
+                    break
+                count = len(data)
+                pieces.append(data)
+            self._pos += count
+        return pieces[0] if len(pieces) == 1 else b"".join(pieces)
+
+def open_source_file(file_path: str) -> BinaryIO:
+    """Open a file for backup; sparse files skip their holes (where SEEK_HOLE is supported)"""
+    if hasattr(os, "SEEK_HOLE"):
+        st = os.stat(file_path)
+        if st.st_blocks * 512 < st.st_size:
+            return SparseFile(file_path)
+    return open(file_path, 'rb')
+
 def read_file_in_chunks(file_path: str, chunk_size: int = CHUNK_SIZE):
     """Generator to read file in chunks - ĐẢM BẢO trả về bytes"""
     try:
-        with open(file_path, 'rb') as f:  # ← 'rb' để đọc binary
+        with open_source_file(file_path) as f:  # file sparse: hole không bị đọc từ đĩa
             while True:
                 chunk = f.read(chunk_size)
                 if not chunk:
@@ -87,4 +169,46 @@ def compute_args_hash(args: List[str]) -> str:
     else:
         args_str = " ".join(str(arg) for arg in args)
     
-    return hashlib.sha256(args_str.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(args_str.encode()).hexdigest()
+
+# Đơn vị cho --max-age/--since/--until
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+def parse_duration(value: str) -> float:
+    """
+    Parse a duration like "90", "30m", "12h", "7d" or "2w" into seconds
+    Raises ValueError for invalid input
+    """
+    text = str(value).strip().lower()
+    multiplier = 1
+    if text and text[-1] in _DURATION_UNITS:
+        multiplier = _DURATION_UNITS[text[-1]]
+        text = text[:-1]
+    try:
+        seconds = float(text) * multiplier
+    except ValueError:
+        raise ValueError(f"Invalid duration: {value}")
+    # float() cũng nhận "nan"/"inf"
+    if not math.isfinite(seconds) or seconds < 0:
+        raise ValueError(f"Invalid duration: {value}")
+    return seconds
+
+_TIME_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S",
+                 "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S")
+
+def parse_time(value: str) -> float:
+    """
+    Parse a local date/time ("2024-05-01", "2024-05-01 13:30") or a duration
+    before now ("12h", "7d") into a Unix timestamp
+    Raises ValueError for invalid input
+    """
+    text = str(value).strip()
+    for fmt in _TIME_FORMATS:
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            continue
+    try:
+        return time.time() - parse_duration(text)
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
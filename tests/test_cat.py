@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+TEST: Stream a file / byte range out of a snapshot
+SnapshotReader map offset → chunk bằng độ dài chunk tích lũy, chỉ đọc chunk cần thiết
+(vẫn kiểm tra hash); `cat` ghi thẳng ra stdout không cần restore
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.storage import ChunkStorage, SnapshotManager
+from src.journal import Journal
+from src.exceptions import IntegrityError, PathNotFoundError
+
+CHUNK = 1024 * 1024
+
+
+def open_store(store):
+    storage = ChunkStorage(store)
+    journal = Journal(os.path.join(store, "journal.wal"), "off")
+    return storage, SnapshotManager(storage, journal)
+
+
+def make_dataset(path):
+    os.makedirs(os.path.join(path, "db"), exist_ok=True)
+    data = os.urandom(3 * CHUNK + 12345)
+    with open(os.path.join(path, "db", "dump.sql"), "wb") as f:
+        f.write(data)
+    with open(os.path.join(path, "small.txt"), "w") as f:
+        f.write("hello snapshot\n")
+    return data
+
+
+def count_chunk_reads(steps):
+    real = ChunkStorage.get_chunk
+    reads = []
+
+    def get_chunk(storage, chunk_hash):
+        reads.append(chunk_hash)
+        return real(storage, chunk_hash)
+
+    with mock.patch.object(ChunkStorage, "get_chunk", get_chunk):
+        result = steps()
+    return result, len(reads)
+
+
+def test_snapshot_reader():
+    print("🧪 Cat: seekable reader only reads the chunks of the requested range")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        data = make_dataset(dataset)
+        storage, manager = open_store(store)
+        snapshot_id = manager.create_snapshot(dataset)["id"]
+
+        reader = manager.open_file(snapshot_id, "./db/dump.sql")
+        assert reader.size == len(data) and reader.seekable()
+        # Byte range nằm gọn trong 1 chunk → đúng 1 chunk được đọc
+        piece, reads = count_chunk_reads(lambda: b"".join(reader.iter_range(CHUNK + 10, 1000)))
+        assert piece == data[CHUNK + 10:CHUNK + 1010] and reads == 1
+        # Range vắt qua ranh giới chunk (chunk 1 vừa đọc vẫn được giữ lại)
+        piece, reads = count_chunk_reads(lambda: b"".join(reader.iter_range(2 * CHUNK - 5, 10)))
+        assert piece == data[2 * CHUNK - 5:2 * CHUNK + 5] and reads == 1
+        assert b"".join(reader.iter_range(len(data) - 3)) == data[-3:]
+        assert b"".join(reader.iter_range(len(data) + 10, 5)) == b""
+
+        # File object chuẩn: seek/read/BufferedReader
+        reader.seek(-100, io.SEEK_END)
+        assert reader.read(50) == data[-100:-50] and reader.tell() == len(data) - 50
+        with io.BufferedReader(manager.open_file(snapshot_id, "db/dump.sql")) as f:
+            assert f.read() == data
+        assert manager.open_file(snapshot_id, "small.txt").read() == b"hello snapshot\n"
+
+        try:
+            manager.open_file(snapshot_id, "db/missing.sql")
+            assert False, "missing file opened"
+        except PathNotFoundError:
+            pass
+
+        # Chunk lưu trước khi có bảng độ dài: đọc 1 lần để biết độ dài, sau đó được nhớ
+        storage.index._conn.execute("DELETE FROM chunk_lengths")
+        reader = manager.open_file(snapshot_id, "db/dump.sql")
+        assert b"".join(reader.iter_range(3 * CHUNK, 20)) == data[3 * CHUNK:3 * CHUNK + 20]
+        reader = manager.open_file(snapshot_id, "db/dump.sql")
+        _, reads = count_chunk_reads(lambda: b"".join(reader.iter_range(3 * CHUNK, 20)))
+        assert reads == 1
+
+        # Chunk hỏng chỉ làm hỏng range đọc trúng nó
+        entry = next(e for e in manager.iter_snapshot_entries(snapshot_id) if e["path"] == "db/dump.sql")
+        with open(storage._chunk_path(entry["chunks"][1], create=False), "r+b") as f:
+            f.seek(-1, 2)
+            byte = f.read(1)
+            f.seek(-1, 2)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        reader = manager.open_file(snapshot_id, "db/dump.sql")
+        assert b"".join(reader.iter_range(0, 100)) == data[:100]
+        try:
+            b"".join(reader.iter_range(CHUNK, 100))
+            assert False, "corrupted chunk read"
+        except IntegrityError:
+            pass
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_cat_tampered_path_index():
+    print("🧪 Cat: entries of a tampered path index are never served")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        os.makedirs(dataset)
+        for name in ("a.txt", "b.txt"):
+            with open(os.path.join(dataset, name), "w") as f:
+                f.write(f"CONTENT {name.upper()}\n")
+        storage, manager = open_store(store)
+        snapshot_id = manager.create_snapshot(dataset)["id"]
+
+        # Đổi chunk list của a.txt và b.txt trong sidecar (cùng độ dài, header giữ nguyên)
+        index_path = os.path.join(store, "snapshots", f"{snapshot_id}.pathidx")
+        entries = {e["path"]: e for e in manager.iter_snapshot_entries(snapshot_id)}
+        with open(index_path, "rb") as f:
+            data = f.read()
+        chunk_a, chunk_b = entries["a.txt"]["chunks"][0].encode(), entries["b.txt"]["chunks"][0].encode()
+        data = data.replace(chunk_a, b"#" * 64).replace(chunk_b, chunk_a).replace(b"#" * 64, chunk_b)
+        with open(index_path, "wb") as f:
+            f.write(data)
+
+        # Index bị loại và dựng lại từ manifest: a.txt vẫn là nội dung của a.txt
+        assert manager.open_file(snapshot_id, "a.txt").read() == b"CONTENT A.TXT\n"
+        with open(index_path, "rb") as f:
+            assert f.read() != data
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_cat_cli():
+    print("🧪 Cat: python main.py cat <snapshot> <path> [--offset --length]")
+    dataset = "./test_cat_dataset"
+    store = "./test_cat_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        data = make_dataset(dataset)
+        assert subprocess.run(f"python main.py init {store}", shell=True,
+                              capture_output=True).returncode == 0
+        result = subprocess.run(f"python main.py backup {dataset}", shell=True,
+                                capture_output=True, text=True)
+        snapshot_id = result.stdout.split("Snapshot ID: ")[1].split()[0]
+
+        result = subprocess.run(["python", "main.py", "cat", snapshot_id, "db/dump.sql"],
+                                capture_output=True)
+        assert result.returncode == 0 and result.stdout == data
+        result = subprocess.run(["python", "main.py", "cat", snapshot_id, "db/dump.sql",
+                                 "--offset", str(CHUNK - 7), "--length", "100"], capture_output=True)
+        assert result.returncode == 0 and result.stdout == data[CHUNK - 7:CHUNK + 93]
+
+        result = subprocess.run(["python", "main.py", "cat", snapshot_id, "nope.txt"],
+                                capture_output=True, text=True)
+        assert result.returncode == 1 and result.stdout == ""
+        assert "File not found in snapshot" in result.stderr
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_snapshot_reader()
+        test_cat_tampered_path_index()
+        test_cat_cli()
+        print("✅ CAT TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ CAT TEST FAILED")
+        sys.exit(1)
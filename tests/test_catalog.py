@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+TEST: SQLite snapshot catalog
+metadata.json được migrate sang catalog.db, list phân trang/lọc, hash chain,
+forget/gc và phát hiện rollback vẫn hoạt động trên catalog SQLite
+"""
+
+import os
+import sys
+import sqlite3
+import shutil
+import subprocess
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def listed_ids(output):
+    return [line.split("ID:", 1)[1].strip() for line in output.split('\n') if ". ID:" in line]
+
+
+def test_sqlite_catalog():
+    print("🧪 SQLite catalog: migration, paging/filters, chain checks, forget + gc")
+    dataset = "./test_catalog_dataset"
+    store = "./test_catalog_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        assert run(f"python main.py init {store}").returncode == 0
+        ids = []
+        for i, label in enumerate(["daily", "weekly", "daily"]):
+            with open(os.path.join(dataset, f"file_{i}.txt"), "w") as f:
+                f.write(f"catalog test {i}\n" * 100)
+            ids.append(extract_field(run(f"python main.py backup {dataset} --label {label}").stdout,
+                                     "Snapshot ID"))
+        assert all(ids)
+
+        # Chuyển sang catalog SQLite: metadata.json được migrate
+        result = run(f"echo y | python main.py init {store} --catalog sqlite")
+        assert "Catalog: sqlite" in result.stdout
+        assert "Migrated 3 snapshot(s)" in result.stdout
+        assert os.path.exists(os.path.join(store, "catalog.db"))
+        assert not os.path.exists(os.path.join(store, "metadata.json"))
+        assert os.path.exists(os.path.join(store, "metadata.json.migrated"))
+
+        assert "Snapshots verified: 3, invalid: 0" in run("python main.py verify-all").stdout
+
+        # Phân trang và lọc (mới nhất trước)
+        result = run("python main.py list --limit 2")
+        assert "Found 3 snapshot(s)" in result.stdout and "Showing 1-2 of 3" in result.stdout
+        assert listed_ids(result.stdout) == [ids[2], ids[1]]
+        assert listed_ids(run("python main.py list --limit 2 --offset 2").stdout) == [ids[0]]
+        assert listed_ids(run("python main.py list --label daily").stdout) == [ids[2], ids[0]]
+        assert listed_ids(run("python main.py list --since 1h").stdout) == ids[::-1]
+        assert "No snapshots found" in run("python main.py list --until 2000-01-01").stdout
+
+        # Snapshot mới nối chain với sequence tiếp theo
+        with open(os.path.join(dataset, "file_3.txt"), "w") as f:
+            f.write("after migration\n")
+        ids.append(extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID"))
+        conn = sqlite3.connect(os.path.join(store, "catalog.db"))
+        sequences = [row[0] for row in conn.execute("SELECT sequence FROM snapshots ORDER BY chain_pos")]
+        conn.close()
+        assert sequences == [0, 1, 2, 3]
+
+        # forget + gc trên catalog SQLite: tombstone giữ chain
+        run(f"python main.py forget {ids[1]}")
+        assert "Snapshots verified: 3, invalid: 0" in run("python main.py verify-all").stdout
+        assert extract_field(run("python main.py gc").stdout, "Removed chunks").startswith("0 ")
+        assert ids[1] not in listed_ids(run("python main.py list").stdout)
+
+        # Sửa chain hash trong catalog → rollback bị phát hiện
+        conn = sqlite3.connect(os.path.join(store, "catalog.db"))
+        conn.execute("UPDATE snapshots SET chain_hash = ? WHERE id = ?", ("f" * 64, ids[2]))
+        conn.commit()
+        conn.close()
+        result = run(f"python main.py verify {ids[3]}")
+        assert "is INVALID" in result.stdout and "Rollback detected" in result.stdout
+
+        # Không quay lại json được
+        assert run(f"echo y | python main.py init {store} --catalog json").returncode != 0
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_sqlite_catalog()
+        print("✅ CATALOG TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ CATALOG TEST FAILED")
+        sys.exit(1)
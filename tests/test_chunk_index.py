@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+TEST: Persistent chunk index
+index.db theo dõi location/size/refcount, tự build cho store cũ và sửa được bằng rebuild-index
+chunks.bloom chứa mọi chunk hash và được build lại khi lệch với index
+"""
+
+import os
+import sys
+import shutil
+import struct
+import sqlite3
+import subprocess
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def index_rows(store):
+    """hash -> (location, size, refcount) đọc trực tiếp từ index.db"""
+    conn = sqlite3.connect(os.path.join(store, "index.db"))
+    try:
+        rows = conn.execute("SELECT hash, location, size, refcount FROM chunks").fetchall()
+    finally:
+        conn.close()
+    return {row[0]: row[1:] for row in rows}
+
+
+def loose_chunks(store):
+    result = {}
+    for root, _, files in os.walk(os.path.join(store, "chunks")):
+        for name in files:
+            result[name] = os.path.join(root, name)
+    return result
+
+
+def bloom_header(store):
+    """(count, fp_rate) từ header của chunks.bloom"""
+    with open(os.path.join(store, "chunks.bloom"), 'rb') as f:
+        magic, _, _, count, _, fp_rate = struct.unpack(">8sQIQQd", f.read(44))
+    assert magic == b"BKBLOOM1"
+    return count, fp_rate
+
+
+def test_chunk_index():
+    print("🧪 Chunk index: refcounts, automatic build, rebuild-index, stale entries")
+    dataset = "./test_index_dataset"
+    store = "./test_index_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        for i in range(3):
+            with open(os.path.join(dataset, f"file_{i}.txt"), "w") as f:
+                f.write(f"index test {i}\n" * 100)
+
+        assert run(f"python main.py init {store}").returncode == 0
+        result = run(f"python main.py backup {dataset} --label first")
+        first_id = extract_field(result.stdout, "Snapshot ID")
+        assert first_id
+
+        rows = index_rows(store)
+        chunks = loose_chunks(store)
+        assert set(rows) == set(chunks)
+        assert all(location == "loose" and refcount == 1 for location, _, refcount in rows.values())
+        assert all(size == os.path.getsize(chunks[h]) for h, (_, size, _) in rows.items())
+
+        # Snapshot thứ 2 dùng lại 3 chunk cũ và thêm 1 chunk mới
+        with open(os.path.join(dataset, "new.txt"), "w") as f:
+            f.write("new chunk\n")
+        assert extract_field(run(f"python main.py backup {dataset} --label second").stdout, "Snapshot ID")
+        refcounts = sorted(refcount for _, _, refcount in index_rows(store).values())
+        assert refcounts == [1, 2, 2, 2]
+
+        # Store cũ không có index.db → được build lại kèm refcount khi mở
+        for name in os.listdir(store):
+            if name.startswith("index.db"):
+                os.remove(os.path.join(store, name))
+        assert run("python main.py list").returncode == 0
+        rebuilt = sorted(refcount for _, _, refcount in index_rows(store).values())
+        assert rebuilt == [1, 2, 2, 2]
+
+        result = run("python main.py rebuild-index")
+        assert extract_field(result.stdout, "Chunks indexed") == "4"
+        assert extract_field(result.stdout, "Snapshots counted") == "2"
+
+        # Xóa tay 1 chunk: verify phát hiện, entry cũ bị bỏ và backup sau ghi lại chunk
+        victim = index_rows(store)
+        victim = next(h for h, (_, _, refcount) in victim.items() if refcount == 2)
+        os.remove(loose_chunks(store)[victim])
+
+        result = run(f"python main.py verify {first_id}")
+        assert "is INVALID" in result.stdout
+        assert victim not in index_rows(store)
+
+        with open(os.path.join(dataset, "third.txt"), "w") as f:
+            f.write("third snapshot\n")
+        assert extract_field(run(f"python main.py backup {dataset} --label third").stdout, "Snapshot ID")
+        assert victim in loose_chunks(store)
+
+        result = run(f"python main.py verify {first_id}")
+        assert "is VALID" in result.stdout
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def test_bloom_filter():
+    print("🧪 Bloom filter: built at init, updated on store, rebuilt when stale")
+    dataset = "./test_bloom_dataset"
+    store = "./test_bloom_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        for i in range(4):
+            with open(os.path.join(dataset, f"file_{i}.txt"), "w") as f:
+                f.write(f"bloom test {i}\n" * 50)
+
+        result = run(f"python main.py init {store} --bloom-fp-rate 0.001")
+        assert result.returncode == 0
+        assert bloom_header(store) == (0, 0.001)
+
+        result = run(f"python main.py backup {dataset} --label bloom --jobs 2")
+        snap_id = extract_field(result.stdout, "Snapshot ID")
+        assert snap_id
+        assert bloom_header(store) == (4, 0.001)
+
+        # Filter bị mất → build lại từ index khi mở store
+        os.remove(os.path.join(store, "chunks.bloom"))
+        assert "is VALID" in run(f"python main.py verify {snap_id}").stdout
+        assert bloom_header(store) == (4, 0.001)
+
+        assert run(f"echo y | python main.py init {store} --bloom-fp-rate 2").returncode != 0
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_chunk_index()
+        test_bloom_filter()
+        print("✅ CHUNK INDEX TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ CHUNK INDEX TEST FAILED")
+        sys.exit(1)
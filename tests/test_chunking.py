@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+TEST: Content-defined chunking (FastCDC)
+Chèn 1 byte vào đầu file lớn; snapshot sau phải dùng lại hầu hết chunks cũ
+"""
+
+import io
+import os
+import sys
+import json
+import random
+import shutil
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from unittest import mock
+
+import src.chunker
+from src.chunker import FastCDCChunker, FixedChunker, get_chunker
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_snapshot_id(output):
+    """Trích xuất snapshot ID từ output"""
+    for line in output.split('\n'):
+        if "Snapshot ID:" in line:
+            parts = line.split(":")
+            if len(parts) >= 2:
+                return parts[1].strip()
+    return None
+
+
+def manifest_chunks(store, snapshot_id):
+    """Đọc danh sách chunk của snapshot từ manifest"""
+    with open(os.path.join(store, "snapshots", f"{snapshot_id}.manifest"), 'r') as f:
+        manifest = json.load(f)
+    chunks = []
+    for entry in manifest["files"]:
+        chunks.extend(entry["chunks"])
+    return manifest, chunks
+
+
+def test_chunker_boundaries():
+    print("🧪 Chunker: boundaries resynchronise after an insertion")
+    rng = random.Random(1234)
+    data = bytes(rng.getrandbits(8) for _ in range(3 * 1024 * 1024))
+
+    chunker = FastCDCChunker(min_size=16 * 1024, avg_size=64 * 1024, max_size=256 * 1024)
+    original = list(chunker.split(io.BytesIO(data)))
+    shifted = list(chunker.split(io.BytesIO(b"X" + data)))
+
+    assert b"".join(original) == data
+    assert b"".join(shifted) == b"X" + data
+    assert all(len(c) <= 256 * 1024 for c in original)
+    assert all(len(c) >= 16 * 1024 for c in original[:-1])
+
+    shared = set(original) & set(shifted)
+    print(f"   {len(shared)}/{len(original)} chunks shared after insertion")
+    assert len(shared) >= len(original) - 2
+
+    # Fixed chunker: mọi boundary bị dịch
+    fixed = FixedChunker(64 * 1024)
+    fixed_a = list(fixed.split(io.BytesIO(data)))
+    fixed_b = list(fixed.split(io.BytesIO(b"X" + data)))
+    assert not set(fixed_a) & set(fixed_b)
+
+    assert get_chunker(chunker.to_config()).to_config() == chunker.to_config()
+    assert get_chunker(None).to_config() == FixedChunker().to_config()
+
+
+def test_vectorized_cut_points():
+    print("🧪 Chunker: vectorized Gear scan finds the same boundaries as the scalar loop")
+    if src.chunker.np is None:
+        print("   (numpy không có, bỏ qua)")
+        return
+    rng = random.Random(99)
+    # Dữ liệu ngẫu nhiên + vùng lặp lại + vùng toàn 0 (boundary bị ép ở max_size)
+    data = rng.randbytes(2 * 1024 * 1024) + b"abc" * 100000 + bytes(300000) + rng.randbytes(500000)
+    for sizes in ((64, 256, 1024), (16 * 1024, 64 * 1024, 256 * 1024), (256 * 1024, 1024 * 1024, 4 * 1024 * 1024)):
+        chunker = FastCDCChunker(*sizes)
+        fast = list(chunker.split(io.BytesIO(data)))
+        with mock.patch.object(src.chunker, "np", None):
+            scalar = list(chunker.split(io.BytesIO(data)))
+        assert [len(c) for c in fast] == [len(c) for c in scalar] and b"".join(fast) == data
+
+    # Stream đọc từng mẩu nhỏ (nhiều lần refill buffer) cho cùng kết quả
+    class Trickle(io.BytesIO):
+        def read(self, size=-1):
+            return super().read(min(size, 70001))
+
+    chunker = FastCDCChunker(16 * 1024, 64 * 1024, 256 * 1024)
+    assert list(chunker.split(Trickle(data))) == list(chunker.split(io.BytesIO(data)))
+
+
+def test_cdc_backup_dedup():
+    print("🧪 FastCDC store: backup after insertion stores only changed regions")
+    dataset = "./test_cdc_dataset"
+    store = "./test_cdc_store"
+    restore_dir = "./test_cdc_restore"
+    for path in (dataset, store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        rng = random.Random(42)
+        big = bytes(rng.getrandbits(8) for _ in range(4 * 1024 * 1024))
+        with open(os.path.join(dataset, "db.bin"), "wb") as f:
+            f.write(big)
+        with open(os.path.join(dataset, "notes.txt"), "w") as f:
+            f.write("hello\n")
+
+        result = run(f"python main.py init {store} --chunker fastcdc "
+                     f"--min-size 32768 --avg-size 131072 --max-size 524288")
+        assert result.returncode == 0
+
+        result = run(f"python main.py backup {dataset} --label cdc-1")
+        snap1 = extract_snapshot_id(result.stdout)
+        assert snap1
+
+        manifest, chunks1 = manifest_chunks(store, snap1)
+        assert manifest["chunker"]["type"] == "fastcdc"
+        assert manifest["chunker"]["avg_size"] == 131072
+
+        # Chèn 1 byte vào đầu file
+        with open(os.path.join(dataset, "db.bin"), "wb") as f:
+            f.write(b"\x00" + big)
+
+        result = run(f"python main.py backup {dataset} --label cdc-2")
+        snap2 = extract_snapshot_id(result.stdout)
+        assert snap2
+
+        _, chunks2 = manifest_chunks(store, snap2)
+        new_chunks = set(chunks2) - set(chunks1)
+        print(f"   New chunks after insertion: {len(new_chunks)}/{len(chunks2)}")
+        assert len(new_chunks) <= 2
+
+        result = run(f"python main.py verify {snap2}")
+        assert "is VALID" in result.stdout
+
+        result = run(f"python main.py restore {snap2} {restore_dir}")
+        with open(os.path.join(restore_dir, "db.bin"), "rb") as f:
+            assert f.read() == b"\x00" + big
+    finally:
+        for path in (dataset, store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_chunker_boundaries()
+        test_vectorized_cut_points()
+        test_cdc_backup_dedup()
+        print("✅ CHUNKING TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ CHUNKING TEST FAILED")
+        sys.exit(1)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+TEST: Per-chunk compression
+Chunk nén nhỏ hơn dữ liệu gốc, chunk khó nén được lưu nguyên, hash/dedup không đổi
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import subprocess
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def tree_hashes(directory):
+    """Map rel_path -> sha256 cho toàn bộ file trong thư mục"""
+    result = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                result[os.path.relpath(path, directory)] = hashlib.sha256(f.read()).hexdigest()
+    return result
+
+
+def loose_chunks(store):
+    """Map chunk hash -> file (chunk nén nằm ở file <hash>.z)"""
+    result = {}
+    for root, _, files in os.walk(os.path.join(store, "chunks")):
+        for name in files:
+            result[name[:-2] if name.endswith(".z") else name] = os.path.join(root, name)
+    return result
+
+
+def manifest_chunks(store, snapshot_id, rel_path):
+    with open(os.path.join(store, "snapshots", f"{snapshot_id}.manifest")) as f:
+        manifest = json.load(f)
+    return next(entry["chunks"] for entry in manifest["files"] if entry["path"] == rel_path)
+
+
+def test_compressed_loose_store():
+    print("🧪 Compressed loose store: smaller chunks, raw incompressible data, tamper detection")
+    dataset = "./test_compress_dataset"
+    plain_store = "./test_compress_plain_store"
+    store = "./test_compress_store"
+    restore_dir = "./test_compress_restore"
+    for path in (dataset, plain_store, store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        with open(os.path.join(dataset, "app.log"), "w") as f:
+            for i in range(20000):
+                f.write(f"2024-01-01 12:00:{i % 60:02d} INFO request {i} served in {i % 17} ms\n")
+        with open(os.path.join(dataset, "random.bin"), "wb") as f:
+            f.write(os.urandom(300 * 1024))
+        # Dữ liệu gốc trùng magic của frame: không được hiểu nhầm là chunk nén
+        with open(os.path.join(dataset, "magic.bin"), "wb") as f:
+            f.write(b"BKCHUNK1" + bytes([1]) + os.urandom(4096))
+
+        assert run(f"python main.py init {plain_store}").returncode == 0
+        plain_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        assert plain_id
+
+        result = run(f"python main.py init {store} --compression zlib")
+        assert "Compression: zlib" in result.stdout
+        snap_id = extract_field(run(f"python main.py backup {dataset} --jobs 2").stdout, "Snapshot ID")
+        assert snap_id
+
+        # Cùng chunk hash với store không nén
+        assert set(loose_chunks(store)) == set(loose_chunks(plain_store))
+
+        log_chunks = loose_chunks(store)
+        for chunk_hash in manifest_chunks(store, snap_id, "app.log"):
+            assert log_chunks[chunk_hash].endswith(".z")
+            with open(log_chunks[chunk_hash], 'rb') as f:
+                assert f.read(8) == b"BKCHUNK1"
+        stored = sum(os.path.getsize(log_chunks[h]) for h in manifest_chunks(store, snap_id, "app.log"))
+        assert stored * 3 < os.path.getsize(os.path.join(dataset, "app.log"))
+
+        # Dữ liệu ngẫu nhiên không nén được → lưu nguyên
+        for chunk_hash in (manifest_chunks(store, snap_id, "random.bin")
+                           + manifest_chunks(store, snap_id, "magic.bin")):
+            assert not log_chunks[chunk_hash].endswith(".z")
+            with open(log_chunks[chunk_hash], 'rb') as f:
+                assert hashlib.sha256(f.read()).hexdigest() == chunk_hash
+
+        assert "is VALID" in run(f"python main.py verify {snap_id}").stdout
+        run(f"python main.py restore {snap_id} {restore_dir}")
+        assert tree_hashes(restore_dir) == tree_hashes(dataset)
+
+        # Sửa 1 byte trong payload đã nén
+        victim = log_chunks[manifest_chunks(store, snap_id, "app.log")[0]]
+        with open(victim, 'r+b') as f:
+            f.seek(20)
+            byte = f.read(1)
+            f.seek(20)
+            f.write(bytes([(byte[0] + 1) % 256]))
+        assert "is INVALID" in run(f"python main.py verify {snap_id}").stdout
+
+        # Store cũ không nén được bật nén: chunk gốc bắt đầu bằng magic vẫn đọc đúng
+        shutil.rmtree(restore_dir)
+        assert "Compression: zlib" in run(f"echo y | python main.py init {plain_store} --compression zlib").stdout
+        assert "is VALID" in run(f"python main.py verify {plain_id}").stdout
+        run(f"python main.py restore {plain_id} {restore_dir}")
+        assert tree_hashes(restore_dir) == tree_hashes(dataset)
+    finally:
+        for path in (dataset, plain_store, store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def test_compressed_packed_store():
+    print("🧪 Compressed packed store: codec byte in pack records, switching codecs")
+    store = "./test_compress_packed_store"
+    restore_dir = "./test_compress_packed_restore"
+    for path in (store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        assert run(f"python main.py init {store} --storage packed --compression lzma").returncode == 0
+        first_id = extract_field(run("python main.py backup dataset --label lzma").stdout, "Snapshot ID")
+        assert first_id
+
+        # Đổi codec: chunk cũ (lzma) vẫn đọc được cùng chunk mới (bz2)
+        result = run(f"echo y | python main.py init {store} --storage packed --compression bz2")
+        assert "Compression: bz2" in result.stdout
+        assert "is VALID" in run(f"python main.py verify {first_id}").stdout
+        run(f"python main.py restore {first_id} {restore_dir}")
+        assert tree_hashes(restore_dir) == tree_hashes("dataset")
+
+        assert run(f"echo y | python main.py init {store} --compression brotli").returncode != 0
+    finally:
+        for path in (store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_compressed_loose_store()
+        test_compressed_packed_store()
+        print("✅ COMPRESSION TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ COMPRESSION TEST FAILED")
+        sys.exit(1)
@@ -9,6 +9,10 @@ import time
 import json
 import subprocess
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.journal import Journal
+
 def run(cmd):
     """Run command and return output"""
     print(f"$ {cmd}")
@@ -97,17 +101,14 @@ def simulate_crash(store_path):
         import shutil
         shutil.copy2(journal_path, journal_path + ".backup")
     
-    # Thêm incomplete transaction
+    # Thêm incomplete transaction (BEGIN + MANIFEST, không có COMMIT)
     crash_id = f"snap_CRASHED_{int(time.time())}"
     
-    with open(journal_path, 'a') as f:
-        f.write(f"\n# --- MANUAL CRASH SIMULATION ---\n")
-        f.write(f"BEGIN:{crash_id}\n")
-        f.write("ADD_CHUNK:chunk_hash_crashed_1\n")
-        f.write("ADD_CHUNK:chunk_hash_crashed_2\n")
-        f.write("ADD_MANIFEST:manifest_hash_crashed\n")
-        # KHÔNG CÓ COMMIT → ĐÂY LÀ CRASH
-        f.write(f"# Transaction {crash_id} incomplete (simulated crash)\n")
+    journal = Journal(journal_path)
+    journal.begin_transaction(crash_id)
+    journal.write_manifest(crash_id, {"manifest_hash": "manifest_hash_crashed"})
+    journal.sync()
+    journal.close()
     
     print(f"   Added incomplete transaction: {crash_id}")
     print("   (No COMMIT record → simulates kill during backup)")
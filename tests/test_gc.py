@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+TEST: forget + garbage collection
+Snapshot bị forget để lại tombstone (hash chain vẫn VALID), gc chỉ xóa chunk
+không còn được tham chiếu, pack nhiều rác được repack
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.storage import ChunkStorage, SnapshotManager
+from src.journal import Journal
+from src.garbage import GarbageCollector
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def tree_hashes(directory):
+    """Map rel_path -> sha256 cho toàn bộ file trong thư mục"""
+    result = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                result[os.path.relpath(path, directory)] = hashlib.sha256(f.read()).hexdigest()
+    return result
+
+
+def loose_chunks(store):
+    return {name for _, _, names in os.walk(os.path.join(store, "chunks")) for name in names}
+
+
+def write_random(path, size):
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+
+
+def test_forget_and_gc_loose():
+    print("🧪 forget + gc (loose): tombstone keeps the chain valid, only garbage is removed")
+    dataset = "./test_gc_dataset"
+    store = "./test_gc_store"
+    restore_dir = "./test_gc_restore"
+    for path in (dataset, store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        write_random(os.path.join(dataset, "shared.bin"), 50 * 1024)
+        write_random(os.path.join(dataset, "old.bin"), 50 * 1024)
+
+        assert run(f"python main.py init {store}").returncode == 0
+        first_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        os.remove(os.path.join(dataset, "old.bin"))
+        write_random(os.path.join(dataset, "new.bin"), 50 * 1024)
+        second_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        assert first_id and second_id
+        assert len(loose_chunks(store)) == 3
+
+        result = run(f"python main.py forget {first_id}")
+        assert "forgotten" in result.stdout
+        assert not os.path.exists(os.path.join(store, "snapshots", f"{first_id}.manifest"))
+        with open(os.path.join(store, "metadata.json")) as f:
+            metadata = json.load(f)
+        assert first_id not in metadata["snapshots"] and first_id in metadata["forgotten"]
+
+        # Snapshot còn lại vẫn nối chain qua tombstone
+        assert "is VALID" in run(f"python main.py verify {second_id}").stdout
+        assert "Snapshots verified: 1, invalid: 0" in run("python main.py verify-all").stdout
+
+        # --dry-run chỉ báo cáo
+        result = run("python main.py gc --dry-run")
+        assert extract_field(result.stdout, "Would remove chunks").startswith("1 ")
+        assert len(loose_chunks(store)) == 3
+
+        result = run("python main.py gc")
+        assert extract_field(result.stdout, "Removed chunks").startswith("1 ")
+        assert len(loose_chunks(store)) == 2
+        assert extract_field(run("python main.py gc --full").stdout, "Removed chunks").startswith("0 ")
+
+        run(f"python main.py restore {second_id} {restore_dir}")
+        assert tree_hashes(restore_dir) == tree_hashes(dataset)
+
+        # Forget snapshot mới nhất → backup sau vẫn nối chain vào tombstone
+        with open(os.path.join(dataset, "newer.txt"), "w") as f:
+            f.write("after forgetting the head\n")
+        run(f"python main.py forget {second_id}")
+        third_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        assert third_id
+        with open(os.path.join(store, "metadata.json")) as f:
+            metadata = json.load(f)
+        assert metadata["snapshots"][third_id]["prev_chain_hash"] == \
+            metadata["forgotten"][second_id]["chain_hash"]
+        assert "Snapshots verified: 1, invalid: 0" in run("python main.py verify-all").stdout
+
+        assert "not found" in run("python main.py forget snap_does_not_exist").stdout
+    finally:
+        for path in (dataset, store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def test_gc_repack():
+    print("🧪 gc (packed): dead packs deleted, mostly-garbage packs repacked")
+    dataset = "./test_gc_packed_dataset"
+    store = "./test_gc_packed_store"
+    restore_dir = "./test_gc_packed_restore"
+    for path in (dataset, store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        for i in range(4):
+            write_random(os.path.join(dataset, f"file_{i}.bin"), 100 * 1024)
+
+        assert run(f"python main.py init {store} --storage packed").returncode == 0
+        first_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        for i in range(3):
+            os.remove(os.path.join(dataset, f"file_{i}.bin"))
+        second_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        assert first_id and second_id
+
+        packs_dir = os.path.join(store, "packs")
+        before = sum(os.path.getsize(os.path.join(packs_dir, n)) for n in os.listdir(packs_dir))
+
+        run(f"python main.py forget {first_id}")
+        result = run("python main.py gc")
+        assert extract_field(result.stdout, "Removed chunks").startswith("3 ")
+        assert "repacked: 1" in result.stdout
+
+        after = sum(os.path.getsize(os.path.join(packs_dir, n)) for n in os.listdir(packs_dir))
+        assert after < before / 2
+        assert "pack-000001.pack" not in os.listdir(packs_dir)
+
+        assert "is VALID" in run(f"python main.py verify {second_id} --deep").stdout
+        run(f"python main.py restore {second_id} {restore_dir}")
+        assert tree_hashes(restore_dir) == tree_hashes(dataset)
+    finally:
+        for path in (dataset, store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def open_store(store):
+    storage = ChunkStorage(store)
+    journal = Journal(os.path.join(store, "journal.wal"), "off")
+    return storage, SnapshotManager(storage, journal)
+
+
+def test_gc_keeps_unindexed_chunks():
+    print("🧪 gc: chunks referenced by a live manifest survive a missing index row")
+    tmp = tempfile.mkdtemp()
+    try:
+        for storage_mode in ("loose", "packed"):
+            store, dataset = os.path.join(tmp, storage_mode), os.path.join(tmp, f"data_{storage_mode}")
+            os.makedirs(dataset)
+            for i in range(4):
+                write_random(os.path.join(dataset, f"file_{i}.bin"), 100 * 1024)
+            assert run(f"python main.py init {store} --storage {storage_mode}").returncode == 0
+
+            storage, manager = open_store(store)
+            first_id = manager.create_snapshot(dataset)["id"]
+            for i in range(3):
+                os.remove(os.path.join(dataset, f"file_{i}.bin"))
+            write_random(os.path.join(dataset, "new.bin"), 100 * 1024)
+            second_id = manager.create_snapshot(dataset)["id"]
+
+            # Index tụt lại sau file trên đĩa: verify vẫn pass nhờ fallback filesystem/.idx
+            lost = next(h for e in manager.iter_snapshot_entries(second_id)
+                        if e["path"] == "file_3.bin" for h in e["chunks"])
+            storage.index.remove(lost)
+            storage.index.commit()
+            assert manager.verify_snapshot(second_id)[0]
+
+            manager.forget_snapshots([first_id])
+            stats = GarbageCollector(manager).collect()
+            assert stats["chunks"] == 3
+            if storage_mode == "packed":
+                assert stats["packs_repacked"] == 1
+            assert manager.verify_snapshot(second_id)[0]
+
+            stats = GarbageCollector(manager).collect(full=True)
+            assert stats["chunks"] == 0
+            assert manager.verify_snapshot(second_id)[0]
+            # Chunk được ghi lại vào index
+            assert storage.index.contains(lost)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_incremental_gc_skips_manifests():
+    print("🧪 gc: incremental mode relies on refcounts instead of reading every manifest")
+    tmp = tempfile.mkdtemp()
+    try:
+        for storage_mode in ("loose", "packed"):
+            store, dataset = os.path.join(tmp, storage_mode), os.path.join(tmp, f"data_{storage_mode}")
+            os.makedirs(dataset)
+            assert run(f"python main.py init {store} --storage {storage_mode}").returncode == 0
+            storage, manager = open_store(store)
+            snapshot_ids = []
+            for i in range(4):
+                write_random(os.path.join(dataset, f"file_{i}.bin"), 100 * 1024)
+                snapshot_ids.append(manager.create_snapshot(dataset)["id"])
+            GarbageCollector(manager).collect()
+
+            manager.forget_snapshots(snapshot_ids[:1])
+            opened = []
+            real_iter = manager.iter_snapshot_entries
+
+            def counting_iter(snapshot_id, *args, **kwargs):
+                opened.append(snapshot_id)
+                return real_iter(snapshot_id, *args, **kwargs)
+
+            manager.iter_snapshot_entries = counting_iter
+            stats = GarbageCollector(manager).collect()
+            assert opened == [] and stats["chunks"] == 0
+
+            # file_0 chỉ còn trong các snapshot bị forget → bị thu hồi nhờ refcount
+            os.remove(os.path.join(dataset, "file_0.bin"))
+            snapshot_ids.append(manager.create_snapshot(dataset)["id"])
+            manager.forget_snapshots(snapshot_ids[1:4])
+            stats = GarbageCollector(manager).collect()
+            assert opened == [] and stats["chunks"] == 1
+
+            # --full mark lại từ mọi manifest sống
+            assert GarbageCollector(manager).collect(full=True)["chunks"] == 0
+            assert opened == snapshot_ids[4:]
+            del manager.iter_snapshot_entries
+            for snapshot_id in snapshot_ids[4:]:
+                assert manager.verify_snapshot(snapshot_id)[0]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_forget_and_gc_loose()
+        test_gc_repack()
+        test_gc_keeps_unindexed_chunks()
+        test_incremental_gc_skips_manifests()
+        print("✅ GC TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ GC TEST FAILED")
+        sys.exit(1)
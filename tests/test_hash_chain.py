@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+TEST: Hash chain index
+Snapshot trùng Merkle root (backup lại dữ liệu không đổi) vẫn verify được;
+snapshot_index.json được build lại khi mất hoặc lệch với metadata
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def test_identical_roots():
+    print("🧪 Hash chain: identical Merkle roots, persisted root/sequence index")
+    dataset = "./test_chain_dataset"
+    store = "./test_chain_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        with open(os.path.join(dataset, "same.txt"), "w") as f:
+            f.write("unchanged between backups\n" * 50)
+
+        assert run(f"python main.py init {store}").returncode == 0
+        ids = [extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+               for _ in range(3)]
+        assert all(ids)
+
+        with open(os.path.join(store, "metadata.json")) as f:
+            metadata = json.load(f)
+        roots = {metadata["snapshots"][snap_id]["merkle_root"] for snap_id in ids}
+        assert len(roots) == 1
+
+        index_path = os.path.join(store, "snapshot_index.json")
+        with open(index_path) as f:
+            index = json.load(f)
+        assert index["order"] == ids
+        assert index["by_root"][roots.pop()] == ids
+        assert index["by_sequence"] == {str(i): snap_id for i, snap_id in enumerate(ids)}
+
+        for snap_id in ids:
+            assert "is VALID" in run(f"python main.py verify {snap_id}").stdout
+        assert "Snapshots verified: 3, invalid: 0" in run("python main.py verify-all").stdout
+
+        # Index bị xóa → build lại khi mở store
+        os.remove(index_path)
+        assert "is VALID" in run(f"python main.py verify {ids[2]}").stdout
+        with open(index_path) as f:
+            assert json.load(f)["order"] == ids
+
+        # Snapshot cuối trỏ tới chain hash của snapshot đầu (cùng root) → vẫn bị phát hiện
+        metadata["snapshots"][ids[2]]["prev_chain_hash"] = metadata["snapshots"][ids[0]]["chain_hash"]
+        with open(os.path.join(store, "metadata.json"), "w") as f:
+            json.dump(metadata, f, indent=2)
+        result = run(f"python main.py verify {ids[2]}")
+        assert "is INVALID" in result.stdout and "Rollback detected" in result.stdout
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_identical_roots()
+        print("✅ HASH CHAIN TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ HASH CHAIN TEST FAILED")
+        sys.exit(1)
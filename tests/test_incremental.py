@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+TEST: Incremental backup với file cache
+File không đổi (dev, inode, size, mtime_ns) phải được dùng lại mà không đọc lại
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def make_dataset(dataset):
+    os.makedirs(os.path.join(dataset, "sub"))
+    for i in range(5):
+        with open(os.path.join(dataset, "sub", f"file_{i}.txt"), "w") as f:
+            f.write(f"content {i}\n" * 1000)
+    # Đặt mtime về quá khứ để không rơi vào racy window
+    for root, _, files in os.walk(dataset):
+        for name in files:
+            os.utime(os.path.join(root, name), (1_600_000_000, 1_600_000_000))
+
+
+def test_incremental_backup():
+    print("🧪 Incremental backup reuses unchanged files from the file cache")
+    dataset = "./test_incremental_dataset"
+    store = "./test_incremental_store"
+    restore_dir = "./test_incremental_restore"
+    for path in (dataset, store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        make_dataset(dataset)
+        assert run(f"python main.py init {store}").returncode == 0
+
+        result = run(f"python main.py backup {dataset} --label first")
+        assert extract_field(result.stdout, "Unchanged files (from cache)") == "0"
+        assert os.listdir(os.path.join(store, "filecache"))
+
+        # Thêm 1 file mới: 5 file cũ vẫn lấy từ cache
+        with open(os.path.join(dataset, "new.txt"), "w") as f:
+            f.write("new file\n")
+        os.utime(os.path.join(dataset, "new.txt"), (1_600_000_000, 1_600_000_000))
+
+        result = run(f"python main.py backup {dataset} --label second")
+        assert extract_field(result.stdout, "Unchanged files (from cache)") == "5"
+
+        # Sửa 1 file (mtime khác)
+        changed = os.path.join(dataset, "sub", "file_2.txt")
+        with open(changed, "w") as f:
+            f.write("changed\n")
+        os.utime(changed, (1_600_000_100, 1_600_000_100))
+
+        result = run(f"python main.py backup {dataset} --label third --jobs 3")
+        assert extract_field(result.stdout, "Unchanged files (from cache)") == "5"
+        snap_id = extract_field(result.stdout, "Snapshot ID")
+
+        with open(os.path.join(store, "snapshots", f"{snap_id}.manifest")) as f:
+            manifest = json.load(f)
+        sizes = {entry["path"]: entry["size"] for entry in manifest["files"]}
+        assert sizes[os.path.join("sub", "file_2.txt")] == len("changed\n")
+
+        result = run(f"python main.py restore {snap_id} {restore_dir}")
+        with open(os.path.join(restore_dir, "sub", "file_2.txt")) as f:
+            assert f.read() == "changed\n"
+        with open(os.path.join(restore_dir, "sub", "file_0.txt")) as f:
+            assert f.read() == "content 0\n" * 1000
+
+        result = run(f"python main.py backup {dataset} --label full --full")
+        assert extract_field(result.stdout, "Unchanged files (from cache)") == "0"
+    finally:
+        for path in (dataset, store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_incremental_backup()
+        print("✅ INCREMENTAL BACKUP TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ INCREMENTAL BACKUP TEST FAILED")
+        sys.exit(1)
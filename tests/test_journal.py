@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+TEST: Group-commit journal
+Record được gom trong transaction và fsync tại durability point; file handle được giữ mở;
+backup chỉ để lại 1 transaction hoàn chỉnh trong journal.wal;
+checkpoint compact journal về các transaction còn mở;
+record binary có length + CRC, recovery dừng sạch ở record bị cắt dở
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.journal import Journal, JOURNAL_MAGIC, scan_journal
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def journal_lines(path):
+    """Record của journal dạng "KIND:tx_id" (theo thứ tự seq)"""
+    records, end, size = scan_journal(path)
+    assert end == size, "journal has a torn tail"
+    return [f"{record.kind}:{record.tx_id}" for record in records]
+
+
+def count_fsyncs(journal, steps):
+    """Chạy steps(journal) và đếm số lần os.fsync được gọi"""
+    with mock.patch("src.journal.os.fsync") as fsync:
+        steps(journal)
+    return fsync.call_count
+
+
+def snapshot_transaction(journal):
+    journal.begin_transaction("snap_1")
+    journal.write_manifest("snap_1", {"version": 2, "manifest_hash": "ab" * 32})
+    journal.write_metadata("snap_1", {"id": "snap_1"})
+    journal.sync()
+    journal.commit("snap_1")
+
+
+def test_group_commit():
+    print("🧪 Journal: records batched per durability point, one handle per process")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "journal.wal")
+
+        # normal: BEGIN/MANIFEST/METADATA → 1 fsync, COMMIT → 1 fsync
+        journal = Journal(path)
+        assert count_fsyncs(journal, snapshot_transaction) == 2
+        assert [line.split(":")[0] for line in journal_lines(path)] == \
+            ["BEGIN", "MANIFEST", "METADATA", "COMMIT"]
+        handle = journal._file
+        journal.begin_transaction("snap_2")
+        # Record chưa tới durability point thì chưa nằm trong file
+        assert len(journal_lines(path)) == 4
+        journal.abort("snap_2")
+        assert journal._file is handle and not handle.closed
+        assert journal_lines(path)[-2:] == ["BEGIN:snap_2", "ABORT:snap_2"]
+        assert journal.get_last_committed() == "snap_1"
+        assert journal.recover() == []
+        journal.close()
+
+        # full: mỗi record 1 fsync; off: không fsync
+        assert count_fsyncs(Journal(path, "full"), snapshot_transaction) == 4
+        assert count_fsyncs(Journal(path, "off"), snapshot_transaction) == 0
+        assert len(journal_lines(path)) == 14
+
+        try:
+            Journal(path, "sometimes")
+            assert False, "invalid durability accepted"
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_checkpoint():
+    print("🧪 Journal: checkpoint keeps only open transactions, recovery scans one segment")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "journal.wal")
+        journal = Journal(path, "off", checkpoint_bytes=4096)
+        journal.begin_transaction("snap_open")
+        journal.write_metadata("snap_open", {"id": "snap_open"})
+        journal.sync()
+        for i in range(50):
+            journal.begin_transaction(f"snap_{i}")
+            journal.write_manifest(f"snap_{i}", {"version": 2, "manifest_hash": "ab" * 32})
+            journal.commit(f"snap_{i}")
+        assert journal.needs_checkpoint()
+
+        dropped = journal.checkpoint()
+        assert dropped == 150
+        records, _, _ = scan_journal(path)
+        assert [(r.kind, r.tx_id) for r in records] == \
+            [("CHECKPOINT", ""), ("BEGIN", "snap_open"), ("METADATA", "snap_open")]
+        assert records[0].data["segment"] == 1 and records[0].data["last_committed"] == "snap_49"
+        # seq tiếp tục tăng qua checkpoint
+        assert records[0].seq == 153 and [r.seq for r in records] == [153, 154, 155]
+        assert not journal.needs_checkpoint()
+        assert journal.get_last_committed() == "snap_49"
+
+        # Transaction còn mở vẫn được recovery thấy; ghi tiếp vào segment mới
+        recovered = journal.recover()
+        assert [tx["snapshot_id"] for tx in recovered] == ["snap_open"]
+        assert recovered[0]["metadata"] == {"id": "snap_open"}
+        journal.cleanup_incomplete("snap_open")
+        assert journal.recover() == []
+
+        # Handle của process khác được mở lại sau khi file bị thay
+        other = Journal(path, "off")
+        other.begin_transaction("snap_other")
+        other.sync()
+        journal.checkpoint()
+        other.commit("snap_other")
+        lines = journal_lines(path)
+        assert lines[0] == "CHECKPOINT:" and lines[-1] == "COMMIT:snap_other"
+        assert scan_journal(path)[0][0].data["segment"] == 2
+        assert journal.get_last_committed() == "snap_other"
+
+        # Journal dạng text cũ: đọc được, được chuyển sang binary ở lần ghi đầu tiên
+        with open(path, "w") as f:
+            f.write("BEGIN:snap_a\nCOMMIT:snap_a\nBEGIN:snap_b\n")
+        legacy = Journal(path, "off")
+        assert [tx["snapshot_id"] for tx in legacy.recover()] == ["snap_b"]
+        assert legacy.needs_checkpoint()
+        legacy.abort("snap_b")
+        assert journal_lines(path) == ["CHECKPOINT:", "BEGIN:snap_b", "ABORT:snap_b"]
+        assert legacy.get_last_committed() == "snap_a"
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_torn_tail():
+    print("🧪 Journal: torn and corrupted records end the log cleanly")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "journal.wal")
+        journal = Journal(path, "off")
+        snapshot_transaction(journal)
+        journal.begin_transaction("snap_2")
+        journal.write_metadata("snap_2", {"id": "snap_2", "blob": "x" * 10000})
+        journal.sync()
+        journal.close()
+        with open(path, "rb") as f:
+            data = f.read()
+        assert data.startswith(JOURNAL_MAGIC)
+        full_size = len(data)
+
+        # Crash giữa lúc ghi record METADATA lớn: phần đuôi bị cắt
+        with open(path, "r+b") as f:
+            f.truncate(full_size - 5000)
+        records, end, size = scan_journal(path)
+        assert [r.kind for r in records] == ["BEGIN", "MANIFEST", "METADATA", "COMMIT", "BEGIN"]
+        assert end < size
+        result = run(f"python -m src.journal {path}")
+        assert result.returncode == 1 and "torn tail" in result.stdout
+        recovered = Journal(path).recover()
+        assert [(tx["snapshot_id"], tx["metadata"]) for tx in recovered] == [("snap_2", None)]
+
+        # Ghi tiếp: đuôi hỏng bị truncate, seq nối tiếp record hợp lệ cuối
+        journal = Journal(path, "off")
+        journal.abort("snap_2")
+        records, end, size = scan_journal(path)
+        assert end == size and records[-1].kind == "ABORT" and records[-1].seq == 6
+
+        # Bit bị lật trong payload: CRC sai → log dừng trước record đó
+        with open(path, "r+b") as f:
+            f.seek(records[2].offset + 30)
+            byte = f.read(1)
+            f.seek(-1, 1)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        assert [r.kind for r in scan_journal(path)[0]] == ["BEGIN", "MANIFEST"]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_backup_journal():
+    print("🧪 Journal: backup writes exactly one complete transaction")
+    dataset = "./test_journal_dataset"
+    store = "./test_journal_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        with open(os.path.join(dataset, "a.txt"), "w") as f:
+            f.write("journal test\n" * 100)
+        result = run(f"python main.py init {store} --journal-durability off")
+        assert "Journal durability: off" in result.stdout
+        assert run(f"python main.py backup {dataset}").returncode == 0
+
+        lines = journal_lines(os.path.join(store, "journal.wal"))
+        assert [line.split(":")[0] for line in lines] == ["BEGIN", "MANIFEST", "METADATA", "COMMIT"]
+        snapshot_id = lines[0].split(":", 1)[1]
+        assert lines[-1] == f"COMMIT:{snapshot_id}"
+        # MANIFEST chỉ chứa header + hash, không phải toàn bộ danh sách file
+        manifest_record = scan_journal(os.path.join(store, "journal.wal"))[0][1]
+        assert "files" not in manifest_record.data and manifest_record.data["manifest_hash"]
+        assert "is VALID" in run(f"python main.py verify {snapshot_id}").stdout
+
+        # Dump tool chỉ dùng stdlib
+        result = run(f"python -m src.journal {store}/journal.wal")
+        assert result.returncode == 0 and f"COMMIT     {snapshot_id}" in result.stdout
+
+        # Transaction bị bỏ dở (crash) được rollback ở lần khởi động sau
+        crashed = Journal(os.path.join(store, "journal.wal"), "off")
+        crashed.begin_transaction("snap_crashed")
+        crashed.sync()
+        assert "[RECOVERY] Found incomplete transaction: snap_crashed" in run("python main.py list").stdout
+        assert "RECOVERY" not in run("python main.py list").stdout
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_group_commit()
+        test_checkpoint()
+        test_torn_tail()
+        test_backup_journal()
+        print("✅ JOURNAL TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ JOURNAL TEST FAILED")
+        sys.exit(1)
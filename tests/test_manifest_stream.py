@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+TEST: Streaming manifest format (v2, JSON Lines)
+Header + 1 dòng cho mỗi file + footer; Merkle root phải giống manifest v1 với cùng dữ liệu
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import subprocess
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def tree_hashes(directory):
+    """Map rel_path -> sha256 cho toàn bộ file trong thư mục"""
+    result = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                result[os.path.relpath(path, directory)] = hashlib.sha256(f.read()).hexdigest()
+    return result
+
+
+def merkle_root(store, snapshot_id):
+    with open(os.path.join(store, "metadata.json")) as f:
+        return json.load(f)["snapshots"][snapshot_id]["merkle_root"]
+
+
+def test_streaming_manifest():
+    print("🧪 JSON Lines manifest: same Merkle root as v1, verify/restore, tamper detection")
+    dataset = "./test_manifest_dataset"
+    json_store = "./test_manifest_json_store"
+    jsonl_store = "./test_manifest_jsonl_store"
+    restore_dir = "./test_manifest_restore"
+    for path in (dataset, json_store, jsonl_store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        # Tên dễ sai thứ tự: "a.txt" < "a/..." < "a-b" khi so sánh cả đường dẫn
+        os.makedirs(os.path.join(dataset, "a", "b"))
+        for rel in ("a.txt", "a-b", "ab", os.path.join("a", "x"), os.path.join("a", "b", "c"),
+                    os.path.join("a", "b.txt")):
+            with open(os.path.join(dataset, rel), "w") as f:
+                f.write(f"content of {rel}\n" * 10)
+        for i in range(7):
+            with open(os.path.join(dataset, "a", "b", f"n{i}"), "w") as f:
+                f.write(f"file {i}\n")
+
+        assert run(f"python main.py init {json_store}").returncode == 0
+        json_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        assert json_id
+
+        result = run(f"python main.py init {jsonl_store} --manifest-format jsonl")
+        assert "Manifest format: jsonl" in result.stdout
+        jsonl_id = extract_field(run(f"python main.py backup {dataset} --jobs 3").stdout, "Snapshot ID")
+        assert jsonl_id
+
+        manifest_path = os.path.join(jsonl_store, "snapshots", f"{jsonl_id}.manifest")
+        with open(manifest_path) as f:
+            lines = [json.loads(line) for line in f]
+        assert lines[0]["version"] == 2 and "files" not in lines[0]
+        paths = [entry["path"] for entry in lines[1:-1]]
+        assert paths == sorted(paths) and len(paths) == 13
+        assert lines[-1] == {"end": True, "total_files": 13,
+                             "total_chunks": sum(len(e["chunks"]) for e in lines[1:-1])}
+
+        assert merkle_root(json_store, json_id) == merkle_root(jsonl_store, jsonl_id)
+
+        assert "is VALID" in run(f"python main.py verify {jsonl_id}").stdout
+        result = run(f"python main.py restore {jsonl_id} {restore_dir} --jobs 2")
+        assert "Total files restored: 13" in result.stdout
+        assert tree_hashes(restore_dir) == tree_hashes(dataset)
+
+        with open(manifest_path, "rb") as f:
+            original = f.read()
+
+        # Cắt mất footer
+        with open(manifest_path, "wb") as f:
+            f.write(original[:original.rstrip(b"\n").rfind(b"\n") + 1])
+        assert "is INVALID" in run(f"python main.py verify {jsonl_id}").stdout
+
+        # Sửa size của 1 entry (Merkle root không đổi, manifest hash thì có)
+        tampered = original.replace(b'"size":', b'"size":1', 1)
+        with open(manifest_path, "wb") as f:
+            f.write(tampered)
+        result = run(f"python main.py verify {jsonl_id}")
+        assert "is INVALID" in result.stdout and "Manifest hash mismatch" in result.stdout
+    finally:
+        for path in (dataset, json_store, jsonl_store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def test_binary_manifest():
+    print("🧪 Binary manifest: smaller than v1, same Merkle root, verify/restore, truncation")
+    dataset = "./test_manifest_bin_dataset"
+    json_store = "./test_manifest_bin_json_store"
+    binary_store = "./test_manifest_bin_store"
+    restore_dir = "./test_manifest_bin_restore"
+    for path in (dataset, json_store, binary_store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        # Nhiều file cùng tiền tố để front-coding có tác dụng
+        for d in range(3):
+            os.makedirs(os.path.join(dataset, f"dir_{d}", "nested"))
+            for i in range(20):
+                with open(os.path.join(dataset, f"dir_{d}", "nested", f"file_{i:03d}.txt"), "w") as f:
+                    f.write(f"binary manifest {d}/{i}\n" * (i + 1))
+
+        assert run(f"python main.py init {json_store}").returncode == 0
+        json_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        assert json_id
+
+        result = run(f"python main.py init {binary_store} --manifest-format binary")
+        assert "Manifest format: binary" in result.stdout
+        binary_id = extract_field(run(f"python main.py backup {dataset} --jobs 2").stdout, "Snapshot ID")
+        assert binary_id
+
+        assert merkle_root(json_store, json_id) == merkle_root(binary_store, binary_id)
+
+        json_manifest = os.path.join(json_store, "snapshots", f"{json_id}.manifest")
+        manifest_path = os.path.join(binary_store, "snapshots", f"{binary_id}.manifest")
+        with open(manifest_path, "rb") as f:
+            original = f.read()
+        assert original.startswith(b"BKMANIF3")
+        assert len(original) * 2 < os.path.getsize(json_manifest)
+
+        assert "is VALID" in run(f"python main.py verify {binary_id}").stdout
+        result = run(f"python main.py restore {binary_id} {restore_dir}")
+        assert "Total files restored: 60" in result.stdout
+        assert tree_hashes(restore_dir) == tree_hashes(dataset)
+
+        # Cắt mất footer
+        with open(manifest_path, "wb") as f:
+            f.write(original[:-4])
+        assert "is INVALID" in run(f"python main.py verify {binary_id}").stdout
+    finally:
+        for path in (dataset, json_store, binary_store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_streaming_manifest()
+        test_binary_manifest()
+        print("✅ STREAMING MANIFEST TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ STREAMING MANIFEST TEST FAILED")
+        sys.exit(1)
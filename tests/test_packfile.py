@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+TEST: Packfile storage
+Backup vào pack files, migrate từ layout loose, và phát hiện sửa byte trong pack
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+import subprocess
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_snapshot_id(output):
+    """Trích xuất snapshot ID từ output"""
+    for line in output.split('\n'):
+        if "Snapshot ID:" in line:
+            parts = line.split(":")
+            if len(parts) >= 2:
+                return parts[1].strip()
+    return None
+
+
+def tree_hashes(directory):
+    """Map rel_path -> sha256 cho toàn bộ file trong thư mục"""
+    result = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                result[os.path.relpath(path, directory)] = hashlib.sha256(f.read()).hexdigest()
+    return result
+
+
+def count_loose_chunks(store):
+    chunks_dir = os.path.join(store, "chunks")
+    return sum(len(files) for _, _, files in os.walk(chunks_dir))
+
+
+def test_packed_store():
+    print("🧪 Packed store: backup, verify, restore, tamper detection")
+    store = "./test_packed_store"
+    restore_dir = "./test_packed_restore"
+    for path in (store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        result = run(f"python main.py init {store} --storage packed --pack-size 1")
+        assert result.returncode == 0
+
+        result = run("python main.py backup dataset --label packed --jobs 2")
+        snap_id = extract_snapshot_id(result.stdout)
+        assert snap_id
+
+        packs = [n for n in os.listdir(os.path.join(store, "packs")) if n.endswith(".pack")]
+        print(f"   Pack files: {len(packs)}")
+        assert len(packs) > 1
+        assert count_loose_chunks(store) == 0
+
+        result = run(f"python main.py verify {snap_id}")
+        assert "is VALID" in result.stdout
+
+        result = run(f"python main.py restore {snap_id} {restore_dir}")
+        assert tree_hashes(restore_dir) == tree_hashes("dataset")
+
+        # Sửa 1 byte ở cuối pack đầu tiên (vùng dữ liệu chunk)
+        pack_path = os.path.join(store, "packs", sorted(packs)[0])
+        with open(pack_path, 'r+b') as f:
+            f.seek(-10, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-10, os.SEEK_END)
+            f.write(bytes([(byte[0] + 1) % 256]))
+
+        result = run(f"python main.py verify {snap_id}")
+        assert "is INVALID" in result.stdout
+    finally:
+        for path in (store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def test_migrate_loose_to_packed():
+    print("🧪 migrate-storage moves loose chunks into packs")
+    store = "./test_migrate_store"
+    restore_dir = "./test_migrate_restore"
+    for path in (store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        assert run(f"python main.py init {store}").returncode == 0
+        result = run("python main.py backup dataset --label loose")
+        snap_id = extract_snapshot_id(result.stdout)
+        loose_before = count_loose_chunks(store)
+        assert loose_before > 0
+
+        result = run("python main.py migrate-storage")
+        assert result.returncode == 0
+        assert f"Chunks packed: {loose_before}" in result.stdout
+        assert count_loose_chunks(store) == 0
+
+        result = run(f"python main.py verify {snap_id}")
+        assert "is VALID" in result.stdout
+
+        # Backup mới trên store đã migrate dùng lại chunks trong pack
+        result = run("python main.py backup dataset --label packed-after-migrate")
+        assert extract_snapshot_id(result.stdout)
+        assert count_loose_chunks(store) == 0
+
+        result = run(f"python main.py restore {snap_id} {restore_dir}")
+        assert tree_hashes(restore_dir) == tree_hashes("dataset")
+    finally:
+        for path in (store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_packed_store()
+        test_migrate_loose_to_packed()
+        print("✅ PACKFILE TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ PACKFILE TEST FAILED")
+        sys.exit(1)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+TEST: Parallel backup pipeline (--jobs N) và parallel restore (restore --jobs N)
+Manifest của backup song song phải giống hệt backup tuần tự
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.storage import ChunkStorage
+from src.pipeline import RestorePipeline
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_snapshot_id(output):
+    """Trích xuất snapshot ID từ output"""
+    for line in output.split('\n'):
+        if "Snapshot ID:" in line:
+            parts = line.split(":")
+            if len(parts) >= 2:
+                return parts[1].strip()
+    return None
+
+
+def load_manifest(store, snapshot_id):
+    with open(os.path.join(store, "snapshots", f"{snapshot_id}.manifest"), 'r') as f:
+        return json.load(f)
+
+
+def tree_hashes(directory):
+    """Map rel_path -> sha256 cho toàn bộ file trong thư mục"""
+    result = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                result[os.path.relpath(path, directory)] = hashlib.sha256(f.read()).hexdigest()
+    return result
+
+
+def test_parallel_backup_matches_serial():
+    print("🧪 Parallel backup produces the same manifest as serial backup")
+    store = "./test_parallel_store"
+    restore_dir = "./test_parallel_restore"
+    for path in (store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        result = run(f"python main.py init {store}")
+        assert result.returncode == 0
+
+        result = run("python main.py backup dataset --label serial")
+        serial_id = extract_snapshot_id(result.stdout)
+        assert serial_id
+
+        result = run("python main.py backup dataset --label parallel --jobs 4")
+        parallel_id = extract_snapshot_id(result.stdout)
+        assert parallel_id
+
+        serial = load_manifest(store, serial_id)
+        parallel = load_manifest(store, parallel_id)
+        assert serial["files"] == parallel["files"]
+        assert len(parallel["files"]) > 0
+
+        with open(os.path.join(store, "metadata.json"), 'r') as f:
+            metadata = json.load(f)
+        assert (metadata["snapshots"][serial_id]["merkle_root"] ==
+                metadata["snapshots"][parallel_id]["merkle_root"])
+
+        result = run(f"python main.py verify {parallel_id}")
+        assert "is VALID" in result.stdout
+
+        result = run(f"python main.py restore {parallel_id} {restore_dir}")
+        assert "Restore completed successfully" in result.stdout
+    finally:
+        for path in (store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def test_parallel_restore():
+    print("🧪 Parallel restore rebuilds many multi-chunk files with correct contents")
+    dataset = "./test_parallel_restore_dataset"
+    store = "./test_parallel_restore_store"
+    restore_dir = "./test_parallel_restore_target"
+    for path in (dataset, store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        for d in range(3):
+            os.makedirs(os.path.join(dataset, f"dir_{d}"))
+            for i in range(6):
+                with open(os.path.join(dataset, f"dir_{d}", f"file_{i}.bin"), 'wb') as f:
+                    f.write(os.urandom(4096 * (i + 1) + 123 * d))
+        with open(os.path.join(dataset, "empty.txt"), 'w'):
+            pass
+
+        # Chunk nhỏ để mỗi file có nhiều chunk cần ghi đúng thứ tự
+        assert run(f"python main.py init {store} --chunker fixed --chunk-size 4096").returncode == 0
+        result = run(f"python main.py backup {dataset} --label parallel-restore")
+        snap_id = extract_snapshot_id(result.stdout)
+        assert snap_id
+
+        result = run(f"python main.py restore {snap_id} {restore_dir} --jobs 4")
+        assert "Restore completed successfully" in result.stdout
+        assert tree_hashes(restore_dir) == tree_hashes(dataset)
+
+        # Chunk hỏng → restore song song phải thất bại
+        manifest = load_manifest(store, snap_id)
+        chunk_hash = next(e["chunks"][-1] for e in manifest["files"] if e["chunks"])
+        with open(os.path.join(store, "chunks", chunk_hash[:2], chunk_hash), 'r+b') as f:
+            f.write(b"X")
+        shutil.rmtree(restore_dir, ignore_errors=True)
+        result = run(f"python main.py restore {snap_id} {restore_dir} --jobs 4")
+        assert "Restore failed" in result.stdout
+    finally:
+        for path in (dataset, store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def test_parallel_restore_feed_error():
+    print("🧪 Parallel restore stops its workers when the manifest stream raises")
+    tmp = tempfile.mkdtemp()
+    try:
+        storage = ChunkStorage(os.path.join(tmp, "store"))
+
+        def entries():
+            yield {"path": "first.txt", "chunks": []}
+            raise ValueError("corrupt manifest")
+
+        outcome = []
+
+        def restore():
+            try:
+                RestorePipeline(storage, 4).run(entries(), os.path.join(tmp, "target"))
+            except ValueError as e:
+                outcome.append(e)
+
+        thread = threading.Thread(target=restore, daemon=True)
+        thread.start()
+        thread.join(timeout=10)
+        assert not thread.is_alive(), "restore --jobs hung after the manifest stream failed"
+        assert len(outcome) == 1 and "corrupt manifest" in str(outcome[0])
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_parallel_backup_matches_serial()
+        test_parallel_restore()
+        test_parallel_restore_feed_error()
+        print("✅ PARALLEL BACKUP TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ PARALLEL BACKUP TEST FAILED")
+        sys.exit(1)
@@ -77,6 +77,7 @@ roles:
     - list-snapshots
     - verify
     - restore
+    - cat
     - audit-verify
   
   operator:
@@ -84,6 +85,7 @@ roles:
     - list-snapshots
     - verify
     - restore
+    - cat
     - audit-verify
   
   auditor:
@@ -144,6 +146,7 @@ roles:
     - list-snapshots
     - verify
     - restore
+    - cat
     - audit-verify
   
   operator:
@@ -151,6 +154,7 @@ roles:
     - list-snapshots
     - verify
     - restore
+    - cat
     - audit-verify
   
   auditor:
@@ -211,6 +215,18 @@ roles:
         if os.path.exists(another_store):
             shutil.rmtree(another_store, ignore_errors=True)
         
+        # Test cat (should exit with code 1)
+        if snap_id:
+            print(f"\n  d) Testing 'cat' command (should exit 1):")
+            result = run_cmd(f"python main.py cat {snap_id} code/pets-workshop-main/SECURITY.md")
+            
+            if result.returncode == 1 and "Security" not in result.stdout:
+                print("\n    ✅ DENIED as expected (exit code 1)")
+                deny_tests.append(("cat", True))
+            else:
+                print(f"\n    ❌ Expected exit code 1, got {result.returncode}")
+                deny_tests.append(("cat", False))
+        
         # PHASE 4: Test authorized commands (should succeed with exit code 0)
         print("\n" + "="*60)
         print("4. TEST: Authorized commands (should exit with code 0)")
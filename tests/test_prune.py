@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+TEST: prune theo retention trong policy.yaml
+Giữ đúng snapshot theo keep-last/keep-daily, xóa phần còn lại trong 1 transaction,
+hash chain vẫn VALID qua tombstone, gc thu hồi chunk
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import subprocess
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.journal import scan_journal
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def loose_chunks(store):
+    return {name for _, _, names in os.walk(os.path.join(store, "chunks")) for name in names}
+
+
+def test_prune_retention():
+    print("🧪 prune: keep-last + keep-daily, one journaled transaction, chain stays valid")
+    dataset = "./test_prune_dataset"
+    store = "./test_prune_store"
+    policy_backup = "policy.yaml.prune_backup"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+    shutil.copy2("policy.yaml", policy_backup)
+
+    try:
+        with open("policy.yaml") as f:
+            policy = yaml.safe_load(f)
+        policy["retention"] = {"keep-last": 1, "keep-daily": 3}
+        with open("policy.yaml", "w") as f:
+            yaml.safe_dump(policy, f)
+
+        os.makedirs(dataset)
+        assert run(f"python main.py init {store}").returncode == 0
+        ids = []
+        for i in range(6):
+            for name in os.listdir(dataset):
+                os.remove(os.path.join(dataset, name))
+            with open(os.path.join(dataset, f"file_{i}.bin"), "wb") as f:
+                f.write(os.urandom(20 * 1024))
+            ids.append(extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID"))
+        assert all(ids)
+
+        # Dàn thời gian tạo: 10 ngày trước, 9 ngày trước (2 snapshot), 2 ngày, 1 ngày, hiện tại
+        now = time.time()
+        created = [now - 10 * 86400, now - 9 * 86400, now - 9 * 86400 + 60,
+                   now - 2 * 86400, now - 86400, now]
+        metadata_path = os.path.join(store, "metadata.json")
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        for snap_id, created_at in zip(ids, created):
+            metadata["snapshots"][snap_id]["created_at"] = created_at
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f, indent=2)
+
+        result = run("python main.py prune --dry-run")
+        assert "Snapshots kept: 3, removed: 3" in result.stdout
+        assert f"keep   {ids[5]} (keep-last, keep-daily)" in result.stdout
+        assert all(f"remove {snap_id}" in result.stdout for snap_id in ids[:3])
+        assert len(loose_chunks(store)) == 6
+
+        result = run("python main.py prune")
+        assert "Snapshots kept: 3, removed: 3" in result.stdout
+        assert extract_field(result.stdout, "Removed chunks").startswith("3 ")
+        assert len(loose_chunks(store)) == 3
+
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        assert sorted(metadata["snapshots"]) == sorted(ids[3:])
+        assert sorted(metadata["forgotten"]) == sorted(ids[:3])
+
+        # 1 transaction FORGET cho cả 3 snapshot
+        records, _, _ = scan_journal(os.path.join(store, "journal.wal"))
+        forget_records = [r for r in records if r.kind == "FORGET"]
+        assert len(forget_records) == 1
+        assert sorted(forget_records[0].data) == sorted(ids[:3])
+        tx_id = forget_records[0].tx_id
+        assert ("COMMIT", tx_id) in [(r.kind, r.tx_id) for r in records]
+
+        assert "Snapshots verified: 3, invalid: 0" in run("python main.py verify-all").stdout
+
+        # Chạy lại: không còn gì để xóa
+        assert "Snapshots kept: 3, removed: 0" in run("python main.py prune").stdout
+
+        # Không có rule nào → từ chối
+        policy["retention"] = {"keep-last": 0}
+        with open("policy.yaml", "w") as f:
+            yaml.safe_dump(policy, f)
+        result = run("python main.py prune")
+        assert result.returncode != 0 and "No retention rules" in result.stdout
+    finally:
+        shutil.move(policy_backup, "policy.yaml")
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_prune_retention()
+        print("✅ PRUNE TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ PRUNE TEST FAILED")
+        sys.exit(1)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+TEST: Redo-capable crash recovery
+Crash sau khi journal đã có MANIFEST + METADATA → snapshot được hoàn tất ở lần khởi động sau;
+transaction thiếu chunk hoặc đã bị chain vượt qua → rollback
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.storage import ChunkStorage, SnapshotManager
+from src.journal import Journal
+
+
+class SimulatedCrash(BaseException):
+    """Không bị `except Exception` bắt → không có ABORT, giống process bị kill"""
+
+
+def crash(*args, **kwargs):
+    raise SimulatedCrash()
+
+
+def open_store(store):
+    storage = ChunkStorage(store)
+    journal = Journal(os.path.join(store, "journal.wal"), "off")
+    return storage, journal, SnapshotManager(storage, journal)
+
+
+def make_dataset(path, tag):
+    os.makedirs(path, exist_ok=True)
+    for i in range(3):
+        with open(os.path.join(path, f"file_{i}.txt"), "w") as f:
+            f.write(f"{tag} recovery test {i}\n" * 500)
+
+
+def crash_during_backup(manager, dataset, target):
+    """Chạy backup, crash tại target; trả về snapshot id đang ghi"""
+    try:
+        with mock.patch(target, crash):
+            manager.create_snapshot(dataset, label="crashed")
+        assert False, "backup did not crash"
+    except SimulatedCrash:
+        pass
+    return next(tx["snapshot_id"] for tx in manager.journal.recover())
+
+
+def test_roll_forward():
+    print("🧪 Recovery: journaled snapshots are rolled forward")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        make_dataset(dataset, "a")
+        _, _, manager = open_store(store)
+        first = manager.create_snapshot(dataset, label="good")["id"]
+
+        # Crash trước khi manifest được đổi tên vào chỗ
+        make_dataset(dataset, "b")
+        crashed = crash_during_backup(manager, dataset, "src.manifest.ManifestWriter.commit")
+        assert os.path.exists(os.path.join(store, "snapshots", f"{crashed}.manifest.tmp"))
+
+        _, journal, manager = open_store(store)
+        assert journal.recover() == []
+        assert [s["id"] for s in manager.list_snapshots()] == [crashed, first]
+        assert manager.verify_snapshot(crashed)[0]
+        assert crashed in manager.storage.index.counted_snapshots()
+        assert not os.path.exists(os.path.join(store, "snapshots", f"{crashed}.manifest.tmp"))
+
+        # Crash sau khi catalog đã commit, trước COMMIT của journal
+        make_dataset(dataset, "c")
+        crashed2 = crash_during_backup(manager, dataset, "src.journal.Journal.commit")
+        _, journal, manager = open_store(store)
+        assert journal.recover() == []
+        assert [s["id"] for s in manager.list_snapshots()] == [crashed2, crashed, first]
+        assert all(ok for _, ok, _ in manager.verify_all_snapshots())
+
+        # Backup mới nối chain bình thường
+        make_dataset(dataset, "d")
+        latest = manager.create_snapshot(dataset)["id"]
+        assert manager.verify_snapshot(latest)[0]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_roll_back():
+    print("🧪 Recovery: partial transactions are still rolled back")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        make_dataset(dataset, "a")
+        storage, _, manager = open_store(store)
+        first = manager.create_snapshot(dataset)["id"]
+
+        # Chunk của snapshot bị mất trước khi recovery chạy → rollback
+        make_dataset(dataset, "lost")
+        crashed = crash_during_backup(manager, dataset, "src.manifest.ManifestWriter.commit")
+        first_chunks = {h for e in manager.iter_snapshot_entries(first) for h in e["chunks"]}
+        lost = next(h for h, _ in storage.iter_loose_chunks() if h not in first_chunks)
+        os.remove(storage._chunk_path(lost, create=False))
+        storage.index.remove(lost)
+        storage.index.commit()
+
+        _, journal, manager = open_store(store)
+        assert journal.recover() == []
+        assert [s["id"] for s in manager.list_snapshots()] == [first]
+        assert not any(name.startswith(crashed) for name in os.listdir(os.path.join(store, "snapshots")))
+
+        # Chain đã có snapshot khác nối vào → không thể redo
+        make_dataset(dataset, "late")
+        crashed = crash_during_backup(manager, dataset, "src.manifest.ManifestWriter.commit")
+        # Recovery chưa chạy được (store đang bận) và một backup khác commit trước
+        make_dataset(dataset, "other")
+        with mock.patch("src.storage.SnapshotManager._maintain_journal"):
+            _, _, other_manager = open_store(store)
+        other = other_manager.create_snapshot(dataset)["id"]
+        assert [tx["snapshot_id"] for tx in other_manager.journal.recover()] == [crashed]
+
+        _, journal, manager = open_store(store)
+        assert journal.recover() == []
+        assert [s["id"] for s in manager.list_snapshots()] == [other, first]
+        assert all(ok for _, ok, _ in manager.verify_all_snapshots())
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_roll_forward()
+        test_roll_back()
+        print("✅ RECOVERY TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ RECOVERY TEST FAILED")
+        sys.exit(1)
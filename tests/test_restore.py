@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+TEST: Single-pass verify-while-restore
+Mỗi chunk chỉ được đọc 1 lần khi restore (hash kiểm tra trong lúc ghi);
+restore ghi vào thư mục staging, chunk hỏng giữa chừng không để lại gì ở target
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.storage import ChunkStorage, SnapshotManager
+from src.journal import Journal
+from src.exceptions import IntegrityError
+
+
+def open_store(store):
+    storage = ChunkStorage(store)
+    journal = Journal(os.path.join(store, "journal.wal"), "off")
+    return storage, SnapshotManager(storage, journal)
+
+
+def make_dataset(path):
+    os.makedirs(os.path.join(path, "sub"), exist_ok=True)
+    for i in range(4):
+        with open(os.path.join(path, "sub" if i % 2 else "", f"file_{i}.txt"), "w") as f:
+            f.write(f"restore test {i}\n" * 2000)
+
+
+def read_tree(path):
+    tree = {}
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            with open(file_path, "rb") as f:
+                tree[os.path.relpath(file_path, path)] = f.read()
+    return tree
+
+
+def count_chunk_reads(manager, restore):
+    real = ChunkStorage.get_chunk
+    reads = []
+
+    def get_chunk(storage, chunk_hash):
+        reads.append(chunk_hash)
+        return real(storage, chunk_hash)
+
+    with mock.patch.object(ChunkStorage, "get_chunk", get_chunk):
+        restore()
+    return len(reads)
+
+
+def test_single_pass_restore():
+    print("🧪 Restore: chunks are read once, into a staging directory")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        make_dataset(dataset)
+        storage, manager = open_store(store)
+        snapshot_id = manager.create_snapshot(dataset)["id"]
+        references = sum(len(e["chunks"]) for e in manager.iter_snapshot_entries(snapshot_id))
+
+        for jobs in (1, 3):
+            target = os.path.join(tmp, f"restored_{jobs}")
+            reads = count_chunk_reads(manager, lambda: manager.restore_snapshot(snapshot_id, target, jobs))
+            assert reads == references
+            assert read_tree(target) == read_tree(dataset)
+        # verify_first: đọc lại mọi chunk trước khi restore
+        target = os.path.join(tmp, "restored_verified")
+        reads = count_chunk_reads(manager, lambda: manager.restore_snapshot(
+            snapshot_id, target, verify_first=True))
+        assert reads > references and read_tree(target) == read_tree(dataset)
+
+        # Target không rỗng: file được thay, file khác giữ nguyên
+        target = os.path.join(tmp, "existing")
+        os.makedirs(target)
+        with open(os.path.join(target, "file_0.txt"), "w") as f:
+            f.write("old")
+        with open(os.path.join(target, "keep.txt"), "w") as f:
+            f.write("keep")
+        manager.restore_snapshot(snapshot_id, target)
+        tree = read_tree(target)
+        assert tree.pop("keep.txt") == b"keep" and tree == read_tree(dataset)
+        assert sorted(os.listdir(tmp)) == ["data", "existing", "restored_1", "restored_3",
+                                           "restored_verified", "store"]
+
+        # Chunk hỏng: phát hiện khi đọc, target không được tạo, staging bị dọn
+        entries = list(manager.iter_snapshot_entries(snapshot_id))
+        bad = entries[-1]["chunks"][0]
+        with open(storage._chunk_path(bad, create=False), "r+b") as f:
+            f.seek(-1, 2)
+            byte = f.read(1)
+            f.seek(-1, 2)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        for jobs in (1, 3):
+            try:
+                manager.restore_snapshot(snapshot_id, os.path.join(tmp, "broken"), jobs)
+                assert False, "corrupted chunk restored"
+            except IntegrityError:
+                pass
+            assert not any(name.startswith((".broken", "broken")) for name in os.listdir(tmp))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_single_pass_restore()
+        print("✅ RESTORE TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ RESTORE TEST FAILED")
+        sys.exit(1)
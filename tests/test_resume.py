@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+TEST: Resumable backups
+Backup bị gián đoạn giữa lúc duyệt source để lại PROGRESS trong journal;
+recovery giữ lại (SUSPEND) thay vì rollback, `backup --resume` chỉ đọc lại phần còn thiếu
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.storage import ChunkStorage, SnapshotManager
+from src.journal import Journal
+
+
+class SimulatedCrash(BaseException):
+    """Không bị `except Exception` bắt → không có ABORT, giống process bị kill"""
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def open_store(store):
+    storage = ChunkStorage(store)
+    journal = Journal(os.path.join(store, "journal.wal"), "off")
+    return storage, journal, SnapshotManager(storage, journal)
+
+
+def make_dataset(path, count=6):
+    os.makedirs(path, exist_ok=True)
+    for i in range(count):
+        file_path = os.path.join(path, f"file_{i}.txt")
+        with open(file_path, "w") as f:
+            f.write(f"resume test {i}\n" * 500)
+        # mtime cũ: không rơi vào cửa sổ racy của lần quét
+        os.utime(file_path, (1_600_000_000 + i, 1_600_000_000 + i))
+
+
+def crash_after_progress(manager, dataset, checkpoints):
+    """Backup với progress mỗi 2 file, crash ngay sau progress thứ `checkpoints`"""
+    real = Journal.write_progress
+    calls = []
+
+    def write_progress(journal, *args, **kwargs):
+        real(journal, *args, **kwargs)
+        calls.append(args)
+        if len(calls) == checkpoints:
+            raise SimulatedCrash()
+
+    try:
+        with mock.patch.object(SnapshotManager, "PROGRESS_EVERY_FILES", 2), \
+                mock.patch.object(Journal, "write_progress", write_progress):
+            manager.create_snapshot(dataset, label="interrupted")
+        assert False, "backup did not crash"
+    except SimulatedCrash:
+        pass
+    return calls[0][0]
+
+
+def test_resume():
+    print("🧪 Resume: interrupted backup continues from its journal progress")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        make_dataset(dataset)
+        _, _, manager = open_store(store)
+        interrupted = crash_after_progress(manager, dataset, 2)
+
+        # Lần khởi động sau: transaction được suspend, không bị rollback
+        _, journal, manager = open_store(store)
+        assert journal.recover() == []
+        suspended = journal.suspended(dataset)
+        assert [tx["snapshot_id"] for tx in suspended] == [interrupted]
+        assert len(suspended[0]["progress"]["files"]) == 4
+        assert manager.list_snapshots() == []
+
+        # File đã checkpoint nhưng bị sửa sau đó thì phải đọc lại
+        with open(os.path.join(dataset, "file_0.txt"), "a") as f:
+            f.write("changed\n")
+        os.utime(os.path.join(dataset, "file_0.txt"), (1_600_000_100, 1_600_000_100))
+
+        metadata = manager.create_snapshot(dataset, use_cache=False, resume=True)
+        assert metadata["resumed_files"] == 3 and metadata["total_files"] == 6
+        assert manager.verify_snapshot(metadata["id"])[0]
+        # Snapshot mới thay thế backup bị gián đoạn
+        assert journal.suspended() == [] and journal.recover() == []
+
+        # Không có --resume: backup bình thường, progress cũ bị bỏ
+        crash_after_progress(manager, dataset, 1)
+        _, journal, manager = open_store(store)
+        assert len(journal.suspended()) == 1
+        metadata = manager.create_snapshot(dataset, use_cache=False)
+        assert metadata["resumed_files"] == 0
+        assert journal.suspended() == []
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_resume_cli():
+    print("🧪 Resume: backup --resume from the command line")
+    dataset = "./test_resume_dataset"
+    store = "./test_resume_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        make_dataset(dataset)
+        assert run(f"python main.py init {store} --journal-durability off").returncode == 0
+        _, _, manager = open_store(store)
+        crash_after_progress(manager, os.path.abspath(dataset), 1)
+
+        result = run("python main.py list")
+        assert "interrupted after 2 file(s)" in result.stdout and "backup --resume" in result.stdout
+        result = run(f"python main.py backup {dataset} --resume")
+        assert "Resumed files (from journal): 2" in result.stdout
+        snapshot_id = result.stdout.split("Snapshot ID: ")[1].split()[0]
+        assert "is VALID" in run(f"python main.py verify {snapshot_id}").stdout
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_resume()
+        test_resume_cli()
+        print("✅ RESUME TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ RESUME TEST FAILED")
+        sys.exit(1)
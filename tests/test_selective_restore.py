@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+TEST: Selective restore
+restore --include/--exclude chỉ khôi phục path/glob được chọn; file được tìm qua path index
+(<snapshot>.pathidx) bằng binary search + range scan, không đọc cả manifest
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.storage import ChunkStorage, SnapshotManager
+from src.journal import Journal
+from src.pathindex import PathIndex, PathFilter, build_path_index
+from src.exceptions import IntegrityError
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def open_store(store):
+    storage = ChunkStorage(store)
+    journal = Journal(os.path.join(store, "journal.wal"), "off")
+    return SnapshotManager(storage, journal)
+
+
+def make_dataset(path):
+    files = ["etc/app/config.yml", "etc/app/sub/extra.yml", "etc/app2/config.yml",
+             "var/log/a.log", "var/log/b.log", "var/log/c.txt"]
+    files += [f"data/file_{i:03d}.bin" for i in range(200)]
+    for rel_path in files:
+        file_path = os.path.join(path, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as f:
+            f.write(f"{rel_path}\n" * 50)
+    return files
+
+
+def restored_files(path):
+    return sorted(os.path.relpath(os.path.join(root, name), path)
+                  for root, _, files in os.walk(path) for name in files)
+
+
+def test_path_filter():
+    print("🧪 Selective restore: include/exclude matching")
+    path_filter = PathFilter(["etc/app/", "./var/*.log"], ["*/sub"])
+    assert path_filter.matches("etc/app/config.yml")
+    assert not path_filter.matches("etc/app2/config.yml")
+    assert not path_filter.matches("etc/app/sub/extra.yml")
+    assert path_filter.matches("var/log/a.log") and not path_filter.matches("var/log/c.txt")
+    assert path_filter.prefixes() == ["etc/app", "var/"]
+    assert PathFilter(["a*", "ab", "b"]).prefixes() == ["a", "b"]
+    assert PathFilter([], ["x"]).prefixes() == [""]
+
+
+def test_selective_restore():
+    print("🧪 Selective restore: only matching files, found through the path index")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        files = make_dataset(dataset)
+        manager = open_store(store)
+        snapshot_id = manager.create_snapshot(dataset)["id"]
+
+        index_path = os.path.join(store, "snapshots", f"{snapshot_id}.pathidx")
+        with PathIndex(index_path) as index:
+            assert len(index) == len(files)
+            assert index.lookup("var/log/a.log")["size"] == len("var/log/a.log\n") * 50
+            assert index.lookup("var/log/zzz") is None
+            assert [e["path"] for e in index.iter_prefix("etc/app/")] == \
+                ["etc/app/config.yml", "etc/app/sub/extra.yml"]
+
+        target = os.path.join(tmp, "one_dir")
+        manager.restore_snapshot(snapshot_id, target, includes=["etc/app"])
+        assert restored_files(target) == ["etc/app/config.yml", "etc/app/sub/extra.yml"]
+        with open(os.path.join(target, "etc/app/config.yml")) as f:
+            assert f.read() == "etc/app/config.yml\n" * 50
+
+        target = os.path.join(tmp, "globbed")
+        manager.restore_snapshot(snapshot_id, target, jobs=2, includes=["*.log", "etc/*/config.yml"],
+                                 excludes=["var/log/b.log"])
+        assert restored_files(target) == ["etc/app/config.yml", "etc/app2/config.yml", "var/log/a.log"]
+
+        # 1 file: binary search trên index, manifest không được đọc
+        parsed = []
+        real_entry = PathIndex._entry
+
+        def entry(index, i):
+            parsed.append(i)
+            return real_entry(index, i)
+
+        target = os.path.join(tmp, "single")
+        with mock.patch.object(PathIndex, "_entry", entry), \
+                mock.patch("src.storage.iter_manifest_entries", side_effect=AssertionError("manifest read")):
+            manager.restore_snapshot(snapshot_id, target, includes=["data/file_123.bin"])
+        assert restored_files(target) == ["data/file_123.bin"]
+        assert len(parsed) <= 12
+
+        # Không có file nào khớp: lỗi, target không được tạo
+        try:
+            manager.restore_snapshot(snapshot_id, os.path.join(tmp, "none"), includes=["nope"])
+            assert False, "empty selection restored"
+        except ValueError:
+            pass
+        assert not any("none" in name for name in os.listdir(tmp))
+
+        # Index bị mất (snapshot cũ) → dựng lại từ manifest
+        os.remove(index_path)
+        target = os.path.join(tmp, "rebuilt")
+        manager.restore_snapshot(snapshot_id, target, includes=["var/log/c.txt"])
+        assert restored_files(target) == ["var/log/c.txt"] and os.path.exists(index_path)
+
+        # Index bị sửa: verify phát hiện và bỏ index, lần sau được dựng lại
+        with open(index_path, "r+b") as f:
+            data = f.read()
+            pos = data.index(b'"size":') + len(b'"size":')
+            f.seek(pos)
+            f.write(b"1" if data[pos:pos + 1] != b"1" else b"2")
+        assert manager.verify_snapshot(snapshot_id)[0]
+        assert not os.path.exists(index_path)
+
+        # forget xóa cả index
+        assert manager.forget_snapshots([snapshot_id]) == 1
+        assert not any(name.startswith(snapshot_id) for name in os.listdir(os.path.join(store, "snapshots")))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def swap_chunks(index_path, first, second):
+    """Swap the chunk lists of two same-sized entries inside a path index (in place)"""
+    with open(index_path, "r+b") as f:
+        data = bytearray(f.read())
+        spans = []
+        for path in (first, second):
+            start = data.rindex(b'"chunks":', 0, data.index(f'"path":"{path}"'.encode()))
+            spans.append((start, data.index(b"]", start) + 1))
+        (a0, a1), (b0, b1) = spans
+        chunks_a, chunks_b = bytes(data[a0:a1]), bytes(data[b0:b1])
+        assert len(chunks_a) == len(chunks_b) and chunks_a != chunks_b
+        data[a0:a1], data[b0:b1] = chunks_b, chunks_a
+        f.seek(0)
+        f.write(data)
+
+
+def test_tampered_path_index():
+    print("🧪 Selective restore: a tampered path index is never trusted")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        os.makedirs(dataset)
+        for name in ("a.txt", "b.txt", "c.txt"):
+            with open(os.path.join(dataset, name), "w") as f:
+                f.write(f"CONTENT {name.upper()}\n")
+        manager = open_store(store)
+        snapshot_id = manager.create_snapshot(dataset)["id"]
+        merkle_root = manager.get_snapshot(snapshot_id)["merkle_root"]
+        index_path = os.path.join(store, "snapshots", f"{snapshot_id}.pathidx")
+
+        # Đổi chunk của a.txt và b.txt: header (merkle_root, manifest_hash) vẫn khớp metadata
+        swap_chunks(index_path, "a.txt", "b.txt")
+        with PathIndex(index_path, merkle_root) as index:
+            assert index.info["merkle_root"] == merkle_root
+            try:
+                index.lookup("a.txt")
+                assert False, "tampered entry served"
+            except IntegrityError:
+                pass
+
+        # Restore: index bị loại, dựng lại từ manifest, nội dung đúng
+        target = os.path.join(tmp, "restored")
+        manager.restore_snapshot(snapshot_id, target, includes=["a.txt"])
+        with open(os.path.join(target, "a.txt")) as f:
+            assert f.read() == "CONTENT A.TXT\n"
+
+        # Index thiếu entry cuối (header vẫn chép từ metadata) → không được coi là "không có file"
+        entries = list(manager.iter_snapshot_entries(snapshot_id))
+        build_path_index(index_path, entries[:2], {"snapshot_id": snapshot_id})
+        with PathIndex(index_path, merkle_root) as index:
+            for read in (lambda: index.lookup("c.txt"), lambda: list(index.iter_prefix())):
+                try:
+                    read()
+                    assert False, "truncated index served"
+                except IntegrityError:
+                    pass
+        # Index rỗng cho snapshot không rỗng
+        build_path_index(index_path, [], {"snapshot_id": snapshot_id})
+        try:
+            PathIndex(index_path, merkle_root)
+            assert False, "empty index accepted"
+        except IntegrityError:
+            pass
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_selective_restore_cli():
+    print("🧪 Selective restore: restore --include/--exclude")
+    dataset = "./test_selective_dataset"
+    store = "./test_selective_store"
+    restore_dir = "./test_selective_restore"
+    for path in (dataset, store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        make_dataset(dataset)
+        assert run(f"python main.py init {store} --manifest-format binary").returncode == 0
+        result = run(f"python main.py backup {dataset}")
+        snapshot_id = result.stdout.split("Snapshot ID: ")[1].split()[0]
+
+        result = run(f"python main.py restore {snapshot_id} {restore_dir} --include var/log --exclude '*.txt'")
+        assert "Restore completed successfully" in result.stdout
+        assert restored_files(restore_dir) == ["var/log/a.log", "var/log/b.log"]
+        result = run(f"python main.py restore {snapshot_id} ./test_selective_none --include missing")
+        assert "Restore failed: No files in the snapshot match" in result.stdout
+    finally:
+        for path in (dataset, store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_path_filter()
+        test_selective_restore()
+        test_tampered_path_index()
+        test_selective_restore_cli()
+        print("✅ SELECTIVE RESTORE TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ SELECTIVE RESTORE TEST FAILED")
+        sys.exit(1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+TEST: Sparse-aware backup/restore
+Hole (SEEK_DATA/SEEK_HOLE) và chunk toàn byte 0 được ghi thành zero-chunk marker trong
+manifest, không hash/lưu; restore tạo lại hole bằng seek + truncate
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.storage import ChunkStorage, SnapshotManager
+from src.journal import Journal
+from src.utils import (
+    SparseFile, open_source_file, read_file_in_chunks, is_zero_chunk,
+    zero_chunk_marker, zero_chunk_length
+)
+
+CHUNK = 1024 * 1024
+
+
+def open_store(store):
+    storage = ChunkStorage(store)
+    journal = Journal(os.path.join(store, "journal.wal"), "off")
+    return storage, SnapshotManager(storage, journal)
+
+
+def make_sparse(path, size, extents):
+    """File of `size` bytes that only holds data at the given (offset, bytes) extents"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(size)
+        for offset, data in extents:
+            f.seek(offset)
+            f.write(data)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def make_dataset(path):
+    head, middle = os.urandom(1000), os.urandom(CHUNK + 77)
+    # 8 MiB: dữ liệu ở đầu, giữa; phần còn lại (kể cả cuối file) là hole
+    image = make_sparse(os.path.join(path, "disk.img"), 8 * CHUNK,
+                        [(0, head), (3 * CHUNK + 5, middle)])
+    # File dense nhưng có 1 chunk toàn byte 0 ghi thật
+    dense = os.urandom(CHUNK) + bytes(CHUNK) + b"tail"
+    with open(os.path.join(path, "dense.bin"), "wb") as f:
+        f.write(dense)
+    return image, dense
+
+
+def allocated(path):
+    return os.stat(path).st_blocks * 512
+
+
+def test_zero_markers():
+    print("🧪 Sparse: zero-chunk marker and hole-skipping reader")
+    marker = zero_chunk_marker(CHUNK)
+    assert len(marker) == 64 and zero_chunk_length(marker) == CHUNK
+    assert zero_chunk_length("ab" * 32) is None
+    assert is_zero_chunk(bytes(10)) and not is_zero_chunk(b"") and not is_zero_chunk(bytes(9) + b"\x01")
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "sparse.img")
+        content = make_sparse(path, 5 * CHUNK + 3, [(CHUNK - 2, b"xyzw"), (4 * CHUNK, b"end")])
+        if not hasattr(os, "SEEK_HOLE") or allocated(path) >= len(content):
+            print("   (filesystem không hỗ trợ sparse file, bỏ qua phần SEEK_HOLE)")
+        else:
+            with open_source_file(path) as f:
+                assert isinstance(f, SparseFile)
+            # Hole không được đọc từ đĩa: chỉ pread các extent dữ liệu
+            real_pread = os.pread
+            preads = []
+
+            def pread(fd, count, offset):
+                preads.append(count)
+                return real_pread(fd, count, offset)
+
+            with mock.patch("os.pread", pread):
+                chunks = list(read_file_in_chunks(path))
+            assert [len(c) for c in chunks] == [CHUNK] * 5 + [3]
+            assert b"".join(chunks) == content
+            assert sum(preads) < 4 * CHUNK
+            with SparseFile(path) as f:
+                assert f.read(CHUNK) == content[:CHUNK] and f.read() == content[CHUNK:]
+                assert f.read(10) == b""
+        with open(os.path.join(tmp, "dense.txt"), "wb") as f:
+            f.write(b"dense")
+        with open_source_file(os.path.join(tmp, "dense.txt")) as f:
+            assert not isinstance(f, SparseFile) and f.read() == b"dense"
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_sparse_backup_restore():
+    print("🧪 Sparse: zero chunks are not stored, restore recreates holes")
+    tmp = tempfile.mkdtemp()
+    try:
+        store, dataset = os.path.join(tmp, "store"), os.path.join(tmp, "data")
+        image, dense = make_dataset(dataset)
+        storage, manager = open_store(store)
+        snapshot_id = manager.create_snapshot(dataset)["id"]
+
+        entries = {e["path"]: e for e in manager.iter_snapshot_entries(snapshot_id)}
+        image_chunks = entries["disk.img"]["chunks"]
+        zero_marker = zero_chunk_marker(CHUNK)
+        assert image_chunks[1] == image_chunks[2] == image_chunks[-1] == zero_marker
+        assert entries["dense.bin"]["chunks"][1] == zero_marker
+        # Chỉ chunk có dữ liệu được lưu (3 của disk.img + 2 của dense.bin)
+        assert storage.index.count() == 5 and zero_marker not in set(storage.index.iter_hashes())
+        assert not os.path.exists(storage._chunk_path(zero_marker, create=False))
+
+        assert manager.verify_snapshot(snapshot_id)[0]
+        reader = manager.open_file(snapshot_id, "disk.img")
+        assert reader.read() == image
+        assert b"".join(reader.iter_range(3 * CHUNK, 10)) == image[3 * CHUNK:3 * CHUNK + 10]
+
+        for jobs in (1, 3):
+            target = os.path.join(tmp, f"restored_{jobs}")
+            manager.restore_snapshot(snapshot_id, target, jobs)
+            for name, content in (("disk.img", image), ("dense.bin", dense)):
+                with open(os.path.join(target, name), "rb") as f:
+                    assert f.read() == content
+            restored = os.path.join(target, "disk.img")
+            assert os.path.getsize(restored) == len(image)
+            # Hole được tạo lại (nếu filesystem hỗ trợ): không cấp phát 8 MiB
+            if allocated(os.path.join(dataset, "disk.img")) < len(image):
+                assert allocated(restored) < 4 * CHUNK
+
+        # Backup lần 2: không chunk mới nào
+        snapshot = manager.create_snapshot(dataset)
+        assert [e["chunks"] for e in manager.iter_snapshot_entries(snapshot["id"])] == \
+            [e["chunks"] for e in entries.values()]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_sparse_cli():
+    print("🧪 Sparse: backup/restore/cat through the CLI")
+    dataset = "./test_sparse_dataset"
+    store = "./test_sparse_store"
+    restore_dir = "./test_sparse_restore"
+    for path in (dataset, store, restore_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        image, _ = make_dataset(dataset)
+        assert subprocess.run(f"python main.py init {store} --manifest-format binary", shell=True,
+                              capture_output=True).returncode == 0
+        result = subprocess.run(f"python main.py backup {dataset}", shell=True,
+                                capture_output=True, text=True)
+        snapshot_id = result.stdout.split("Snapshot ID: ")[1].split()[0]
+
+        result = subprocess.run(f"python main.py restore {snapshot_id} {restore_dir}", shell=True,
+                                capture_output=True, text=True)
+        assert "Restore completed successfully" in result.stdout
+        with open(os.path.join(restore_dir, "disk.img"), "rb") as f:
+            assert f.read() == image
+
+        result = subprocess.run(["python", "main.py", "cat", snapshot_id, "disk.img",
+                                 "--offset", str(CHUNK - 10), "--length", "20"], capture_output=True)
+        assert result.returncode == 0 and result.stdout == image[CHUNK - 10:CHUNK + 10]
+    finally:
+        for path in (dataset, store, restore_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_zero_markers()
+        test_sparse_backup_restore()
+        test_sparse_cli()
+        print("✅ SPARSE TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ SPARSE TEST FAILED")
+        sys.exit(1)
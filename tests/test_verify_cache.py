@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+TEST: Verification cache và verify-all
+verify mặc định (và --deep/--max-age 0) hash lại toàn bộ; --max-age dùng lại kết quả
+kiểm tra chunk gần đây khi file chứa chunk không đổi; verify-all kiểm tra chunk dùng chung 1 lần
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.utils import parse_duration
+
+
+def run(cmd):
+    """Run command and return output"""
+    print(f"$ {cmd}")
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    print(result.stdout)
+    if result.stderr:
+        print(f"STDERR: {result.stderr}")
+    return result
+
+
+def extract_field(output, field):
+    """Trích xuất giá trị của một dòng 'field: value' từ output"""
+    for line in output.split('\n'):
+        if f"{field}:" in line:
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+def chunk_counts(output):
+    """(hashed, cached) từ dòng 'Chunks hashed: X, from cache: Y'"""
+    value = extract_field(output, "Chunks hashed")
+    hashed, cached = value.split(", from cache:")
+    return int(hashed), int(cached)
+
+
+def test_parse_duration():
+    print("🧪 --max-age durations: units, invalid and non-finite values")
+    assert parse_duration("90") == 90 and parse_duration("30m") == 1800
+    assert parse_duration("12h") == 12 * 3600 and parse_duration("7d") == 7 * 86400
+    for value in ("", "abc", "-1", "nan", "inf", "-inf", "infd", "1e400"):
+        try:
+            parse_duration(value)
+        except ValueError:
+            continue
+        raise AssertionError(f"{value!r} accepted as a duration")
+
+
+def test_verify_cache():
+    print("🧪 Verify cache: cached checks, --deep, --max-age, --all, tamper detection")
+    dataset = "./test_verify_cache_dataset"
+    store = "./test_verify_cache_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        for i in range(5):
+            with open(os.path.join(dataset, f"file_{i}.txt"), "w") as f:
+                f.write(f"verify cache {i}\n" * 200)
+
+        assert run(f"python main.py init {store}").returncode == 0
+        first_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        with open(os.path.join(dataset, "extra.txt"), "w") as f:
+            f.write("second snapshot only\n")
+        second_id = extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID")
+        assert first_id and second_id
+
+        result = run(f"python main.py verify {first_id}")
+        assert "is VALID" in result.stdout
+        assert chunk_counts(result.stdout) == (5, 0)
+
+        # Không có --max-age: luôn hash lại, cache chỉ dùng khi được yêu cầu
+        assert chunk_counts(run(f"python main.py verify {first_id}").stdout) == (5, 0)
+        result = run(f"python main.py verify {first_id} --jobs 2 --max-age 1d")
+        assert "is VALID" in result.stdout
+        assert chunk_counts(result.stdout) == (0, 5)
+
+        assert chunk_counts(run(f"python main.py verify {first_id} --deep --max-age 1d").stdout) == (5, 0)
+        assert chunk_counts(run(f"python main.py verify {first_id} --max-age 0").stdout) == (5, 0)
+
+        # --all: chunk dùng chung giữa 2 snapshot chỉ được hash 1 lần
+        result = run("python main.py verify --all --deep")
+        assert "Snapshots verified: 2, invalid: 0" in result.stdout
+        assert chunk_counts(result.stdout) == (6, 0)
+
+        # File chunk bị sửa → cache không còn khớp, kể cả --max-age vẫn phát hiện
+        chunks_dir = os.path.join(store, "chunks")
+        victim = next(os.path.join(root, name) for root, _, names in os.walk(chunks_dir) for name in names)
+        with open(victim, "r+b") as f:
+            byte = f.read(1)
+            f.seek(0)
+            f.write(bytes([(byte[0] + 1) % 256]))
+        for flags in ("--max-age 1d", ""):
+            result = run(f"python main.py verify --all {flags}")
+            assert "is INVALID" in result.stdout
+            assert "invalid: 0" not in result.stdout
+
+        assert run("python main.py verify").returncode != 0
+        assert run(f"python main.py verify {first_id} --max-age nan").returncode != 0
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def test_verify_all():
+    print("🧪 verify-all: per-snapshot results, shared chunks, linear hash chain check")
+    dataset = "./test_verify_all_dataset"
+    store = "./test_verify_all_store"
+    for path in (dataset, store):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.makedirs(dataset)
+        with open(os.path.join(dataset, "shared.txt"), "w") as f:
+            f.write("shared by every snapshot\n" * 100)
+
+        assert run(f"python main.py init {store}").returncode == 0
+        ids = []
+        for i in range(3):
+            with open(os.path.join(dataset, f"new_{i}.txt"), "w") as f:
+                f.write(f"only from snapshot {i} on\n")
+            ids.append(extract_field(run(f"python main.py backup {dataset}").stdout, "Snapshot ID"))
+        assert all(ids)
+
+        result = run("python main.py verify-all --jobs 4")
+        assert "Snapshots verified: 3, invalid: 0" in result.stdout
+        assert chunk_counts(result.stdout) == (4, 0)
+        assert result.stdout.index(ids[0]) < result.stdout.index(ids[1]) < result.stdout.index(ids[2])
+
+        # Chunk chỉ có trong snapshot cuối bị xóa → chỉ snapshot cuối INVALID
+        with open(os.path.join(store, "snapshots", f"{ids[2]}.manifest")) as f:
+            manifest = json.load(f)
+        last_only = next(e["chunks"][0] for e in manifest["files"] if e["path"] == "new_2.txt")
+        os.remove(os.path.join(store, "chunks", last_only[:2], last_only))
+        result = run("python main.py verify-all")
+        assert "Snapshots verified: 3, invalid: 1" in result.stdout
+        assert f"{ids[2]} is INVALID" in result.stdout and "Chunk missing or corrupted" in result.stdout
+
+        # Sửa chain hash của snapshot giữa → snapshot đó và snapshot sau bị phát hiện
+        metadata_path = os.path.join(store, "metadata.json")
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        metadata["snapshots"][ids[1]]["chain_hash"] = "f" * 64
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f, indent=2)
+        result = run("python main.py verify-all")
+        assert f"{ids[0]} is VALID" in result.stdout
+        assert f"{ids[1]} is INVALID" in result.stdout and "Rollback detected" in result.stdout
+        assert "Snapshots verified: 3, invalid: 2" in result.stdout
+    finally:
+        for path in (dataset, store):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_parse_duration()
+        test_verify_cache()
+        test_verify_all()
+        print("✅ VERIFY CACHE TEST PASSED")
+        sys.exit(0)
+    except AssertionError:
+        import traceback
+        traceback.print_exc()
+        print("❌ VERIFY CACHE TEST FAILED")
+        sys.exit(1)